@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+
+from skyportal.models import init_db, classify_unclassified_thumbnails
+from baselayer.app.env import load_env
+
+
+env, cfg = load_env()
+init_db(**cfg["database"])
+
+n_thumbnails = classify_unclassified_thumbnails()
+print(f"Processed {n_thumbnails} unclassified thumbnails.")
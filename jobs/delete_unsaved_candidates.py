@@ -1,11 +1,57 @@
 #!/usr/bin/env python
+"""Delete the Objs that passed filters as candidates but were never saved as
+sources, once they are older than `misc.days_to_keep_unsaved_candidates`.
 
+Objs are deleted in batches of `misc.unsaved_candidates_purge.batch_size`,
+each in its own short transaction, pausing
+`misc.unsaved_candidates_purge.pause_seconds` between batches so as not to
+hold locks on (or flood the WAL with) the tables the deletes cascade to.
+The thumbnail files of the deleted Objs are removed from disk.
+
+Run with `--dry-run` to only report what would be deleted.
+"""
+import argparse
 import datetime
-from skyportal.models import init_db, Candidate, Source, Obj, DBSession
+from collections import defaultdict
+import os
+import time
+
+import sqlalchemy as sa
+
+from skyportal.models import (
+    init_db,
+    Candidate,
+    Source,
+    Obj,
+    Photometry,
+    Thumbnail,
+    DBSession,
+)
 from baselayer.app.env import load_env
 
 
 env, cfg = load_env()
+
+parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+parser.add_argument(
+    '--dry-run',
+    action='store_true',
+    help='Only count the Objs (and their records) that would be deleted',
+)
+parser.add_argument(
+    '--batch-size',
+    type=int,
+    default=cfg.get("misc.unsaved_candidates_purge.batch_size", 1000),
+    help='Number of Objs deleted per transaction',
+)
+parser.add_argument(
+    '--pause',
+    type=float,
+    default=cfg.get("misc.unsaved_candidates_purge.pause_seconds", 1.0),
+    help='Seconds to wait between batches',
+)
+args, _ = parser.parse_known_args()
+
 init_db(**cfg["database"])
 
 try:
@@ -21,17 +67,135 @@ if not 1 <= n_days <= 30:
         "days_to_keep_unsaved_candidates must be an integer between 1 and 30"
     )
 
+if args.batch_size < 1:
+    raise ValueError("The purge batch size must be a positive integer")
+
 cutoff_datetime = datetime.datetime.now() - datetime.timedelta(days=n_days)
 
-n_deleted = (
-    DBSession()
-    .query(Obj)
-    .filter(Obj.id.in_(DBSession.query(Candidate.obj_id)))
-    .filter(Obj.id.notin_(DBSession.query(Source.obj_id)))
-    .filter(Obj.created_at <= cutoff_datetime)
-    .delete(synchronize_session='fetch')
-)
 
-DBSession.commit()
+def unsaved_obj_ids(after_id, limit):
+    """IDs of the next `limit` purgeable Objs, in order, after `after_id`."""
+    query = (
+        sa.select(Obj.id)
+        .where(sa.exists().where(Candidate.obj_id == Obj.id))
+        .where(~sa.exists().where(Source.obj_id == Obj.id))
+        .where(Obj.created_at <= cutoff_datetime)
+        .order_by(Obj.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        query = query.where(Obj.id > after_id)
+    return DBSession().execute(query).scalars().all()
+
+
+def count_records(cls, obj_ids):
+    return (
+        DBSession()
+        .execute(sa.select(sa.func.count(cls.id)).where(cls.obj_id.in_(obj_ids)))
+        .scalar()
+    )
+
 
-print(f"Deleted {n_deleted} unsaved candidates.")
+def thumbnail_files(obj_ids):
+    return (
+        DBSession()
+        .execute(
+            sa.select(Thumbnail.file_uri)
+            .where(Thumbnail.obj_id.in_(obj_ids))
+            .where(Thumbnail.file_uri.isnot(None))
+        )
+        .scalars()
+        .all()
+    )
+
+
+def delete_objs(obj_ids):
+    """Delete Objs (unless saved in the meantime) along with everything that
+    cascades from them, and return the IDs of the deleted Objs and the
+    thumbnail files left to remove."""
+    objs = Obj.__table__
+    sources = Source.__table__
+    files = defaultdict(list)
+    for obj_id, file_uri in DBSession().execute(
+        sa.select(Thumbnail.obj_id, Thumbnail.file_uri)
+        .where(Thumbnail.obj_id.in_(obj_ids))
+        .where(Thumbnail.file_uri.isnot(None))
+    ):
+        files[obj_id].append(file_uri)
+    deleted_obj_ids = (
+        DBSession()
+        .execute(
+            sa.delete(objs)
+            .where(objs.c.id.in_(obj_ids))
+            .where(~sa.exists().where(sources.c.obj_id == objs.c.id))
+            .returning(objs.c.id)
+        )
+        .scalars()
+        .all()
+    )
+    DBSession().commit()
+    # The files of the Objs saved in the meantime are kept
+    return deleted_obj_ids, [
+        file_uri for obj_id in deleted_obj_ids for file_uri in files[obj_id]
+    ]
+
+
+def remove_files(files):
+    n_removed = 0
+    for file_uri in files:
+        try:
+            os.remove(file_uri)
+            n_removed += 1
+        except (FileNotFoundError, OSError) as e:
+            print(f"Error deleting thumbnail file {file_uri}: {e}")
+    return n_removed
+
+
+totals = dict.fromkeys(['objs', 'candidates', 'photometry', 'thumbnail files'], 0)
+action = "Would delete" if args.dry_run else "Deleted"
+after_id = None
+batch = 0
+while True:
+    obj_ids = unsaved_obj_ids(after_id, args.batch_size)
+    if len(obj_ids) == 0:
+        break
+    after_id = obj_ids[-1]
+    batch += 1
+
+    if args.dry_run:
+        counts = {
+            'objs': len(obj_ids),
+            'candidates': count_records(Candidate, obj_ids),
+            'photometry': count_records(Photometry, obj_ids),
+            'thumbnail files': len(thumbnail_files(obj_ids)),
+        }
+        DBSession().rollback()
+    else:
+        deleted_obj_ids, files = delete_objs(obj_ids)
+        counts = {
+            'objs': len(deleted_obj_ids),
+            'thumbnail files': remove_files(files),
+        }
+
+    for key, count in counts.items():
+        totals[key] += count
+    print(
+        f"Batch {batch}: {action.lower()} "
+        + ", ".join(f"{count} {key}" for key, count in counts.items())
+        + f" ({totals['objs']} objs so far)",
+        flush=True,
+    )
+
+    if len(obj_ids) < args.batch_size:
+        break
+    time.sleep(args.pause)
+
+print(
+    f"{action} {totals['objs']} unsaved candidates older than {n_days} days"
+    + (
+        f" ({totals['candidates']} candidates, {totals['photometry']} "
+        f"photometry points, {totals['thumbnail files']} thumbnail files)."
+        if args.dry_run
+        else f" and {totals['thumbnail files']} thumbnail files."
+    )
+)
@@ -11,7 +11,9 @@ from skyportal.handlers.api import (
     AllocationHandler,
     AssignmentHandler,
     CandidateHandler,
+    CandidateBatchHandler,
     ClassificationHandler,
+    CrossmatchHandler,
     CommentHandler,
     CommentAttachmentHandler,
     AnnotationHandler,
@@ -32,9 +34,13 @@ from skyportal.handlers.api import (
     InvitationHandler,
     UserObjListHandler,
     NewsFeedHandler,
+    ObjDuplicateHandler,
     ObservingRunHandler,
     ObservationPlanRequestHandler,
+    PeriodogramHandler,
     PhotometryHandler,
+    ColumnarPhotometryHandler,
+    PhotometryUploadHandler,
     BulkDeletePhotometryHandler,
     ObjHandler,
     ObjPhotometryHandler,
@@ -93,6 +99,8 @@ from skyportal.handlers.api.internal import (
     RecentGcnEventsHandler,
 )
 
+from skyportal.handlers.api.photometry import recover_photometry_uploads
+
 from . import model_util, openapi
 from .models import init_db
 
@@ -115,12 +123,16 @@ skyportal_handlers = [
     (r'/api/acls', ACLHandler),
     (r'/api/allocation(/.*)?', AllocationHandler),
     (r'/api/assignment(/.*)?', AssignmentHandler),
+    (r'/api/candidates/batch', CandidateBatchHandler),
     (r'/api/candidates(/[0-9A-Za-z-_]+)/([0-9]+)', CandidateHandler),
     (r'/api/candidates(/.*)?', CandidateHandler),
     (r'/api/classification(/[0-9]+)?', ClassificationHandler),
+    (r'/api/crossmatch', CrossmatchHandler),
+    (r'/api/duplicates', ObjDuplicateHandler),
     (r'/api/facility', FacilityMessageHandler),
     (r'/api/filters(/.*)?', FilterHandler),
     (r'/api/followup_request(/.*)?', FollowupRequestHandler),
+    (r'/api/periodogram', PeriodogramHandler),
     (r'/api/photometry_request(/.*)', PhotometryRequestHandler),
     (r'/api/galaxy_catalog(/[0-9]+)?', GalaxyCatalogHandler),
     (r'/api/gcn_event(/.*)?', GcnEventHandler),
@@ -146,6 +158,8 @@ skyportal_handlers = [
     (r'/api/sharing', SharingHandler),
     (r'/api/shift(/.*)?', ShiftHandler),
     (r'/api/photometry/bulk_delete/(.*)', BulkDeletePhotometryHandler),
+    (r'/api/photometry/columnar', ColumnarPhotometryHandler),
+    (r'/api/photometry/uploads/(.+)', PhotometryUploadHandler),
     (r'/api/photometry/range(/.*)?', PhotometryRangeHandler),
     (r'/api/roles', RoleHandler),
     (r'/api/sources(/[0-9A-Za-z-_\.\+]+)/photometry', ObjPhotometryHandler),
@@ -330,6 +344,10 @@ def make_app(cfg, baselayer_handlers, baselayer_settings, process=None, env=None
         print('-' * 78)
 
     model_util.provision_public_group()
+
+    # Resume the asynchronous photometry uploads interrupted by a restart
+    recover_photometry_uploads()
+
     app.openapi_spec = openapi.spec_from_handlers(handlers)
 
     return app
@@ -1,6 +1,6 @@
 from .acls import ACLHandler, UserACLHandler
 from .allocation import AllocationHandler
-from .candidate import CandidateHandler
+from .candidate import CandidateHandler, CandidateBatchHandler
 from .classification import ClassificationHandler, ObjClassificationHandler
 from .comment import CommentHandler, CommentAttachmentHandler
 from .annotation import AnnotationHandler
@@ -32,15 +32,20 @@ from .observingrun import ObservingRunHandler
 from .observation_plan import ObservationPlanRequestHandler
 from .photometry import (
     PhotometryHandler,
+    ColumnarPhotometryHandler,
+    PhotometryUploadHandler,
     ObjPhotometryHandler,
     BulkDeletePhotometryHandler,
     PhotometryRangeHandler,
 )
 from .color_mag import ObjColorMagHandler
+from .crossmatch import CrossmatchHandler
+from .periodogram import PeriodogramHandler
 from .photometry_request import PhotometryRequestHandler
 from .public_group import PublicGroupHandler
 from .roles import RoleHandler, UserRoleHandler
 from .obj import ObjHandler
+from .obj_duplicate import ObjDuplicateHandler
 from .sharing import SharingHandler
 from .shift import ShiftHandler
 from .source import (
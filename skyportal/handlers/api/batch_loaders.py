@@ -0,0 +1,257 @@
+"""Load the records nested under a page of objects (comments, thumbnails,
+classifications, ...) with one permission-filtered `IN` query per kind of
+record, rather than one query per object. Results are keyed by obj_id so
+they can be stitched into the page in memory. `records_exist` similarly
+checks for several kinds of records of a single object in one statement.
+"""
+from collections import defaultdict
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from ...models import (
+    DBSession,
+    Candidate,
+    Classification,
+    Filter,
+    Group,
+    Obj,
+    Source,
+)
+
+
+def records_by_obj_id(cls, obj_ids, user, options=None):
+    """Fetch the records of a class attached to a set of objects.
+
+    Parameters
+    ----------
+    cls : type
+        Model with an `obj_id` column, e.g. `Comment`.
+    obj_ids : list of str
+        IDs of the objects.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions the records are filtered by.
+    options : list, optional
+        Loader options passed to `query_records_accessible_by`.
+
+    Returns
+    -------
+    records : collections.defaultdict
+        Accessible records of each object, keyed by obj_id.
+    """
+    records = defaultdict(list)
+    if len(obj_ids) == 0:
+        return records
+    query = cls.query_records_accessible_by(user, options=options or []).filter(
+        cls.obj_id.in_(obj_ids)
+    )
+    for record in query:
+        records[record.obj_id].append(record)
+    return records
+
+
+def obj_ids_with_records(cls, obj_ids, user):
+    """IDs of the objects with at least one accessible record of a class.
+
+    Parameters
+    ----------
+    cls : type
+        Model with an `obj_id` column, e.g. `Spectrum`.
+    obj_ids : list of str
+        IDs of the objects to check.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions the records are filtered by.
+
+    Returns
+    -------
+    obj_ids : set of str
+    """
+    if len(obj_ids) == 0:
+        return set()
+    query = (
+        cls.query_records_accessible_by(user, columns=[cls.obj_id])
+        .filter(cls.obj_id.in_(obj_ids))
+        .distinct()
+    )
+    return {obj_id for obj_id, in query}
+
+
+def classifications_by_obj_id(obj_ids, user):
+    """Serialized accessible classifications of a set of objects, each with
+    its `groups`.
+
+    Returns
+    -------
+    classifications : collections.defaultdict
+        List of classification dicts of each object, keyed by obj_id.
+    """
+    classifications = defaultdict(list)
+    for obj_id, records in records_by_obj_id(
+        Classification, obj_ids, user, options=[selectinload(Classification.groups)]
+    ).items():
+        for classification in records:
+            classification_dict = classification.to_dict()
+            classification_dict['groups'] = [g.to_dict() for g in classification.groups]
+            classifications[obj_id].append(classification_dict)
+    return classifications
+
+
+def source_groups_by_obj_id(obj_ids, user, filter_sources=None):
+    """Serialized accessible groups that a set of objects are saved to, with
+    the `active`, `requested`, `saved_at` and `saved_by` of each save.
+
+    Parameters
+    ----------
+    obj_ids : list of str
+        IDs of the objects.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions the records are filtered by.
+    filter_sources : callable, optional
+        Function applying additional filters to the query for the `Source`
+        rows, e.g. to only keep active ones.
+
+    Returns
+    -------
+    groups : collections.defaultdict
+        List of group dicts of each object, keyed by obj_id.
+    """
+    groups = defaultdict(list)
+    if len(obj_ids) == 0:
+        return groups
+    accessible_sources = Source.query_records_accessible_by(
+        user, columns=[Source.id]
+    ).filter(Source.obj_id.in_(obj_ids))
+    if filter_sources is not None:
+        accessible_sources = filter_sources(accessible_sources)
+    accessible_groups = Group.query_records_accessible_by(user, columns=[Group.id])
+
+    query = (
+        DBSession()
+        .query(Source, Group)
+        .join(Group, Group.id == Source.group_id)
+        .options(joinedload(Source.saved_by))
+        .filter(Source.id.in_(accessible_sources.subquery()))
+        .filter(Group.id.in_(accessible_groups.subquery()))
+    )
+    for source, group in query:
+        group_dict = group.to_dict()
+        group_dict['active'] = source.active
+        group_dict['requested'] = source.requested
+        group_dict['saved_at'] = source.saved_at
+        group_dict['saved_by'] = (
+            source.saved_by.to_dict() if source.saved_by is not None else None
+        )
+        groups[source.obj_id].append(group_dict)
+    return groups
+
+
+def saved_groups_by_obj_id(obj_ids, user):
+    """Accessible groups that a set of objects are actively saved to.
+
+    Returns
+    -------
+    groups : collections.defaultdict
+        List of `Group`s of each object, keyed by obj_id.
+    """
+    groups = defaultdict(list)
+    if len(obj_ids) == 0:
+        return groups
+    accessible_sources = (
+        Source.query_records_accessible_by(user, columns=[Source.id])
+        .filter(Source.obj_id.in_(obj_ids))
+        .filter(Source.active.is_(True))
+    )
+    accessible_groups = Group.query_records_accessible_by(user, columns=[Group.id])
+
+    query = (
+        DBSession()
+        .query(Source.obj_id, Group)
+        .join(Group, Group.id == Source.group_id)
+        .filter(Source.id.in_(accessible_sources.subquery()))
+        .filter(Group.id.in_(accessible_groups.subquery()))
+    )
+    for obj_id, group in query:
+        groups[obj_id].append(group)
+    return groups
+
+
+def passing_group_ids_by_obj_id(obj_ids, user):
+    """IDs of the groups of the accessible filters that a set of objects
+    passed, one per filter.
+
+    Returns
+    -------
+    group_ids : collections.defaultdict
+        List of group IDs of each object, keyed by obj_id.
+    """
+    group_ids = defaultdict(list)
+    if len(obj_ids) == 0:
+        return group_ids
+    accessible_candidates = Candidate.query_records_accessible_by(
+        user, columns=[Candidate.id]
+    ).filter(Candidate.obj_id.in_(obj_ids))
+    accessible_filters = Filter.query_records_accessible_by(user, columns=[Filter.id])
+
+    query = (
+        DBSession()
+        .query(Candidate.obj_id, Filter.id, Filter.group_id)
+        .join(Filter, Filter.id == Candidate.filter_id)
+        .filter(Candidate.id.in_(accessible_candidates.subquery()))
+        .filter(Filter.id.in_(accessible_filters.subquery()))
+        .distinct()
+    )
+    for obj_id, _, group_id in query:
+        group_ids[obj_id].append(group_id)
+    return group_ids
+
+
+def last_detected_at_by_obj_id(obj_ids, user):
+    """Date of the last detection of each of a set of objects (see
+    `Obj.last_detected_at`), as one correlated subquery per row.
+
+    Returns
+    -------
+    last_detected_at : dict
+        Last detection date (or None) of each object, keyed by obj_id.
+    """
+    if len(obj_ids) == 0:
+        return {}
+    return dict(
+        DBSession()
+        .query(Obj.id, Obj.last_detected_at(user))
+        .filter(Obj.id.in_(obj_ids))
+        .all()
+    )
+
+
+def records_exist(obj_id, user, classes):
+    """Whether an object has any accessible records of each of a set of
+    classes, computed with a single statement of EXISTS subqueries.
+
+    Parameters
+    ----------
+    obj_id : str
+        ID of the object.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions the records are filtered by.
+    classes : list of type
+        Models with an `obj_id` column, e.g. `[Photometry, Spectrum]`.
+
+    Returns
+    -------
+    exist : list of bool
+        Whether any record of each class exists, in order.
+    """
+    if len(classes) == 0:
+        return []
+    return list(
+        DBSession()
+        .query(
+            *[
+                cls.query_records_accessible_by(user, columns=[cls.id])
+                .filter(cls.obj_id == obj_id)
+                .exists()
+                for cls in classes
+            ]
+        )
+        .one()
+    )
@@ -1,8 +1,10 @@
+import base64
 import datetime
 from copy import copy
 import re
 import json
 import uuid
+from distutils.util import strtobool
 
 import arrow
 import numpy as np
@@ -10,12 +12,13 @@ import numpy as np
 from tornado.ioloop import IOLoop
 
 import sqlalchemy as sa
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.sql.expression import case, func
+from sqlalchemy.sql.expression import func
 from sqlalchemy.sql import column, Values
-from sqlalchemy.types import Float, Boolean, String, Integer
+from sqlalchemy.types import String, Integer
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from marshmallow.exceptions import ValidationError
 
 from baselayer.app.access import auth_or_token, permissions
@@ -36,22 +39,49 @@ from ...models import (
     Source,
     Filter,
     Annotation,
+    AnnotationValue,
     Group,
     Classification,
     Listing,
     Comment,
+    derived_coordinates,
+    obj_distances,
+    refresh_duplicates,
+)
+from ...utils.query_cache import make_query_cache
+from .batch_loaders import (
+    last_detected_at_by_obj_id,
+    obj_ids_with_records,
+    passing_group_ids_by_obj_id,
+    records_by_obj_id,
+    saved_groups_by_obj_id,
 )
-from ...utils.cache import Cache, array_to_bytes
 
 
 _, cfg = load_env()
-cache_dir = "cache/candidates_queries"
-cache = Cache(
-    cache_dir=cache_dir,
+# Ordered results of candidate queries, reused when paging through them
+query_cache = make_query_cache(
     max_age=cfg["misc"]["minutes_to_keep_candidate_query_cache"] * 60,
+    **cfg["misc"]["candidate_query_cache"],
 )
 log = make_log('api/candidate')
 
+# Maximum number of candidates per request to `CandidateBatchHandler`
+MAX_CANDIDATES_PER_BATCH = 10000
+# Rows per INSERT statement, keeping within the limit of bind parameters
+OBJ_UPSERT_CHUNK_SIZE = 1000
+CANDIDATE_UPSERT_CHUNK_SIZE = 5000
+# Rows read per statement by `keyset_page`, as a multiple of the page size
+CURSOR_SCAN_FACTOR = 2
+# Obj columns computed from the other ones, which cannot be posted
+OBJ_DERIVED_COLUMNS = (
+    'healpix',
+    'gal_lon',
+    'gal_lat',
+    'internal_key',
+    'redshift_history',
+)
+
 Session = scoped_session(sessionmaker(bind=DBSession.session_factory.kw["bind"]))
 
 
@@ -76,6 +106,34 @@ def add_linked_thumbnails_and_push_ws_msg(obj_id, user_id):
         Session.remove()
 
 
+def add_linked_thumbnails_batch_and_push_ws_msgs(obj_ids, user_id):
+    """Add the linked thumbnails of several new objects in a single
+    transaction (see `add_linked_thumbnails_and_push_ws_msg`)."""
+    session = Session()
+    try:
+        user = session.query(User).get(user_id)
+        accessible_obj_ids = Obj.query_records_accessible_by(
+            user, columns=[Obj.id]
+        ).filter(Obj.id.in_(obj_ids))
+        objs = session.query(Obj).filter(Obj.id.in_(accessible_obj_ids)).all()
+        for obj in objs:
+            obj.add_linked_thumbnails(session=session, commit=False)
+        session.commit()
+        flow = Flow()
+        for obj in objs:
+            flow.push(
+                '*', "skyportal/REFRESH_SOURCE", payload={"obj_key": obj.internal_key}
+            )
+            flow.push(
+                '*', "skyportal/REFRESH_CANDIDATE", payload={"id": obj.internal_key}
+            )
+    except Exception as e:
+        session.rollback()
+        log(f"Unable to add linked thumbnails to {len(obj_ids)} objects: {e}")
+    finally:
+        Session.remove()
+
+
 def update_redshift_history_if_relevant(request_data, obj, user):
     if "redshift" in request_data:
         if obj.redshift_history is None:
@@ -93,6 +151,92 @@ def update_redshift_history_if_relevant(request_data, obj, user):
         obj.redshift_history = redshift_history
 
 
+def serialize_candidates_page(
+    objs,
+    user,
+    group_ids,
+    include_photometry=False,
+    include_spectra=False,
+    include_comments=False,
+):
+    """Serialize a page of candidates along with their nested records.
+
+    Each kind of nested record is fetched for the whole page with a single
+    query (see `batch_loaders`), so the number of queries issued does not
+    depend on the number of candidates on the page.
+
+    Parameters
+    ----------
+    objs : list of `skyportal.models.Obj`
+        Objs on the page, in order.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions nested records are filtered by.
+    group_ids : list of int
+        IDs of the groups whose annotations are listed first.
+    include_photometry, include_spectra, include_comments : bool, optional
+        Whether to include the matching fields (see `CandidateHandler.get`).
+
+    Returns
+    -------
+    candidates : list of dict
+    """
+    obj_ids = [obj.id for obj in objs]
+
+    source_obj_ids = obj_ids_with_records(Source, obj_ids, user)
+    saved_groups = saved_groups_by_obj_id(obj_ids, user)
+    classifications = records_by_obj_id(Classification, obj_ids, user)
+    passing_group_ids = passing_group_ids_by_obj_id(obj_ids, user)
+    annotations = records_by_obj_id(
+        Annotation, obj_ids, user, options=[selectinload(Annotation.groups)]
+    )
+    last_detected_at = last_detected_at_by_obj_id(obj_ids, user)
+    if include_photometry:
+        photometry = records_by_obj_id(
+            Photometry, obj_ids, user, options=[joinedload(Photometry.instrument)]
+        )
+    if include_spectra:
+        spectra = records_by_obj_id(
+            Spectrum, obj_ids, user, options=[joinedload(Spectrum.instrument)]
+        )
+    if include_comments:
+        comments = records_by_obj_id(Comment, obj_ids, user)
+    distances = obj_distances(objs)
+
+    candidates = []
+    for obj, obj_distance in zip(objs, distances):
+        candidate = recursive_to_dict(obj)
+        candidate["is_source"] = obj.id in source_obj_ids
+        if candidate["is_source"]:
+            candidate["saved_groups"] = saved_groups[obj.id]
+            candidate["classifications"] = classifications[obj.id]
+        candidate["passing_group_ids"] = passing_group_ids[obj.id]
+
+        if include_photometry:
+            candidate["photometry"] = photometry[obj.id]
+        if include_spectra:
+            candidate["spectra"] = spectra[obj.id]
+        if include_comments:
+            candidate["comments"] = sorted(
+                comments[obj.id], key=lambda x: x.created_at, reverse=True
+            )
+
+        selected_groups_annotations = []
+        other_annotations = []
+        for annotation in sorted(annotations[obj.id], key=lambda x: x.origin):
+            if set(group_ids).intersection({group.id for group in annotation.groups}):
+                selected_groups_annotations.append(annotation)
+            else:
+                other_annotations.append(annotation)
+        candidate["annotations"] = selected_groups_annotations + other_annotations
+
+        candidate["last_detected_at"] = last_detected_at.get(obj.id)
+        candidate["gal_lat"] = obj.gal_lat_deg
+        candidate["gal_lon"] = obj.gal_lon_deg
+        candidate.update(obj_distance)
+        candidates.append(candidate)
+    return candidates
+
+
 class CandidateHandler(BaseHandler):
     @auth_or_token
     def head(self, obj_id=None):
@@ -187,6 +331,33 @@ class CandidateHandler(BaseHandler):
             description: |
               Used only in the case of paginating query results - if provided, this
               allows for avoiding a potentially expensive query.count() call.
+          - in: query
+            name: useCursor
+            nullable: true
+            schema:
+              type: boolean
+            description: |
+              Boolean indicating whether to paginate with cursors rather than page
+              numbers: the response then includes a `nextCursor` to pass as `cursor`
+              to fetch the next page (null on the last page), and deep pages are as
+              fast to retrieve as the first one. Not available when sorting by
+              annotation. Defaults to false.
+          - in: query
+            name: cursor
+            nullable: true
+            schema:
+              type: string
+            description: |
+              Cursor returned as `nextCursor` with the previous page, implies
+              `useCursor`.
+          - in: query
+            name: includeTotalMatches
+            nullable: true
+            schema:
+              type: boolean
+            description: |
+              With cursor pagination, whether to also count the total number of
+              matches (`totalMatches`). Defaults to false.
           - in: query
             name: savedStatus
             nullable: true
@@ -338,6 +509,22 @@ class CandidateHandler(BaseHandler):
               type: number
             description: |
               If provided, return only candidates with a redshift of at most this value
+          - in: query
+            name: minGalLat
+            nullable: true
+            schema:
+              type: number
+            description: |
+              If provided, return only candidates with an absolute galactic latitude
+              of at least this value [deg], i.e. away from the Galactic plane
+          - in: query
+            name: maxGalLat
+            nullable: true
+            schema:
+              type: number
+            description: |
+              If provided, return only candidates with an absolute galactic latitude
+              of at most this value [deg]
           - in: query
             name: listName
             nullable: true
@@ -380,6 +567,9 @@ class CandidateHandler(BaseHandler):
                                 type: integer
                               numPerPage:
                                 type: integer
+                              nextCursor:
+                                type: string
+                                nullable: true
             400:
               content:
                 application/json:
@@ -483,9 +673,7 @@ class CandidateHandler(BaseHandler):
             candidate_info["last_detected_at"] = c.last_detected_at(self.current_user)
             candidate_info["gal_lon"] = c.gal_lon_deg
             candidate_info["gal_lat"] = c.gal_lat_deg
-            candidate_info["luminosity_distance"] = c.luminosity_distance
-            candidate_info["dm"] = c.dm
-            candidate_info["angular_diameter_distance"] = c.angular_diameter_distance
+            candidate_info.update(obj_distances([c])[0])
 
             candidate_info = recursive_to_dict(candidate_info)
             self.verify_and_commit()
@@ -498,6 +686,13 @@ class CandidateHandler(BaseHandler):
         query_id = self.get_query_argument("queryID", None)
         saved_status = self.get_query_argument("savedStatus", "all")
         total_matches = self.get_query_argument("totalMatches", None)
+        cursor = self.get_query_argument("cursor", None)
+        use_cursor = cursor is not None or bool(
+            strtobool(self.get_query_argument("useCursor", "False"))
+        )
+        include_total_matches = bool(
+            strtobool(self.get_query_argument("includeTotalMatches", "False"))
+        )
         start_date = self.get_query_argument("startDate", None)
         end_date = self.get_query_argument("endDate", None)
         group_ids = self.get_query_argument("groupIDs", None)
@@ -513,6 +708,8 @@ class CandidateHandler(BaseHandler):
         classifications = self.get_query_argument("classifications", None)
         min_redshift = self.get_query_argument("minRedshift", None)
         max_redshift = self.get_query_argument("maxRedshift", None)
+        min_gal_lat = self.get_query_argument("minGalLat", None)
+        max_gal_lat = self.get_query_argument("maxGalLat", None)
         list_name = self.get_query_argument('listName', None)
         list_name_reject = self.get_query_argument('listNameReject', None)
 
@@ -584,9 +781,6 @@ class CandidateHandler(BaseHandler):
         q = Obj.query_records_accessible_by(self.current_user).join(
             candidate_subquery, Obj.id == candidate_subquery.c.obj_id
         )
-        if sort_by_origin is not None or annotation_filter_list is not None:
-            q = q.outerjoin(Annotation)
-
         if classifications is not None:
             if isinstance(classifications, str) and "," in classifications:
                 classifications = [c.strip() for c in classifications.split(",")]
@@ -675,6 +869,25 @@ class CandidateHandler(BaseHandler):
                     "Invalid values for maxRedshift - could not convert to float"
                 )
             q = q.filter(Obj.redshift <= max_redshift)
+        # Ranges on gal_lat rather than abs(gal_lat), so that its index is used
+        if min_gal_lat is not None:
+            try:
+                min_gal_lat = float(min_gal_lat)
+            except ValueError:
+                return self.error(
+                    "Invalid values for minGalLat - could not convert to float"
+                )
+            q = q.filter(
+                sa.or_(Obj.gal_lat >= min_gal_lat, Obj.gal_lat <= -min_gal_lat)
+            )
+        if max_gal_lat is not None:
+            try:
+                max_gal_lat = float(max_gal_lat)
+            except ValueError:
+                return self.error(
+                    "Invalid values for maxGalLat - could not convert to float"
+                )
+            q = q.filter(Obj.gal_lat.between(-max_gal_lat, max_gal_lat))
 
         if annotation_exclude_origin is not None:
             if annotation_exclude_date is None:
@@ -738,13 +951,15 @@ class CandidateHandler(BaseHandler):
                         f"Invalid annotation filter list item {item}: \"key\" is required."
                     )
 
+                annotation_values = sa.select(AnnotationValue.obj_id).where(
+                    AnnotationValue.origin == new_filter["origin"],
+                    AnnotationValue.key == new_filter["key"],
+                )
                 if "value" in new_filter:
                     value = new_filter["value"]
                     if isinstance(value, bool):
-                        q = q.filter(
-                            Annotation.origin == new_filter["origin"],
-                            Annotation.data[new_filter["key"]].astext.cast(Boolean)
-                            == value,
+                        annotation_values = annotation_values.where(
+                            AnnotationValue.bool_value == value
                         )
                     else:
                         # Test if the value is a nested object
@@ -762,23 +977,24 @@ class CandidateHandler(BaseHandler):
                             # If not, this is just a string field and we don't
                             # need the string formatting above
                             pass
-                        q = q.filter(
-                            Annotation.origin == new_filter["origin"],
-                            Annotation.data[new_filter["key"]].astext == value,
+                        # text values are indexed by their hash
+                        annotation_values = annotation_values.where(
+                            func.md5(AnnotationValue.text_value) == func.md5(value),
+                            AnnotationValue.text_value == value,
                         )
+                    q = q.filter(Obj.id.in_(annotation_values))
                 elif "min" in new_filter and "max" in new_filter:
                     try:
                         min_value = float(new_filter["min"])
                         max_value = float(new_filter["max"])
-                        q = q.filter(
-                            Annotation.origin == new_filter["origin"],
-                            Annotation.data[new_filter["key"]].cast(Float) >= min_value,
-                            Annotation.data[new_filter["key"]].cast(Float) <= max_value,
-                        )
                     except ValueError:
                         return self.error(
                             f"Invalid annotation filter list item: {item}. The min/max provided is not a valid number."
                         )
+                    annotation_values = annotation_values.where(
+                        AnnotationValue.numeric_value.between(min_value, max_value)
+                    )
+                    q = q.filter(Obj.id.in_(annotation_values))
                 else:
                     return self.error(
                         f"Invalid annotation filter list item: {item}. Should have either \"value\" or \"min\" and \"max\""
@@ -787,143 +1003,90 @@ class CandidateHandler(BaseHandler):
         if sort_by_origin is not None:
             sort_by_key = self.get_query_argument("sortByAnnotationKey", None)
             sort_by_order = self.get_query_argument("sortByAnnotationOrder", None)
-            # Define a custom sort order to have annotations from the correct
-            # origin first, all others afterwards
-            origin_sort_order = case(
-                value=Annotation.origin,
-                whens={sort_by_origin: 1},
-                else_=None,
+            # Sort the objects with an annotation from the correct origin
+            # first, by the value of the key, then all others afterwards
+            sort_annotation = (
+                DBSession()
+                .query(Annotation.id, Annotation.obj_id)
+                .filter(Annotation.origin == sort_by_origin)
+                .subquery()
             )
-            annotation_sort_criterion = (
-                Annotation.data[sort_by_key].desc().nullslast()
-                if sort_by_order == "desc"
-                else Annotation.data[sort_by_key].nullslast()
+            sort_value = (
+                DBSession()
+                .query(
+                    AnnotationValue.annotation_id,
+                    AnnotationValue.numeric_value,
+                    AnnotationValue.text_value,
+                )
+                .filter(
+                    AnnotationValue.origin == sort_by_origin,
+                    AnnotationValue.key == sort_by_key,
+                )
+                .subquery()
             )
+            q = q.outerjoin(
+                sort_annotation, sort_annotation.c.obj_id == Obj.id
+            ).outerjoin(sort_value, sort_value.c.annotation_id == sort_annotation.c.id)
+            sort_values = [sort_value.c.numeric_value, sort_value.c.text_value]
+            if sort_by_order == "desc":
+                sort_values = [value.desc() for value in sort_values]
+            annotation_sort_criteria = [value.nullslast() for value in sort_values]
             # Don't apply the order by just yet. Save it so we can pass it to
             # the LIMT/OFFSET helper function.
             order_by = [
-                origin_sort_order.nullslast(),
-                annotation_sort_criterion,
+                sort_annotation.c.id.is_(None),
+                *annotation_sort_criteria,
                 candidate_subquery.c.passed_at.desc().nullslast(),
                 Obj.id,
             ]
 
-        try:
-            query_results = grab_query_results(
-                q,
-                total_matches,
-                page,
-                n_per_page,
-                "candidates",
-                order_by=order_by,
-                query_id=query_id,
-                use_cache=True,
-            )
-        except ValueError as e:
-            if "Page number out of range" in str(e):
-                return self.error("Page number out of range.")
-            raise
-
-        matching_source_ids = (
-            Source.query_records_accessible_by(
-                self.current_user, columns=[Source.obj_id]
-            )
-            .filter(Source.obj_id.in_([obj.id for obj, in query_results["candidates"]]))
-            .all()
-        )
-        candidate_list = []
-        for (obj,) in query_results["candidates"]:
-            with DBSession().no_autoflush:
-                obj.is_source = (obj.id,) in matching_source_ids
-                if obj.is_source:
-                    source_subquery = (
-                        Source.query_records_accessible_by(self.current_user)
-                        .filter(Source.obj_id == obj.id)
-                        .filter(Source.active.is_(True))
-                        .subquery()
-                    )
-                    obj.saved_groups = (
-                        Group.query_records_accessible_by(self.current_user)
-                        .join(source_subquery, Group.id == source_subquery.c.group_id)
-                        .all()
-                    )
-                    obj.classifications = (
-                        Classification.query_records_accessible_by(self.current_user)
-                        .filter(Classification.obj_id == obj.id)
-                        .all()
-                    )
-                obj.passing_group_ids = [
-                    f.group_id
-                    for f in (
-                        Filter.query_records_accessible_by(self.current_user).filter(
-                            Filter.id.in_(
-                                Candidate.query_records_accessible_by(
-                                    self.current_user, columns=[Candidate.filter_id]
-                                ).filter(Candidate.obj_id == obj.id)
-                            )
-                        )
-                    )
-                ]
-                candidate_list.append(recursive_to_dict(obj))
-                if include_photometry:
-                    candidate_list[-1]["photometry"] = (
-                        Photometry.query_records_accessible_by(
-                            self.current_user,
-                            mode='read',
-                            options=[joinedload(Photometry.instrument)],
-                        )
-                        .filter(Photometry.obj_id == obj.id)
-                        .all()
-                    )
-
-                if include_spectra:
-                    candidate_list[-1]["spectra"] = (
-                        Spectrum.query_records_accessible_by(
-                            self.current_user,
-                            mode='read',
-                            options=[joinedload(Spectrum.instrument)],
-                        )
-                        .filter(Spectrum.obj_id == obj.id)
-                        .all()
-                    )
-
-                if include_comments:
-                    candidate_list[-1]["comments"] = sorted(
-                        Comment.query_records_accessible_by(self.current_user)
-                        .filter(Comment.obj_id == obj.id)
-                        .all(),
-                        key=lambda x: x.created_at,
-                        reverse=True,
-                    )
-                unordered_annotations = sorted(
-                    Annotation.query_records_accessible_by(self.current_user)
-                    .filter(Annotation.obj_id == obj.id)
-                    .all(),
-                    key=lambda x: x.origin,
+        if use_cursor:
+            if sort_by_origin is not None:
+                return self.error(
+                    "Cursor pagination is not available when sorting by annotation."
                 )
-                selected_groups_annotations = []
-                other_annotations = []
-                for annotation in unordered_annotations:
-                    if set(group_ids).intersection(
-                        {group.id for group in annotation.groups}
-                    ):
-                        selected_groups_annotations.append(annotation)
-                    else:
-                        other_annotations.append(annotation)
-                candidate_list[-1]["annotations"] = (
-                    selected_groups_annotations + other_annotations
+            try:
+                query_results = grab_query_results_by_cursor(
+                    q,
+                    candidate_subquery.c.passed_at,
+                    "passed_at",
+                    "desc",
+                    cursor,
+                    n_per_page,
+                    "candidates",
+                    include_total_matches=include_total_matches,
+                    id_column=candidate_subquery.c.obj_id,
                 )
-                candidate_list[-1]["last_detected_at"] = obj.last_detected_at(
-                    self.current_user
+            except ValueError as e:
+                return self.error(str(e))
+        else:
+            try:
+                query_results = grab_query_results(
+                    q,
+                    total_matches,
+                    page,
+                    n_per_page,
+                    "candidates",
+                    order_by=order_by,
+                    query_id=query_id,
+                    use_cache=True,
+                    cache_tags=[
+                        filter_cache_tag(filter_id) for filter_id in filter_ids
+                    ],
                 )
-                candidate_list[-1]["gal_lat"] = obj.gal_lat_deg
-                candidate_list[-1]["gal_lon"] = obj.gal_lon_deg
-                candidate_list[-1]["luminosity_distance"] = obj.luminosity_distance
-                candidate_list[-1]["dm"] = obj.dm
-                candidate_list[-1][
-                    "angular_diameter_distance"
-                ] = obj.angular_diameter_distance
-
+            except ValueError as e:
+                if "Page number out of range" in str(e):
+                    return self.error("Page number out of range.")
+                raise
+
+        candidate_list = serialize_candidates_page(
+            [obj for obj, in query_results["candidates"]],
+            self.current_user,
+            group_ids,
+            include_photometry=include_photometry,
+            include_spectra=include_spectra,
+            include_comments=include_comments,
+        )
         query_results["candidates"] = candidate_list
         query_results = recursive_to_dict(query_results)
         self.verify_and_commit()
@@ -1034,6 +1197,8 @@ class CandidateHandler(BaseHandler):
             return self.error(
                 f"Failed to post candidate for object {obj.id}: {e.args[0]}"
             )
+        # Cached results of queries over these filters are now stale
+        query_cache.invalidate([filter_cache_tag(f.id) for f in filters])
 
         if not obj_already_exists:
             IOLoop.current().run_in_executor(
@@ -1086,6 +1251,336 @@ class CandidateHandler(BaseHandler):
         return self.success()
 
 
+def upsert_objs(rows, session):
+    """Insert or update Objs with set-based `INSERT ... ON CONFLICT`
+    statements. Rows setting different columns are upserted separately, so
+    that only the columns given for an existing Obj are updated.
+
+    The derived columns (galactic coordinates, HEALPix index) of rows with a
+    position, and the redshift history of rows with a redshift, are filled
+    in here, as the ORM event listeners maintaining them are bypassed.
+
+    Parameters
+    ----------
+    rows : list of dict
+        Column values of each Obj, including `id`. Rows with a position must
+        give both `ra` and `dec`.
+    session : `sqlalchemy.orm.Session`
+        Session whose transaction to run in.
+
+    Returns
+    -------
+    new_obj_ids : set of str
+        IDs of the Objs that were inserted rather than updated.
+    """
+    table = Obj.__table__
+    utcnow = datetime.datetime.utcnow()
+    positioned = [row for row in rows if row.get('ra') is not None]
+    if len(positioned) > 0:
+        gal_lon, gal_lat, healpix = derived_coordinates(
+            [row['ra'] for row in positioned], [row['dec'] for row in positioned]
+        )
+        for row, lon, lat, hpx in zip(positioned, gal_lon, gal_lat, healpix):
+            row.update(gal_lon=float(lon), gal_lat=float(lat), healpix=int(hpx))
+
+    groups = {}
+    for row in sorted(rows, key=lambda row: row['id']):
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    new_obj_ids = set()
+    for columns, group in groups.items():
+        update_columns = [column for column in columns if column != 'id']
+        for start in range(0, len(group), OBJ_UPSERT_CHUNK_SIZE):
+            insert = pg_insert(table).values(
+                group[start : start + OBJ_UPSERT_CHUNK_SIZE]
+            )
+            if len(update_columns) == 0:
+                insert = insert.on_conflict_do_nothing(index_elements=['id'])
+            else:
+                set_ = {column: insert.excluded[column] for column in update_columns}
+                if 'redshift_history' in set_:
+                    set_['redshift_history'] = sa.func.coalesce(
+                        table.c.redshift_history, sa.text("'[]'::jsonb")
+                    ).op('||')(insert.excluded.redshift_history)
+                set_['modified'] = utcnow
+                insert = insert.on_conflict_do_update(index_elements=['id'], set_=set_)
+            # xmax is only zero for rows that were inserted
+            result = session.execute(
+                insert.returning(table.c.id, sa.literal_column('xmax = 0'))
+            )
+            new_obj_ids.update(obj_id for obj_id, inserted in result if inserted)
+    return new_obj_ids
+
+
+def upsert_candidates(rows, session):
+    """Insert Candidates with set-based `INSERT ... ON CONFLICT` statements.
+    A Candidate that already passed the same filter at the same time has its
+    `passing_alert_id` updated instead.
+
+    Parameters
+    ----------
+    rows : list of dict
+        Column values of each Candidate.
+    session : `sqlalchemy.orm.Session`
+        Session whose transaction to run in.
+
+    Returns
+    -------
+    ids : dict
+        ID of each Candidate, keyed by (obj_id, filter_id, passed_at).
+    """
+    table = Candidate.__table__
+    utcnow = datetime.datetime.utcnow()
+    rows = sorted(rows, key=lambda row: (row['obj_id'], row['filter_id']))
+    ids = {}
+    for start in range(0, len(rows), CANDIDATE_UPSERT_CHUNK_SIZE):
+        insert = pg_insert(table).values(
+            rows[start : start + CANDIDATE_UPSERT_CHUNK_SIZE]
+        )
+        insert = insert.on_conflict_do_update(
+            index_elements=['obj_id', 'filter_id', 'passed_at'],
+            set_={
+                'passing_alert_id': insert.excluded.passing_alert_id,
+                'modified': utcnow,
+            },
+        )
+        result = session.execute(
+            insert.returning(
+                table.c.id, table.c.obj_id, table.c.filter_id, table.c.passed_at
+            )
+        )
+        for candidate_id, obj_id, filter_id, passed_at in result:
+            ids[(obj_id, filter_id, passed_at)] = candidate_id
+    return ids
+
+
+class CandidateBatchHandler(BaseHandler):
+    @permissions(["Upload data"])
+    def post(self):
+        """
+        ---
+        description: |
+          Create or update many objects and their candidates in a single
+          transaction. Each item is validated separately: invalid items are
+          reported in the results, and the others are saved.
+        tags:
+          - candidates
+        requestBody:
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  candidates:
+                    type: array
+                    items:
+                      allOf:
+                        - $ref: '#/components/schemas/ObjPost'
+                        - type: object
+                          properties:
+                            filter_ids:
+                              type: array
+                              items:
+                                type: integer
+                              description: List of associated filter IDs
+                            passing_alert_id:
+                              type: integer
+                              description: ID of associated filter that created candidate
+                              nullable: true
+                            passed_at:
+                              type: string
+                              description: Arrow-parseable datetime string indicating when passed filter.
+                          required:
+                            - filter_ids
+                            - passed_at
+                    description: |
+                      Candidates to post, each as for `POST /api/candidates`.
+                      At most 10000 per request.
+                required:
+                  - candidates
+        responses:
+          200:
+            content:
+              application/json:
+                schema:
+                  allOf:
+                    - $ref: '#/components/schemas/Success'
+                    - type: object
+                      properties:
+                        data:
+                          type: object
+                          properties:
+                            results:
+                              type: array
+                              items:
+                                type: object
+                                properties:
+                                  status:
+                                    type: string
+                                    enum: [success, error]
+                                  obj_id:
+                                    type: string
+                                  ids:
+                                    type: array
+                                    items:
+                                      type: integer
+                                    description: IDs of the item's candidates
+                                  message:
+                                    type: string
+                                    description: Why the item was rejected
+                              description: Result of each item, in order
+          400:
+            content:
+              application/json:
+                schema: Error
+        """
+        items = self.get_json().get('candidates')
+        if not isinstance(items, list) or len(items) == 0:
+            return self.error('candidates must be a non-empty list')
+        if len(items) > MAX_CANDIDATES_PER_BATCH:
+            return self.error(
+                f'Cannot post more than {MAX_CANDIDATES_PER_BATCH} candidates '
+                'at a time'
+            )
+        if not all(isinstance(item, dict) for item in items):
+            return self.error('Each candidate must be an object')
+
+        session = DBSession()
+        user = self.associated_user_object
+        schema = Obj.__schema__()
+
+        existing = {
+            obj_id: (ra, dec)
+            for obj_id, ra, dec in session.query(Obj.id, Obj.ra, Obj.dec).filter(
+                Obj.id.in_(
+                    {item['id'] for item in items if isinstance(item.get('id'), str)}
+                )
+            )
+        }
+        filter_ids = {
+            filter_id
+            for item in items
+            if isinstance(item.get('filter_ids'), list)
+            for filter_id in item['filter_ids']
+            if isinstance(filter_id, int)
+        }
+        filters = {
+            f.id: f
+            for f in Filter.query_records_accessible_by(self.current_user).filter(
+                Filter.id.in_(filter_ids)
+            )
+        }
+
+        results = [None] * len(items)
+        obj_rows = {}
+        candidate_rows = {}
+        for i, item in enumerate(items):
+            data = {k: v for k, v in item.items() if k in schema.fields}
+            errors = schema.validate(data)
+            if errors:
+                results[i] = f"Invalid/missing parameters: {errors}"
+                continue
+            obj_id = data.get('id')
+            if not isinstance(obj_id, str):
+                results[i] = "Missing required parameter: `id`."
+                continue
+            if obj_id not in existing and (
+                data.get('ra') is None or data.get('dec') is None
+            ):
+                results[i] = "RA and Dec must not be null for a new Obj"
+                continue
+            if item.get('passed_at') is None:
+                results[i] = "Missing required parameter: `passed_at`."
+                continue
+            try:
+                passed_at = arrow.get(item['passed_at']).to('utc').naive
+            except (TypeError, ValueError):
+                results[i] = f"Invalid passed_at: {item['passed_at']}"
+                continue
+            item_filters = [
+                filters[filter_id]
+                for filter_id in item.get('filter_ids') or []
+                if filter_id in filters
+            ]
+            if len(item_filters) == 0:
+                results[i] = "At least one valid filter ID must be provided."
+                continue
+
+            row = {k: v for k, v in data.items() if k not in OBJ_DERIVED_COLUMNS}
+            if ('ra' in row) != ('dec' in row):
+                ra, dec = existing[obj_id]
+                row.setdefault('ra', ra)
+                row.setdefault('dec', dec)
+            if 'redshift' in row:
+                row['redshift_history'] = [
+                    {
+                        "set_by_user_id": user.id,
+                        "set_at_utc": datetime.datetime.utcnow().isoformat(),
+                        "value": row['redshift'],
+                        "uncertainty": row.get('redshift_error', None),
+                    }
+                ]
+            # Later items for the same Obj take precedence
+            obj_rows.setdefault(obj_id, {}).update(row)
+
+            keys = []
+            for f in item_filters:
+                key = (obj_id, f.id, passed_at)
+                candidate_rows[key] = {
+                    'obj_id': obj_id,
+                    'filter_id': f.id,
+                    'passed_at': passed_at,
+                    'passing_alert_id': item.get('passing_alert_id'),
+                    'uploader_id': user.id,
+                }
+                keys.append(key)
+            results[i] = keys
+
+        try:
+            new_obj_ids = upsert_objs(list(obj_rows.values()), session)
+            refresh_duplicates(
+                [obj_id for obj_id, row in obj_rows.items() if 'ra' in row],
+                session=session,
+            )
+            candidate_ids = upsert_candidates(list(candidate_rows.values()), session)
+            self.verify_and_commit()
+        except IntegrityError as e:
+            session.rollback()
+            return self.error(f"Failed to post candidates: {e.args[0]}")
+        # Cached results of queries over these filters are now stale
+        query_cache.invalidate(
+            [filter_cache_tag(filter_id) for _, filter_id, _ in candidate_rows]
+        )
+
+        if len(new_obj_ids) > 0:
+            IOLoop.current().run_in_executor(
+                None,
+                lambda: add_linked_thumbnails_batch_and_push_ws_msgs(
+                    list(new_obj_ids), user.id
+                ),
+            )
+
+        return self.success(
+            data={
+                "results": [
+                    {"status": "error", "message": result}
+                    if isinstance(result, str)
+                    else {
+                        "status": "success",
+                        "obj_id": result[0][0],
+                        "ids": [candidate_ids[key] for key in result],
+                    }
+                    for result in results
+                ]
+            }
+        )
+
+
+def filter_cache_tag(filter_id):
+    """Tag of the `query_cache` entries of queries over a Filter's candidates."""
+    return f"filter:{filter_id}"
+
+
 def get_obj_id_values(obj_ids):
     """Return a Postgres VALUES representation of ordered list of Obj IDs
     to be returned by the Candidates/Sources query.
@@ -1129,6 +1624,7 @@ def grab_query_results(
     include_thumbnails=True,
     query_id=None,
     use_cache=False,
+    cache_tags=(),
     include_detection_stats=False,
     current_user=None,
 ):
@@ -1136,6 +1632,8 @@ def grab_query_results(
     Returns a SQLAlchemy Query object (which is iterable) for the sorted Obj IDs desired.
     If there are no matching Objs, an empty list [] is returned instead.
     include_detection_stats is added to the pagination query directly here.
+    With use_cache, the full ordered list of Obj IDs is stored in `query_cache`
+    under query_id (tagged with cache_tags) and reused for subsequent pages.
     """
     # The query will return multiple rows per candidate object if it has multiple
     # annotations associated with it, with rows appearing at the end of the query
@@ -1185,34 +1683,34 @@ def grab_query_results(
         .order_by(ids_with_row_nums.c.row_num)
     )
 
-    if page:
-        if use_cache:
-            cache_filename = cache[query_id]
-            if cache_filename is not None:
-                all_ids = np.load(cache_filename)
-            else:
-                # Cache expired/removed/non-existent; create new cache file
-                query_id = str(uuid.uuid4())
-                all_ids = ordered_ids.all()
-                cache[query_id] = array_to_bytes(all_ids)
-
-            results = all_ids[
-                ((page - 1) * n_items_per_page) : (page * n_items_per_page)
-            ]
-            info["queryID"] = query_id
-        else:
+    if page and use_cache:
+        all_ids = query_cache.get(query_id) if query_id is not None else None
+        if all_ids is None:
+            # Cache expired/removed/invalidated/non-existent; create new entry
+            query_id = str(uuid.uuid4())
+            all_ids = np.array([obj_id for obj_id, _ in ordered_ids.all()], dtype=str)
+            query_cache.set(query_id, all_ids, tags=cache_tags)
+
+        obj_ids_in_page = all_ids[
+            ((page - 1) * n_items_per_page) : (page * n_items_per_page)
+        ].tolist()
+        info["totalMatches"] = len(all_ids)
+        info["queryID"] = query_id
+    else:
+        if page:
             results = (
                 ordered_ids.limit(n_items_per_page)
                 .offset((page - 1) * n_items_per_page)
                 .all()
             )
+        else:
+            results = ordered_ids.all()
+        obj_ids_in_page = list(map(lambda x: x[0], results))
+        info["totalMatches"] = int(results[0][1]) if len(results) > 0 else 0
+
+    if page:
         info["pageNumber"] = page
         info["numPerPage"] = n_items_per_page
-    else:
-        results = ordered_ids.all()
-
-    obj_ids_in_page = list(map(lambda x: x[0], results))
-    info["totalMatches"] = int(results[0][1]) if len(results) > 0 else 0
 
     if page:
         if (
@@ -1232,6 +1730,25 @@ def grab_query_results(
         ):
             raise ValueError("Page number out of range.")
 
+    info[items_name] = load_page_items(
+        obj_ids_in_page,
+        include_thumbnails=include_thumbnails,
+        include_detection_stats=include_detection_stats,
+        current_user=current_user,
+    )
+    return info
+
+
+def load_page_items(
+    obj_ids_in_page,
+    include_thumbnails=True,
+    include_detection_stats=False,
+    current_user=None,
+):
+    """
+    Load the Objs of a page of results, in order, along with their
+    thumbnails and/or detection stats.
+    """
     if include_detection_stats:
         # Load in all last_detected_at values at once
         last_detected_at = Obj.last_detected_at(current_user)
@@ -1305,5 +1822,221 @@ def grab_query_results(
                     .all()
                 )
 
-    info[items_name] = items
+    return items
+
+
+def encode_cursor(sort_by, sort_order, sort_value, obj_id):
+    """
+    Encode the position of the last item of a page as an opaque cursor.
+    The sort parameters are included so the cursor cannot be reused with
+    a different sort.
+    """
+    if isinstance(sort_value, datetime.datetime):
+        sort_value = {"datetime": sort_value.isoformat()}
+    payload = json.dumps([sort_by, sort_order, sort_value, obj_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, sort_by, sort_order):
+    """
+    Decode a cursor produced by `encode_cursor`, returning the sort value and
+    Obj ID of the last item of the previous page. Raises a ValueError if the
+    cursor is invalid or was produced for a different sort.
+    """
+    try:
+        cursor_sort_by, cursor_sort_order, sort_value, obj_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if [cursor_sort_by, cursor_sort_order] != [sort_by, sort_order]:
+        raise ValueError("Cursor does not match the requested sort order.")
+    if isinstance(sort_value, dict):
+        sort_value = datetime.datetime.fromisoformat(sort_value["datetime"])
+    return sort_value, obj_id
+
+
+def after_sort_key(sort_column, id_column, sort_value, obj_id, descending):
+    """Condition selecting the rows sorted after (`sort_value`, `obj_id`),
+    nulls last, on the columns of the paginated query."""
+    if sort_value is None:
+        return sa.and_(sort_column.is_(None), id_column > obj_id)
+    return sa.or_(
+        sort_column < sort_value if descending else sort_column > sort_value,
+        sa.and_(sort_column == sort_value, id_column > obj_id),
+        sort_column.is_(None),
+    )
+
+
+def keyset_page(q, sort_column, id_column, descending, after, n_items):
+    """The first `n_items` Objs of `q` sorted after a key.
+
+    The rows of `q` are read in order from the key, with a WHERE clause and
+    a LIMIT on the sort and ID columns, so that they can be read from their
+    indexes without scanning the preceding (or following) matches. Since an
+    Obj can appear in several rows, rows are read in batches until enough
+    distinct Objs are found. Objs whose key (see
+    `grab_query_results_by_cursor`) comes before `after` were on a previous
+    page, and are skipped; this is checked with one query restricted to the
+    IDs read in each batch.
+
+    Parameters
+    ----------
+    q : sqlalchemy.orm.Query
+        Query for the Objs to paginate.
+    sort_column, id_column : sqlalchemy.sql.ColumnElement
+        Columns of `q` holding the sort value and the Obj ID.
+    descending : bool
+        Whether to sort in descending order. Nulls are sorted last.
+    after : tuple or None
+        Sort value and Obj ID of the last Obj of the previous page, or None
+        for the first page.
+    n_items : int
+        Number of Objs to return.
+
+    Returns
+    -------
+    rows : list of (str, object)
+        ID and sort key of each Obj, in order.
+    """
+    rows_query = (
+        q.enable_eagerloads(False)
+        .with_entities(id_column, sort_column)
+        .order_by(None)
+        .order_by(
+            sort_column.desc().nullslast() if descending else sort_column.nullslast(),
+            id_column,
+        )
+    )
+    aggregate = func.max if descending else func.min
+    batch_size = CURSOR_SCAN_FACTOR * n_items
+    page = []
+    seen_ids = set()
+    while len(page) < n_items:
+        batch_query = rows_query
+        if after is not None:
+            batch_query = batch_query.filter(
+                after_sort_key(sort_column, id_column, *after, descending)
+            )
+        batch = batch_query.limit(batch_size).all()
+
+        first_rows = {}
+        for obj_id, sort_value in batch:
+            if obj_id not in seen_ids and obj_id not in first_rows:
+                first_rows[obj_id] = sort_value
+        seen_ids.update(first_rows)
+        if len(first_rows) > 0:
+            sort_keys = dict(
+                q.enable_eagerloads(False)
+                .order_by(None)
+                .with_entities(id_column, aggregate(sort_column))
+                .filter(id_column.in_(list(first_rows)))
+                .group_by(id_column)
+                .all()
+            )
+            page.extend(
+                (obj_id, sort_value)
+                for obj_id, sort_value in first_rows.items()
+                if sort_keys.get(obj_id) == sort_value
+            )
+
+        if len(batch) < batch_size:
+            break
+        last_id, last_sort_value = batch[-1]
+        after = (last_sort_value, last_id)
+    return page[:n_items]
+
+
+def grab_query_results_by_cursor(
+    q,
+    sort_column,
+    sort_by,
+    sort_order,
+    cursor,
+    n_items_per_page,
+    items_name,
+    include_thumbnails=True,
+    include_detection_stats=False,
+    current_user=None,
+    include_total_matches=False,
+    id_column=Obj.id,
+):
+    """
+    Keyset ("cursor") counterpart of `grab_query_results`: returns the page of
+    Objs following `cursor` rather than the page at a given offset.
+
+    Each Obj is keyed by the first value of `sort_column` it appears with
+    in `q` (the max when sorting in descending order, the min otherwise),
+    with ties broken by Obj ID. The page is then read from the rows of `q`
+    following the cursor (see `keyset_page`), so that no preceding rows need
+    to be numbered, skipped or aggregated. The total number of matches is
+    only counted if `include_total_matches` is set.
+
+    Parameters
+    ----------
+    q : sqlalchemy.orm.Query
+        Query for the Objs to paginate.
+    sort_column : sqlalchemy.sql.ColumnElement
+        Column of `q` to sort on.
+    sort_by : str
+        Name of the sort, recorded in the cursors.
+    sort_order : str
+        "asc" or "desc". Nulls are sorted last in either case.
+    cursor : str or None
+        Cursor returned along with the previous page, or None for the first
+        page.
+    n_items_per_page : int
+        Number of Objs per page.
+    items_name : str
+        Key of the Objs in the returned dict.
+    include_thumbnails, include_detection_stats, current_user
+        See `load_page_items`.
+    include_total_matches : bool, optional
+        Whether to count the total number of matching Objs.
+    id_column : sqlalchemy.sql.ColumnElement, optional
+        Column of `q` holding the Obj ID, best taken from the same table as
+        `sort_column` so that both can be read from one index. Defaults to
+        `Obj.id`.
+
+    Returns
+    -------
+    info : dict
+        The page's Objs under `items_name`, along with `numPerPage`,
+        `nextCursor` (None for the last page) and, if requested,
+        `totalMatches`.
+    """
+    after = None
+    if cursor is not None:
+        after = decode_cursor(cursor, sort_by, sort_order)
+    # Fetch one more Obj to know whether there is a next page
+    rows = keyset_page(
+        q,
+        sort_column,
+        id_column,
+        sort_order == "desc",
+        after,
+        n_items_per_page + 1,
+    )
+
+    info = {"numPerPage": n_items_per_page, "nextCursor": None}
+    if len(rows) > n_items_per_page:
+        rows = rows[:n_items_per_page]
+        last_id, last_sort_value = rows[-1]
+        info["nextCursor"] = encode_cursor(
+            sort_by, sort_order, last_sort_value, last_id
+        )
+    if include_total_matches:
+        info["totalMatches"] = (
+            q.enable_eagerloads(False)
+            .order_by(None)
+            .with_entities(func.count(sa.distinct(id_column)))
+            .scalar()
+        )
+
+    info[items_name] = load_page_items(
+        [obj_id for obj_id, _ in rows],
+        include_thumbnails=include_thumbnails,
+        include_detection_stats=include_detection_stats,
+        current_user=current_user,
+    )
     return info
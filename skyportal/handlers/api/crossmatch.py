@@ -0,0 +1,178 @@
+import numpy as np
+import sqlalchemy as sa
+
+from baselayer.app.access import auth_or_token
+from ..base import BaseHandler
+from ...models import Obj
+from ...utils.healpix import cone_ranges
+
+# Maximum number of positions per request
+MAX_CROSSMATCH_POSITIONS = 10000
+
+# Maximum search radius [deg]
+MAX_CROSSMATCH_RADIUS = 1.0
+
+
+def crossmatch(positions, user):
+    """Find the objects within a radius of each of a set of positions, with a
+    single query joining the HEALPix ranges covering every cone to the
+    HEALPix index of `Obj`.
+
+    Parameters
+    ----------
+    positions : list of (float, float, float)
+        RA, Dec and search radius of each position [deg].
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose accessible objects to match.
+
+    Returns
+    -------
+    matches : list of list of str
+        IDs of the objects matching each position, closest first.
+    """
+    rows = []
+    for i, (ra, dec, radius) in enumerate(positions):
+        x, y, z = (
+            np.cos(np.radians(ra)) * np.cos(np.radians(dec)),
+            np.sin(np.radians(ra)) * np.cos(np.radians(dec)),
+            np.sin(np.radians(dec)),
+        )
+        cos_radius = np.cos(np.radians(radius))
+        rows.extend(
+            (i, lower, upper, x, y, z, cos_radius)
+            for lower, upper in cone_ranges(ra, dec, radius)
+        )
+    targets = sa.values(
+        sa.column('position', sa.Integer),
+        sa.column('lower', sa.BigInteger),
+        sa.column('upper', sa.BigInteger),
+        sa.column('x', sa.Float),
+        sa.column('y', sa.Float),
+        sa.column('z', sa.Float),
+        sa.column('cos_radius', sa.Float),
+        name='targets',
+    ).data(rows)
+
+    obj_x, obj_y, obj_z = Obj.cartesian
+    dot_product = obj_x * targets.c.x + obj_y * targets.c.y + obj_z * targets.c.z
+    query = (
+        Obj.query_records_accessible_by(
+            user, columns=[Obj.id, targets.c.position, dot_product]
+        )
+        .join(
+            targets,
+            sa.and_(Obj.healpix >= targets.c.lower, Obj.healpix < targets.c.upper),
+        )
+        .filter(dot_product >= targets.c.cos_radius)
+        .order_by(targets.c.position, dot_product.desc())
+    )
+
+    matches = [[] for _ in positions]
+    for obj_id, position, _ in query:
+        matches[position].append(obj_id)
+    return matches
+
+
+class CrossmatchHandler(BaseHandler):
+    @auth_or_token
+    def post(self):
+        """
+        ---
+        description: |
+          Cross-match a list of positions with the existing objects, in a
+          single query. Returns the IDs of the objects within the search
+          radius of each position.
+        tags:
+          - sources
+        requestBody:
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  positions:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        ra:
+                          type: number
+                          description: Right Ascension [deg].
+                        dec:
+                          type: number
+                          description: Declination [deg].
+                        radius:
+                          type: number
+                          description: |
+                            Search radius [deg]. Defaults to the top-level
+                            `radius`.
+                      required:
+                        - ra
+                        - dec
+                    description: |
+                      Positions to cross-match, at most 10000. Radii can be
+                      no larger than 1 degree.
+                  radius:
+                    type: number
+                    description: Default search radius [deg].
+                required:
+                  - positions
+        responses:
+          200:
+            content:
+              application/json:
+                schema:
+                  allOf:
+                    - $ref: '#/components/schemas/Success'
+                    - type: object
+                      properties:
+                        data:
+                          type: object
+                          properties:
+                            matches:
+                              type: array
+                              items:
+                                type: array
+                                items:
+                                  type: string
+                              description: |
+                                IDs of the objects matching each position,
+                                in the order of `positions`, closest first.
+          400:
+            content:
+              application/json:
+                schema: Error
+        """
+        data = self.get_json()
+        positions = data.get('positions')
+        if not isinstance(positions, list) or len(positions) == 0:
+            return self.error('positions must be a non-empty list')
+        if len(positions) > MAX_CROSSMATCH_POSITIONS:
+            return self.error(
+                f'Cannot cross-match more than {MAX_CROSSMATCH_POSITIONS} '
+                'positions at a time'
+            )
+
+        default_radius = data.get('radius')
+        cones = []
+        for i, position in enumerate(positions):
+            try:
+                ra = float(position['ra'])
+                dec = float(position['dec'])
+                radius = float(position.get('radius', default_radius))
+            except (KeyError, TypeError, ValueError):
+                return self.error(
+                    f'Invalid position {i}: ra, dec and radius must be numbers'
+                )
+            if not (0 <= ra < 360 and -90 <= dec <= 90):
+                return self.error(f'Invalid position {i}: out of range ra or dec')
+            if not 0 < radius <= MAX_CROSSMATCH_RADIUS:
+                return self.error(
+                    f'Invalid position {i}: radius must be positive and no '
+                    f'larger than {MAX_CROSSMATCH_RADIUS} degree'
+                )
+            cones.append((ra, dec, radius))
+
+        matches = crossmatch(cones, self.current_user)
+        self.verify_and_commit()
+        return self.success(data={'matches': matches})
@@ -255,9 +255,16 @@ def add_tiles(localization_id):
 
         tiles = [
             LocalizationTile(
-                localization_id=localization.id, healpix=uniq, probdensity=probdensity
+                localization_id=localization.id,
+                healpix=uniq,
+                probdensity=probdensity,
+                cumprob=cumprob,
+            )
+            for uniq, probdensity, cumprob in zip(
+                localization.uniq,
+                localization.probdensity,
+                localization.cumprob.tolist(),
             )
-            for uniq, probdensity in zip(localization.uniq, localization.probdensity)
         ]
 
         session.add(localization)
@@ -1,6 +1,9 @@
+from collections import namedtuple
+
 from marshmallow.exceptions import ValidationError
 from baselayer.app.access import permissions, auth_or_token
 from baselayer.log import make_log
+import sqlalchemy as sa
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import sessionmaker, scoped_session
 from tornado.ioloop import IOLoop
@@ -26,6 +29,89 @@ log = make_log('api/instrument')
 
 Session = scoped_session(sessionmaker(bind=DBSession.session_factory.kw["bind"]))
 
+InstrumentMetadata = namedtuple(
+    'InstrumentMetadata', ['id', 'name', 'filters', 'modified']
+)
+
+
+class InstrumentMetadataCache:
+    """Process-level cache of the instrument metadata needed to validate
+    photometry (name and filters).
+
+    Looking up a set of instruments costs a single `IN` query that checks
+    that they exist and returns their `modified` timestamps; the metadata is
+    only re-read for instruments that are new to the cache or have been
+    modified since they were cached (e.g. by another server process).
+    `InstrumentHandler` additionally invalidates entries as it mutates them.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def get_many(self, instrument_ids, session=None):
+        """Fetch metadata for a set of instruments.
+
+        Parameters
+        ----------
+        instrument_ids : iterable of int
+            IDs of the instruments to look up.
+        session : sqlalchemy.orm.Session, optional
+            Session to query with. Defaults to `DBSession()`.
+
+        Returns
+        -------
+        metadata : dict
+            `InstrumentMetadata` keyed by instrument ID. IDs of instruments
+            that do not exist are missing from the result.
+        """
+        if session is None:
+            session = DBSession()
+        instrument_ids = {int(instrument_id) for instrument_id in instrument_ids}
+        if len(instrument_ids) == 0:
+            return {}
+
+        versions = session.execute(
+            sa.select(Instrument.id, Instrument.modified).where(
+                Instrument.id.in_(instrument_ids)
+            )
+        ).all()
+        stale_ids = [
+            instrument_id
+            for instrument_id, modified in versions
+            if instrument_id not in self._entries
+            or self._entries[instrument_id].modified != modified
+        ]
+        if len(stale_ids) > 0:
+            rows = session.execute(
+                sa.select(
+                    Instrument.id,
+                    Instrument.name,
+                    Instrument.filters,
+                    Instrument.modified,
+                ).where(Instrument.id.in_(stale_ids))
+            ).all()
+            for row in rows:
+                self._entries[row.id] = InstrumentMetadata(
+                    row.id, row.name, frozenset(row.filters or []), row.modified
+                )
+
+        return {
+            instrument_id: self._entries[instrument_id]
+            for instrument_id, _ in versions
+            if instrument_id in self._entries
+        }
+
+    def invalidate(self, instrument_id=None):
+        """Drop one instrument (or, by default, all instruments) from the
+        cache."""
+        if instrument_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(int(instrument_id), None)
+
+
+instrument_metadata_cache = InstrumentMetadataCache()
+
 
 class InstrumentHandler(BaseHandler):
     @permissions(['System admin'])
@@ -213,6 +299,7 @@ class InstrumentHandler(BaseHandler):
                 'Invalid/missing parameters: ' f'{exc.normalized_messages()}'
             )
         self.verify_and_commit()
+        instrument_metadata_cache.invalidate(instrument_id)
 
         self.push_all(action="skyportal/REFRESH_INSTRUMENTS")
         return self.success()
@@ -245,6 +332,7 @@ class InstrumentHandler(BaseHandler):
         )
         DBSession().delete(instrument)
         self.verify_and_commit()
+        instrument_metadata_cache.invalidate(instrument_id)
 
         self.push_all(action="skyportal/REFRESH_INSTRUMENTS")
         return self.success()
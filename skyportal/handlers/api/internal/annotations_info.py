@@ -1,8 +1,7 @@
 from collections import defaultdict
-from sqlalchemy import func, literal
 from baselayer.app.access import auth_or_token
 from ...base import BaseHandler
-from ....models import Annotation
+from ....models import DBSession, Annotation, AnnotationValue
 
 
 class AnnotationsInfoHandler(BaseHandler):
@@ -31,20 +30,19 @@ class AnnotationsInfoHandler(BaseHandler):
         # This information is used to generate the front-end form for selecting
         # filters to apply on the auto-annotations column on the scanning page.
         # For example, if given that an annotation field is numeric we should
-        # have min/max fields on the form.
-        annotations = func.jsonb_each(Annotation.data).table_valued("key", "value")
-
+        # have min/max fields on the form. It is read from the annotation values
+        # rather than by expanding the JSON data of every annotation.
         # Objs are read-public, so no need to check that annotations belong to an unreadable obj
         # Instead, just check for annotation group membership
+        accessible_annotation_ids = Annotation.query_records_accessible_by(
+            self.current_user, columns=[Annotation.id]
+        )
         q = (
-            Annotation.query_records_accessible_by(
-                self.current_user, columns=[Annotation.origin]
-            )
-            .add_columns(
-                annotations.c.key, func.jsonb_typeof(annotations.c.value).label("type")
-            )
-            .outerjoin(annotations, literal(True))
+            DBSession()
+            .query(AnnotationValue.origin, AnnotationValue.key, AnnotationValue.type)
+            .filter(AnnotationValue.annotation_id.in_(accessible_annotation_ids))
             .distinct()
+            .order_by(AnnotationValue.origin, AnnotationValue.key)
         )
 
         # Restructure query results so that records are grouped by origin in a
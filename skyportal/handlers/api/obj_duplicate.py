@@ -0,0 +1,87 @@
+from baselayer.app.access import auth_or_token
+from ..base import BaseHandler
+from ...models import duplicate_clusters
+
+MAX_CLUSTERS_PER_PAGE = 1000
+
+
+class ObjDuplicateHandler(BaseHandler):
+    @auth_or_token
+    def get(self):
+        """
+        ---
+        description: |
+          Retrieve the clusters of duplicate objects, i.e. groups of objects
+          connected by pairs of objects within 4 arcseconds of each other.
+        tags:
+          - sources
+        parameters:
+          - in: query
+            name: numPerPage
+            nullable: true
+            schema:
+              type: integer
+            description: |
+              Number of clusters to return per paginated request. Defaults to
+              100. Can be no larger than 1000.
+          - in: query
+            name: pageNumber
+            nullable: true
+            schema:
+              type: integer
+            description: Page number for paginated query results. Defaults to 1
+        responses:
+          200:
+            content:
+              application/json:
+                schema:
+                  allOf:
+                    - $ref: '#/components/schemas/Success'
+                    - type: object
+                      properties:
+                        data:
+                          type: object
+                          properties:
+                            clusters:
+                              type: array
+                              items:
+                                type: array
+                                items:
+                                  type: string
+                              description: |
+                                Sorted IDs of the objects of each cluster,
+                                ordered by their first ID.
+                            totalMatches:
+                              type: integer
+                            pageNumber:
+                              type: integer
+                            numPerPage:
+                              type: integer
+          400:
+            content:
+              application/json:
+                schema: Error
+        """
+        try:
+            page_number = int(self.get_query_argument("pageNumber", 1))
+            num_per_page = int(self.get_query_argument("numPerPage", 100))
+        except ValueError:
+            return self.error("pageNumber and numPerPage must be integers")
+        if page_number < 1 or num_per_page < 1:
+            return self.error("pageNumber and numPerPage must be positive")
+        if num_per_page > MAX_CLUSTERS_PER_PAGE:
+            return self.error(
+                f"numPerPage can be no larger than {MAX_CLUSTERS_PER_PAGE}"
+            )
+
+        clusters = duplicate_clusters(self.current_user)
+        start = (page_number - 1) * num_per_page
+        self.verify_and_commit()
+        return self.success(
+            data={
+                "clusters": clusters[start : start + num_per_page],
+                "totalMatches": len(clusters),
+                "pageNumber": page_number,
+                "numPerPage": num_per_page,
+            }
+        )
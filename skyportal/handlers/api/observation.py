@@ -368,26 +368,7 @@ class ObservationHandler(BaseHandler):
                     return self.error("GCN event not found", status=404)
                 localization = event.localizations[-1]
 
-            cum_prob = (
-                sa.func.sum(
-                    LocalizationTile.probdensity * LocalizationTile.healpix.area
-                )
-                .over(order_by=LocalizationTile.probdensity.desc())
-                .label('cum_prob')
-            )
-            localizationtile_subquery = (
-                sa.select(LocalizationTile.probdensity, cum_prob).filter(
-                    LocalizationTile.localization_id == localization.id
-                )
-            ).subquery()
-
-            min_probdensity = (
-                sa.select(
-                    sa.func.min(localizationtile_subquery.columns.probdensity)
-                ).filter(
-                    localizationtile_subquery.columns.cum_prob <= localization_cumprob
-                )
-            ).scalar_subquery()
+            min_probdensity = localization.min_probdensity(localization_cumprob)
 
             if telescope_name is not None and instrument_name is not None:
                 tiles_subquery = (
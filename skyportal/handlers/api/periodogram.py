@@ -0,0 +1,325 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import sqlalchemy as sa
+from tornado.ioloop import IOLoop
+
+from baselayer.app.access import auth_or_token
+from baselayer.app.custom_exceptions import AccessError
+from baselayer.app.env import load_env
+from baselayer.log import make_log
+from ..base import BaseHandler
+from ...models import DBSession, Annotation, Group, Obj, Photometry, User
+from ...utils.periodogram import multiband_periodogram
+
+_, cfg = load_env()
+
+log = make_log('api/periodogram')
+
+# Origin of the annotations storing periodogram results. Their `period` is
+# used to phase-fold photometry (see ObjPhotometryHandler).
+PERIODOGRAM_ANNOTATION_ORIGIN = 'skyportal_periodogram'
+
+# Maximum number of objects per periodogram job
+MAX_PERIODOGRAM_OBJS = 10000
+
+# Number of objects handed to a worker process at a time
+PERIODOGRAM_CHUNK_SIZE = 16
+
+# Worker processes computing periodograms. Processes are only started when
+# the first job is submitted.
+periodogram_executor = ProcessPoolExecutor(max_workers=cfg["misc.periodogram_workers"])
+
+
+def _compute_periodogram(args):
+    obj_id, mjd, flux, fluxerr, filters, grid_kwargs = args
+    try:
+        return obj_id, multiband_periodogram(mjd, flux, fluxerr, filters, **grid_kwargs)
+    except Exception as e:
+        log(f"Periodogram of {obj_id} failed: {e}")
+        return obj_id, None
+
+
+def locked_periodogram_obj_ids(obj_ids, user, session=None):
+    """IDs of the objects whose periodogram annotation exists but cannot be
+    updated by a user, i.e. was written by someone else.
+
+    Parameters
+    ----------
+    obj_ids : list of str
+        IDs of the objects.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token that would update the annotations.
+    session : `sqlalchemy.orm.Session`, optional
+        Session to query in. Defaults to `DBSession()`.
+
+    Returns
+    -------
+    obj_ids : set of str
+    """
+    if session is None:
+        session = DBSession()
+    updatable = Annotation.query_records_accessible_by(
+        user, mode='update', columns=[Annotation.id]
+    ).subquery()
+    return {
+        obj_id
+        for obj_id, in session.query(Annotation.obj_id).filter(
+            Annotation.obj_id.in_(obj_ids),
+            Annotation.origin == PERIODOGRAM_ANNOTATION_ORIGIN,
+            Annotation.id.notin_(sa.select(updatable.c.id)),
+        )
+    }
+
+
+def run_periodogram_job(obj_ids, group_ids, user_id, grid_kwargs):
+    """
+    Compute the periodograms of a set of objects and store their best periods
+    as annotations.
+
+    The photometry of all objects is loaded with a single query, the
+    periodograms are computed in `periodogram_executor`, and the annotations
+    are written in a single transaction. Existing annotations are only
+    updated if the user may update them (see `locked_periodogram_obj_ids`).
+
+    Parameters
+    ----------
+    obj_ids : list of str
+        IDs of the objects.
+    group_ids : list of int
+        IDs of the groups that can see the annotations.
+    user_id : int
+        ID of the User requesting the periodograms, author of the annotations.
+    grid_kwargs : dict
+        Trial period grid parameters, passed to
+        `skyportal.utils.periodogram.frequency_grid`.
+    """
+
+    session = DBSession()
+    try:
+        user = session.query(User).get(user_id)
+        photometry = pd.DataFrame(
+            Photometry.query_records_accessible_by(
+                user,
+                columns=[
+                    Photometry.obj_id,
+                    Photometry.mjd,
+                    Photometry.flux,
+                    Photometry.fluxerr,
+                    Photometry.filter,
+                ],
+            )
+            .filter(Photometry.obj_id.in_(obj_ids))
+            .all(),
+            columns=['obj_id', 'mjd', 'flux', 'fluxerr', 'filter'],
+        )
+        tasks = (
+            (
+                obj_id,
+                phot['mjd'].to_numpy(),
+                phot['flux'].to_numpy(dtype=float),
+                phot['fluxerr'].to_numpy(dtype=float),
+                phot['filter'].to_numpy(dtype=str),
+                grid_kwargs,
+            )
+            for obj_id, phot in photometry.groupby('obj_id')
+        )
+        results = {
+            obj_id: result
+            for obj_id, result in periodogram_executor.map(
+                _compute_periodogram, tasks, chunksize=PERIODOGRAM_CHUNK_SIZE
+            )
+            if result is not None
+        }
+
+        # The periodogram annotation of an object may have been written by
+        # another user in the meantime, in which case it is left alone
+        locked_obj_ids = locked_periodogram_obj_ids(list(results), user, session)
+        annotations = {
+            annotation.obj_id: annotation
+            for annotation in Annotation.query_records_accessible_by(
+                user, mode='update'
+            ).filter(
+                Annotation.obj_id.in_(list(results)),
+                Annotation.origin == PERIODOGRAM_ANNOTATION_ORIGIN,
+            )
+        }
+        groups = session.query(Group).filter(Group.id.in_(group_ids)).all()
+        for obj_id, result in results.items():
+            if obj_id in locked_obj_ids:
+                continue
+            data = {'period': result['period'], 'period_power': result['power']}
+            data.update(
+                {f'period_{band}': period for band, period in result['periods'].items()}
+            )
+            if obj_id in annotations:
+                annotations[obj_id].data = data
+                annotations[obj_id].groups = groups
+            else:
+                session.add(
+                    Annotation(
+                        obj_id=obj_id,
+                        origin=PERIODOGRAM_ANNOTATION_ORIGIN,
+                        data=data,
+                        author=user,
+                        groups=groups,
+                    )
+                )
+        if len(locked_obj_ids) > 0:
+            log(
+                f"Periodogram job for user {user_id}: skipped the annotations "
+                f"of other users on {sorted(locked_obj_ids)}"
+            )
+        session.commit()
+        log(
+            f"Periodogram job for user {user_id}: found periods for "
+            f"{len(results)} of {len(obj_ids)} objects"
+        )
+    except Exception as e:
+        session.rollback()
+        log(f"Periodogram job for user {user_id} failed: {e}")
+    finally:
+        DBSession.remove()
+
+
+class PeriodogramHandler(BaseHandler):
+    @auth_or_token
+    def post(self):
+        """
+        ---
+        description: |
+          Compute Lomb-Scargle periodograms of the photometry of a set of
+          objects, in the background. The best period of each object is
+          stored as an annotation with origin `skyportal_periodogram`
+          (keys `period`, `period_power`, and `period_<filter>` for each
+          filter), which is then used to phase-fold its photometry. Filters
+          with fewer than 10 points are ignored. Objects whose periodogram
+          annotation was written by another user are skipped.
+        tags:
+          - photometry
+          - annotations
+        requestBody:
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  obj_ids:
+                    type: array
+                    items:
+                      type: string
+                    description: IDs of the objects.
+                  group_ids:
+                    type: array
+                    items:
+                      type: integer
+                    description: |
+                      IDs of the groups that can see the annotations.
+                      Defaults to all of the user's groups.
+                  minPeriod:
+                    type: number
+                    description: Shortest trial period, in days. Defaults to 0.01.
+                  maxPeriod:
+                    type: number
+                    description: |
+                      Longest trial period, in days. Defaults to the time
+                      span of each object's photometry.
+                required:
+                  - obj_ids
+        responses:
+          200:
+            content:
+              application/json:
+                schema:
+                  allOf:
+                    - $ref: '#/components/schemas/Success'
+                    - type: object
+                      properties:
+                        data:
+                          type: object
+                          properties:
+                            obj_ids:
+                              type: array
+                              items:
+                                type: string
+                              description: IDs of the objects being processed
+                            skipped_obj_ids:
+                              type: array
+                              items:
+                                type: string
+                              description: |
+                                IDs of the objects skipped because their
+                                periodogram annotation was written by
+                                another user
+          400:
+            content:
+              application/json:
+                schema: Error
+        """
+        data = self.get_json()
+        obj_ids = data.get('obj_ids')
+        if not isinstance(obj_ids, list) or len(obj_ids) == 0:
+            return self.error('obj_ids must be a non-empty list of object IDs')
+        obj_ids = list({str(obj_id) for obj_id in obj_ids})
+        if len(obj_ids) > MAX_PERIODOGRAM_OBJS:
+            return self.error(
+                f'Cannot compute more than {MAX_PERIODOGRAM_OBJS} periodograms '
+                'at a time'
+            )
+
+        grid_kwargs = {}
+        try:
+            for key, arg in [('minPeriod', 'min_period'), ('maxPeriod', 'max_period')]:
+                if data.get(key) is not None:
+                    grid_kwargs[arg] = float(data[key])
+                    if grid_kwargs[arg] <= 0:
+                        raise ValueError
+        except (TypeError, ValueError):
+            return self.error('minPeriod and maxPeriod must be positive numbers')
+        if grid_kwargs.get('min_period', 0.01) >= grid_kwargs.get(
+            'max_period', float('inf')
+        ):
+            return self.error('minPeriod must be smaller than maxPeriod')
+
+        group_ids = data.get('group_ids')
+        if not group_ids:
+            group_ids = [g.id for g in self.current_user.accessible_groups]
+        else:
+            try:
+                group_ids = [
+                    g.id
+                    for g in Group.get_if_accessible_by(
+                        group_ids, self.current_user, raise_if_none=True
+                    )
+                ]
+            except AccessError:
+                return self.error('Could not find any accessible groups.', status=403)
+
+        accessible_obj_ids = [
+            obj_id
+            for obj_id, in Obj.query_records_accessible_by(
+                self.current_user, columns=[Obj.id]
+            )
+            .filter(Obj.id.in_(obj_ids))
+            .all()
+        ]
+        missing = set(obj_ids) - set(accessible_obj_ids)
+        if len(missing) > 0:
+            return self.error(f'Invalid object IDs: {sorted(missing)}')
+
+        # Periodogram annotations written by other users are not overwritten
+        skipped_obj_ids = sorted(locked_periodogram_obj_ids(obj_ids, self.current_user))
+        obj_ids = [obj_id for obj_id in obj_ids if obj_id not in skipped_obj_ids]
+
+        user_id = self.associated_user_object.id
+        self.verify_and_commit()
+
+        if len(obj_ids) > 0:
+            IOLoop.current().run_in_executor(
+                None,
+                lambda: run_periodogram_job(obj_ids, group_ids, user_id, grid_kwargs),
+            )
+
+        return self.success(
+            data={'obj_ids': obj_ids, 'skipped_obj_ids': skipped_obj_ids}
+        )
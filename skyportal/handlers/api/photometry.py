@@ -1,7 +1,14 @@
+import csv
+from collections import defaultdict
+import functools
+import itertools
 import uuid
 import datetime
 import json
-from io import StringIO
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO, BytesIO
 
 from astropy.time import Time
 from astropy.table import Table
@@ -12,27 +19,36 @@ import sncosmo
 from sncosmo.photdata import PhotometricData
 from distutils.util import strtobool
 import arrow
+from tornado.iostream import StreamClosedError
 
 import sqlalchemy as sa
 from sqlalchemy.sql import column, Values
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy import and_
 
 from baselayer.app.access import permissions, auth_or_token
 from baselayer.app.env import load_env
+from baselayer.app.json_util import to_json
 from baselayer.log import make_log
 from ..base import BaseHandler
 from ...models import (
+    Base,
     DBSession,
     Annotation,
     Group,
+    Instrument,
     Stream,
     Photometry,
-    Instrument,
+    PhotometryUpload,
     Obj,
+    User,
     PHOT_ZP,
+    PHOT_SYS,
     GroupPhotometry,
+    GroupUser,
     StreamPhotometry,
+    refresh_detection_summaries,
 )
 
 from ...models.schema import (
@@ -42,44 +58,339 @@ from ...models.schema import (
     PhotMagFlexible,
     PhotometryRangeQuery,
 )
-from ...enum_types import ALLOWED_MAGSYSTEMS
+from ...enum_types import ALLOWED_BANDPASSES, ALLOWED_MAGSYSTEMS
+from ...utils.binary_copy import copy_rows
+from ...utils.periodogram import phase_fold
+from .instrument import instrument_metadata_cache
 
 _, cfg = load_env()
+PHOT_DETECTION_THRESHOLD = cfg["misc.photometry_detection_threshold_nsigma"]
+
+# Worker pool processing asynchronous photometry uploads
+photometry_ingestion_executor = ThreadPoolExecutor(
+    max_workers=cfg["misc.photometry_ingestion_workers"],
+    thread_name_prefix='photometry_ingestion',
+)
+# Identifies this process in `PhotometryUpload.worker`
+PHOTOMETRY_INGESTION_WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Number of points of asynchronous uploads inserted per transaction
+PHOTOMETRY_INGESTION_CHUNK_SIZE = 10000
+
+# Uploads queued on other hosts that have not made progress for this long
+# are resumed by `recover_photometry_uploads`
+PHOTOMETRY_UPLOAD_STALE_AFTER = datetime.timedelta(minutes=30)
 
 
 log = make_log('api/photometry')
 
+# Columns of the photometry deduplication index (see models/photometry.py).
+# Inserts use this index as their ON CONFLICT arbiter instead of locking the
+# photometry table, so concurrent uploads never block each other unless they
+# try to insert the very same points.
+DEDUPLICATION_COLUMNS = ('obj_id', 'instrument_id', 'origin', 'mjd', 'fluxerr', 'flux')
+
+PHOTOMETRY_COPY_COLUMNS = (
+    'id',
+    'original_user_data',
+    'upload_id',
+    'flux',
+    'fluxerr',
+    'obj_id',
+    'altdata',
+    'instrument_id',
+    'ra_unc',
+    'dec_unc',
+    'mjd',
+    'filter',
+    'ra',
+    'dec',
+    'origin',
+    'owner_id',
+    'created_at',
+    'modified',
+)
 
-def save_data_using_copy(rows, table, columns):
-    # Prepare data
-    output = StringIO()
-    df = pd.DataFrame.from_records(rows)
-    # Coerce missing non-numbers and numbers, respectively, for SQLAlchemy
-    df.replace("NaN", "null", inplace=True)
-    df.replace(np.nan, "NaN", inplace=True)
-
-    df.to_csv(
-        output,
-        index=False,
-        sep='\t',
-        header=False,
-        encoding='utf8',
-        quotechar="'",
+
+# Maximum number of photometry rows deleted per transaction by bulk deletes
+PHOTOMETRY_DELETE_CHUNK_SIZE = 10000
+
+
+def save_data_using_copy(rows, table, columns, column_types_from=None):
+    """Bulk load rows into a table with a binary COPY.
+
+    Parameters
+    ----------
+    rows : iterable of dict
+        Rows to insert, keyed by column name.
+    table : str
+        Name of the table to copy into.
+    columns : sequence of str
+        Names of the columns to copy, in order.
+    column_types_from : sqlalchemy.Table, optional
+        Table whose column definitions give the types of `columns`, for
+        tables that are not part of the ORM metadata (e.g. temporary staging
+        tables). Defaults to the table named `table`.
+    """
+    if column_types_from is None:
+        column_types_from = Base.metadata.tables[table]
+    column_types = [column_types_from.columns[column].type for column in columns]
+    copy_rows(DBSession().connection().connection, rows, table, columns, column_types)
+
+
+def insert_photometry_using_staging_table(rows):
+    """Bulk insert photometry rows, skipping any row that would violate the
+    deduplication index.
+
+    The rows are first COPYed into a transaction-local staging table, then
+    moved into the photometry table with `INSERT ... ON CONFLICT DO NOTHING`.
+    Postgres resolves conflicts against concurrent, uncommitted inserts by
+    waiting on the conflicting row only, so uploads of disjoint data proceed
+    in parallel.
+
+    Parameters
+    ----------
+    rows : list of dict
+        Photometry rows, with keys given by `PHOTOMETRY_COPY_COLUMNS`.
+
+    Returns
+    -------
+    inserted_ids : set of int
+        IDs of the rows that were inserted. Rows whose ID is missing from
+        this set duplicate photometry that is already in the table (or an
+        earlier row of the same upload).
+    """
+    session = DBSession()
+    staging_table = f"photometry_staging_{uuid.uuid4().hex}"
+    session.execute(
+        sa.text(
+            f"CREATE TEMPORARY TABLE {staging_table} "
+            f"(LIKE {Photometry.__tablename__} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+    )
+    save_data_using_copy(
+        rows,
+        staging_table,
+        PHOTOMETRY_COPY_COLUMNS,
+        column_types_from=Photometry.__table__,
     )
-    output.seek(0)
-
-    # Insert data
-    connection = DBSession().connection().connection
-    cursor = connection.cursor()
-    cursor.copy_from(
-        output,
-        table,
-        sep='\t',
-        null='',
-        columns=columns,
+
+    # Insert in deduplication-index order so that two uploads sharing some
+    # points always wait on each other in the same order (no deadlocks).
+    columns = ', '.join(PHOTOMETRY_COPY_COLUMNS)
+    dedup_columns = ', '.join(DEDUPLICATION_COLUMNS)
+    result = session.execute(
+        sa.text(
+            f"INSERT INTO {Photometry.__tablename__} ({columns}) "
+            f"SELECT {columns} FROM {staging_table} ORDER BY {dedup_columns} "
+            f"ON CONFLICT ({dedup_columns}) DO NOTHING RETURNING id"
+        )
     )
-    cursor.close()
-    output.close()
+    return {row[0] for row in result}
+
+
+def add_photometry_to_groups_and_streams(photometry_ids, group_ids, stream_ids):
+    """Share existing photometry with additional groups and streams.
+
+    Group/stream memberships that already exist are left untouched, so this
+    is safe to run concurrently with other uploads of the same points.
+
+    Parameters
+    ----------
+    photometry_ids : list of int or `sqlalchemy.sql.Select`
+        IDs of the photometry to update, or a query selecting them.
+    group_ids : list of int
+        IDs of the groups to share the photometry with.
+    stream_ids : list of int
+        IDs of the streams to associate the photometry with.
+
+    Returns
+    -------
+    n_added : dict
+        Number of group and stream memberships created, keyed by 'groups'
+        and 'streams'.
+    """
+    utcnow = datetime.datetime.utcnow()
+    session = DBSession()
+    n_added = {'groups': 0, 'streams': 0}
+    for key, join_table, target_id_column, target_ids in [
+        ('groups', GroupPhotometry.__table__, 'group_id', group_ids),
+        ('streams', StreamPhotometry.__table__, 'stream_id', stream_ids),
+    ]:
+        if isinstance(photometry_ids, (list, tuple, set)) and len(photometry_ids) == 0:
+            continue
+        if len(target_ids) == 0:
+            continue
+        inserted = (
+            pg_insert(join_table)
+            .from_select(
+                ['photometr_id', target_id_column, 'created_at', 'modified'],
+                sa.select(
+                    Photometry.id,
+                    sa.func.unnest(sa.literal(list(target_ids), sa.ARRAY(sa.Integer))),
+                    sa.literal(utcnow),
+                    sa.literal(utcnow),
+                ).where(Photometry.id.in_(photometry_ids)),
+            )
+            .on_conflict_do_nothing(index_elements=['photometr_id', target_id_column])
+            .returning(join_table.c.photometr_id)
+            .cte(f'inserted_{key}')
+        )
+        n_added[key] = session.execute(
+            sa.select(sa.func.count()).select_from(inserted)
+        ).scalar()
+    if n_added['groups'] > 0:
+        refresh_detection_summaries(
+            sa.select(Photometry.obj_id)
+            .where(Photometry.id.in_(photometry_ids))
+            .distinct()
+        )
+    return n_added
+
+
+def remove_photometry_from_groups_and_streams(
+    photometry_ids, keep_group_ids=None, keep_stream_ids=None
+):
+    """Remove photometry from all groups and/or streams except the given
+    ones.
+
+    Parameters
+    ----------
+    photometry_ids : list of int or `sqlalchemy.sql.Select`
+        IDs of the photometry to update, or a query selecting them.
+    keep_group_ids : list of int, optional
+        IDs of the groups the photometry stays shared with, in addition to
+        the single user group of its owner. If None (the default), group
+        memberships are left untouched.
+    keep_stream_ids : list of int, optional
+        IDs of the streams the photometry stays associated with. If None
+        (the default), stream memberships are left untouched.
+
+    Returns
+    -------
+    n_removed : dict
+        Number of group and stream memberships deleted, keyed by 'groups'
+        and 'streams'.
+    """
+    session = DBSession()
+    n_removed = {'groups': 0, 'streams': 0}
+    for key, join_table, target_id_column, keep_ids in [
+        ('groups', GroupPhotometry.__table__, 'group_id', keep_group_ids),
+        ('streams', StreamPhotometry.__table__, 'stream_id', keep_stream_ids),
+    ]:
+        if keep_ids is None:
+            continue
+        conditions = [
+            join_table.c.photometr_id.in_(photometry_ids),
+            join_table.c[target_id_column].notin_(list(keep_ids)),
+        ]
+        if key == 'groups':
+            # Whoever replaces the groups, the photometry stays shared with
+            # its owner's single user group
+            conditions.append(
+                ~sa.exists()
+                .where(Photometry.id == join_table.c.photometr_id)
+                .where(Group.id == join_table.c.group_id)
+                .where(Group.single_user_group.is_(True))
+                .where(GroupUser.group_id == Group.id)
+                .where(GroupUser.user_id == Photometry.owner_id)
+            )
+        deleted = (
+            sa.delete(join_table)
+            .where(*conditions)
+            .returning(join_table.c.photometr_id)
+            .cte(f'deleted_{key}')
+        )
+        n_removed[key] = session.execute(
+            sa.select(sa.func.count()).select_from(deleted)
+        ).scalar()
+    if n_removed['groups'] > 0:
+        refresh_detection_summaries(
+            sa.select(Photometry.obj_id)
+            .where(Photometry.id.in_(photometry_ids))
+            .distinct()
+        )
+    return n_removed
+
+
+def accessible_upload_photometry_ids(user_or_token, upload_id, mode, limit=None):
+    """Query selecting the IDs of the photometry of an upload that a user can
+    access in the given mode.
+
+    Parameters
+    ----------
+    user_or_token : User or Token
+        The user or token requesting access.
+    upload_id : str
+        Upload ID of the photometry.
+    mode : str
+        Access mode (e.g., 'read', 'update' or 'delete').
+    limit : int, optional
+        Maximum number of IDs to select.
+
+    Returns
+    -------
+    query : `sqlalchemy.sql.Select`
+        Query selecting the photometry IDs.
+    """
+    query = Photometry.query_records_accessible_by(
+        user_or_token, mode=mode, columns=[Photometry.id]
+    ).filter(Photometry.upload_id == upload_id)
+    if limit is not None:
+        query = query.limit(limit)
+    subquery = query.subquery()
+    return sa.select(subquery.c.id)
+
+
+def delete_photometry_by_upload_id(
+    user_or_token, upload_id, chunk_size=PHOTOMETRY_DELETE_CHUNK_SIZE
+):
+    """Delete all photometry of an upload that a user can delete.
+
+    Rows are deleted with set-based DELETE statements of at most `chunk_size`
+    rows, each committed in its own transaction, so that removing a very
+    large upload never holds a long-running transaction.
+
+    Parameters
+    ----------
+    user_or_token : User or Token
+        The user or token requesting the deletion.
+    upload_id : str
+        Upload ID of the photometry to delete.
+    chunk_size : int, optional
+        Maximum number of rows deleted per transaction.
+
+    Returns
+    -------
+    n_deleted : int
+        Number of photometry points deleted.
+    """
+    session = DBSession()
+    n_deleted = 0
+    while True:
+        deleted = (
+            sa.delete(Photometry)
+            .where(
+                Photometry.id.in_(
+                    accessible_upload_photometry_ids(
+                        user_or_token, upload_id, 'delete', limit=chunk_size
+                    )
+                )
+            )
+            .returning(Photometry.id, Photometry.obj_id)
+            .cte('deleted_photometry')
+        )
+        n_chunk, obj_ids = session.execute(
+            sa.select(
+                sa.func.count(), sa.func.array_agg(sa.distinct(deleted.c.obj_id))
+            ).select_from(deleted)
+        ).one()
+        if n_chunk > 0:
+            refresh_detection_summaries(obj_ids)
+        session.commit()
+        n_deleted += n_chunk
+        if n_chunk < chunk_size:
+            return n_deleted
 
 
 def nan_to_none(value):
@@ -94,7 +405,50 @@ def allscalar(d):
     return all(np.isscalar(v) or v is None for v in d.values())
 
 
+# Number of rows fetched from the server-side cursor (and written to the
+# client) at a time when streaming photometry
+PHOTOMETRY_STREAM_CHUNK_SIZE = 5000
+
+# Columns read by `photometry_serialization_query`, in the order of the
+# serialized points
+PHOTOMETRY_SERIALIZATION_COLUMNS = [
+    Photometry.obj_id,
+    Photometry.ra,
+    Photometry.dec,
+    Photometry.filter,
+    Photometry.mjd,
+    Photometry.instrument_id,
+    Instrument.name.label('instrument_name'),
+    Photometry.ra_unc,
+    Photometry.dec_unc,
+    Photometry.origin,
+    Photometry.id,
+    Photometry.altdata,
+    Photometry.flux,
+    Photometry.fluxerr,
+    Photometry.original_user_data,
+]
+
+# Number of photometry IDs per query when looking up group memberships
+PHOTOMETRY_GROUPS_CHUNK_SIZE = 10000
+
+
+@functools.lru_cache(maxsize=None)
+def get_relative_zeropoint(magsys, filter):
+    """Return 2.5 log10 of the zeropoint bandflux of `filter` in the magnitude
+    system `magsys`.
+
+    This is not the actual zeropoint of any magnitude in the db or packet,
+    just a quantity that can be used to derive corrections between two
+    magnitude systems in the same filter. It only depends on (magsys, filter),
+    so it is computed once per pair and cached.
+    """
+    return 2.5 * np.log10(sncosmo.get_magsystem(magsys).zpbandflux(filter))
+
+
 def serialize(phot, outsys, format):
+    """Serialize a single Photometry point. For many points, see
+    `serialize_photometry`."""
 
     return_value = {
         'obj_id': phot.obj_id,
@@ -173,7 +527,254 @@ def serialize(phot, outsys, format):
     return return_value
 
 
-def standardize_photometry_data(data):
+def photometry_serialization_query(query):
+    """Restrict a query for Photometry to the columns serialized by
+    `serialize_photometry`, so that its rows are read without building
+    Photometry instances.
+
+    Parameters
+    ----------
+    query : sqlalchemy.orm.Query
+        Query for Photometry, e.g. from `Photometry.query_records_accessible_by`,
+        without loader options.
+
+    Returns
+    -------
+    query : sqlalchemy.orm.Query
+        Query returning rows of `PHOTOMETRY_SERIALIZATION_COLUMNS`.
+    """
+    return (
+        query.enable_eagerloads(False)
+        .with_entities(*PHOTOMETRY_SERIALIZATION_COLUMNS)
+        .join(Instrument, Instrument.id == Photometry.instrument_id)
+    )
+
+
+def photometry_groups(photometry_ids, session=None):
+    """Groups of a set of photometry points, with one query for the group
+    memberships (per `PHOTOMETRY_GROUPS_CHUNK_SIZE` points) and one for the
+    groups.
+
+    Parameters
+    ----------
+    photometry_ids : list of int
+        IDs of the photometry points.
+    session : `sqlalchemy.orm.Session`, optional
+        Session to query in. Defaults to `DBSession()`.
+
+    Returns
+    -------
+    groups : collections.defaultdict
+        List of the `Group`s of each point, keyed by photometry ID.
+    """
+    if session is None:
+        session = DBSession()
+    memberships = []
+    for i in range(0, len(photometry_ids), PHOTOMETRY_GROUPS_CHUNK_SIZE):
+        memberships.extend(
+            session.execute(
+                sa.select(GroupPhotometry.photometr_id, GroupPhotometry.group_id).where(
+                    GroupPhotometry.photometr_id.in_(
+                        photometry_ids[i : i + PHOTOMETRY_GROUPS_CHUNK_SIZE]
+                    )
+                )
+            ).all()
+        )
+    groups_by_id = {}
+    group_ids = list({group_id for _, group_id in memberships})
+    if len(group_ids) > 0:
+        groups_by_id = {
+            group.id: group
+            for group in session.scalars(
+                sa.select(Group).where(Group.id.in_(group_ids))
+            )
+        }
+
+    groups = defaultdict(list)
+    for photometry_id, group_id in memberships:
+        groups[photometry_id].append(groups_by_id[group_id])
+    return groups
+
+
+def serialize_photometry(rows, outsys, format, session=None):
+    """Serialize many photometry points at once, from the rows of
+    `photometry_serialization_query`.
+
+    The groups of all points are looked up together (see
+    `photometry_groups`), magnitude system corrections are looked up once
+    per unique (filter, magsys) pair, and magnitudes, limiting magnitudes
+    and zeropoints are computed as arrays rather than point by point. The
+    output is the same as that of `serialize` for each point.
+
+    Parameters
+    ----------
+    rows : list of sqlalchemy.engine.Row
+        The points to serialize, with the columns of
+        `PHOTOMETRY_SERIALIZATION_COLUMNS`.
+    outsys : str
+        The magnitude system of the output.
+    format : {'mag', 'flux'}
+        Whether to return the photometry in magnitude or flux space.
+    session : `sqlalchemy.orm.Session`, optional
+        Session to look up the groups in. Defaults to `DBSession()`.
+
+    Returns
+    -------
+    list of dict
+        The serialized points, in the order of `rows`.
+    """
+    if format not in ['mag', 'flux']:
+        raise ValueError(
+            'Invalid output format specified. Must be one of '
+            f"['flux', 'mag'], got '{format}'."
+        )
+
+    magsys_out = sncosmo.get_magsystem(outsys)
+    if len(rows) == 0:
+        return []
+
+    groups = photometry_groups([row.id for row in rows], session=session)
+
+    filters = np.array([row.filter for row in rows])
+    flux = np.array([row.flux for row in rows], dtype=float)
+    fluxerr = np.array([row.fluxerr for row in rows], dtype=float)
+
+    unique_filters, filter_index = np.unique(filters, return_inverse=True)
+    relzp_out = np.array([get_relative_zeropoint(outsys, f) for f in unique_filters])[
+        filter_index
+    ]
+    relzp_db = np.array([get_relative_zeropoint(PHOT_SYS, f) for f in unique_filters])[
+        filter_index
+    ]
+    db_correction = relzp_out - relzp_db
+
+    # this is the zeropoint for fluxes in the database that is tied
+    # to the new magnitude system
+    corrected_db_zp = PHOT_ZP + db_correction
+
+    output = [
+        {
+            'obj_id': row.obj_id,
+            'ra': row.ra,
+            'dec': row.dec,
+            'filter': row.filter,
+            'mjd': row.mjd,
+            'instrument_id': row.instrument_id,
+            'instrument_name': row.instrument_name,
+            'ra_unc': row.ra_unc,
+            'dec_unc': row.dec_unc,
+            'origin': row.origin,
+            'id': row.id,
+            'groups': groups[row.id],
+            'altdata': row.altdata,
+        }
+        for row in rows
+    ]
+
+    if format == 'mag':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            detected = ~np.isnan(flux) & (flux > 0)
+            mag = np.where(detected, -2.5 * np.log10(flux) + PHOT_ZP, np.nan)
+            magerr = np.where(
+                detected & (fluxerr > 0), (2.5 / np.log(10)) * (fluxerr / flux), np.nan
+            )
+            mag_out = mag + db_correction
+
+            # calculate the limiting mag
+            maglimit_out = -2.5 * np.log10(5 * fluxerr) + corrected_db_zp
+
+        # use the limiting mag passed by the user, if any
+        for i, row in enumerate(rows):
+            original = row.original_user_data
+            if original is not None and 'limiting_mag' in original:
+                packet_correction = relzp_out[i] - get_relative_zeropoint(
+                    original['magsys'], row.filter
+                )
+                maglimit_out[i] = original['limiting_mag'] + packet_correction
+
+        for i, packet in enumerate(output):
+            packet.update(
+                {
+                    'mag': mag_out[i] if not np.isnan(mag[i]) else None,
+                    'magerr': magerr[i] if not np.isnan(magerr[i]) else None,
+                    'magsys': magsys_out.name,
+                    'limiting_mag': maglimit_out[i],
+                }
+            )
+    else:
+        for i, packet in enumerate(output):
+            packet.update(
+                {
+                    'flux': flux[i] if not np.isnan(flux[i]) else None,
+                    'magsys': magsys_out.name,
+                    'zp': corrected_db_zp[i],
+                    'fluxerr': fluxerr[i],
+                }
+            )
+
+    return output
+
+
+def serialized_photometry_by_obj_id(obj_ids, user, outsys, format):
+    """Serialized accessible photometry of a set of objects, keyed by obj_id.
+
+    Parameters
+    ----------
+    obj_ids : list of str
+        IDs of the objects.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions the photometry is filtered by.
+    outsys, format
+        See `serialize_photometry`.
+
+    Returns
+    -------
+    photometry : collections.defaultdict
+        List of serialized points of each object, keyed by obj_id.
+    """
+    photometry = defaultdict(list)
+    if len(obj_ids) == 0:
+        return photometry
+    rows = photometry_serialization_query(
+        Photometry.query_records_accessible_by(user).filter(
+            Photometry.obj_id.in_(obj_ids)
+        )
+    ).all()
+    for point in serialize_photometry(rows, outsys, format):
+        photometry[point['obj_id']].append(point)
+    return photometry
+
+
+def count_photometry_points(data):
+    """Number of photometry points in an upload: the length of its longest
+    list-valued field, or 1 if all fields are scalars."""
+    return max(
+        [
+            len(data[key])
+            for key in data
+            if isinstance(data[key], (list, tuple))
+            and key not in ["group_ids", "stream_ids"]
+        ]
+        + [1]
+    )
+
+
+def validate_photometry_envelope(data):
+    """Check that an upload has the fields of either `PhotMagFlexible` or
+    `PhotFluxFlexible`, without looking at the values of individual points.
+
+    Parameters
+    ----------
+    data : dict
+        Photometry upload, as posted to `/api/photometry`.
+
+    Returns
+    -------
+    data : dict
+        The upload, as loaded by the matching schema.
+    kind : {'mag', 'flux'}
+        Whether the points are given in magnitude or flux space.
+    """
 
     if not isinstance(data, dict):
         raise ValidationError(
@@ -184,16 +785,7 @@ def standardize_photometry_data(data):
         del data["altdata"]
     if "altdata" in data:
         if isinstance(data["altdata"], dict):
-            max_num_elements = max(
-                [
-                    len(data[key])
-                    for key in data
-                    if isinstance(data[key], (list, tuple))
-                    and key not in ["group_ids", "stream_ids"]
-                ]
-                + [1]
-            )
-            data["altdata"] = [data["altdata"]] * max_num_elements
+            data["altdata"] = [data["altdata"]] * count_photometry_points(data)
 
     # quick validation - just to make sure things have the right fields
     try:
@@ -214,6 +806,13 @@ def standardize_photometry_data(data):
     else:
         kind = 'mag'
 
+    return data, kind
+
+
+def standardize_photometry_data(data):
+
+    data, kind = validate_photometry_envelope(data)
+
     # not used here
     _ = data.pop('group_ids', None)
     _ = data.pop('stream_ids', None)
@@ -239,6 +838,32 @@ def standardize_photometry_data(data):
     # -dataframe-to-integers-in-pandas-0-17-0/34844867
     df = df.apply(pd.to_numeric, errors='ignore')
 
+    return standardize_photometry_dataframe(df, kind)
+
+
+def standardize_photometry_dataframe(df, kind):
+    """Validate a table of photometry packets and convert their fluxes or
+    magnitudes to microjanskies in the AB system.
+
+    Parameters
+    ----------
+    df : `pandas.DataFrame`
+        One row per photometry point, with numeric columns already coerced to
+        numeric dtypes and all optional columns of `PhotMagFlexible` (if
+        `kind` is 'mag') or `PhotFluxFlexible` (if `kind` is 'flux') present.
+    kind : {'mag', 'flux'}
+        Whether the points are given in magnitude or flux space.
+
+    Returns
+    -------
+    df : `pandas.DataFrame`
+        The input, with the additional columns 'standardized_flux' and
+        'standardized_fluxerr'.
+    instrument_cache : dict
+        Metadata (`InstrumentMetadata`) of the instruments referenced by
+        `df`, keyed by ID.
+    """
+
     # set origin to 'None' where it is None.
     df.loc[df['origin'].isna(), 'origin'] = 'None'
 
@@ -362,21 +987,158 @@ def standardize_photometry_data(data):
     df['standardized_flux'] = standardized.flux
     df['standardized_fluxerr'] = standardized.fluxerr
 
-    instrument_cache = {}
-    for iid in df['instrument_id'].unique():
-        instrument = Instrument.query.get(int(iid))
-        if not instrument:
+    instrument_ids = [int(iid) for iid in df['instrument_id'].unique()]
+    instrument_cache = instrument_metadata_cache.get_many(instrument_ids)
+    for iid in instrument_ids:
+        if iid not in instrument_cache:
             raise ValidationError(f'Invalid instrument ID: {iid}')
-        instrument_cache[iid] = instrument
 
-    for oid in df['obj_id'].unique():
-        obj = Obj.query.get(oid)
-        if not obj:
+    obj_ids = [str(oid) for oid in df['obj_id'].unique()]
+    existing_obj_ids = set(
+        DBSession().execute(sa.select(Obj.id).where(Obj.id.in_(obj_ids))).scalars()
+    )
+    for oid in obj_ids:
+        if oid not in existing_obj_ids:
             raise ValidationError(f'Invalid object ID: {oid}')
 
     return df, instrument_cache
 
 
+COLUMNAR_PHOTOMETRY_FORMATS = ('npz', 'parquet', 'arrow')
+
+COLUMNAR_PHOTOMETRY_CONTENT_TYPES = {
+    'application/x-npz': 'npz',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/vnd.apache.arrow.file': 'arrow',
+}
+
+NUMERIC_PHOTOMETRY_COLUMNS = (
+    'mjd',
+    'instrument_id',
+    'mag',
+    'magerr',
+    'limiting_mag',
+    'limiting_mag_nsigma',
+    'flux',
+    'fluxerr',
+    'zp',
+    'ra',
+    'dec',
+    'ra_unc',
+    'dec_unc',
+    'assignment_id',
+)
+
+
+def read_columnar_photometry(body, format):
+    """Read a binary, columnar photometry payload into a DataFrame, without
+    going through JSON or per-row Python objects.
+
+    Parameters
+    ----------
+    body : bytes
+        The payload. Column names follow `PhotMagFlexible` or
+        `PhotFluxFlexible`; `altdata`, if present, is a column of JSON
+        strings.
+    format : {'npz', 'parquet', 'arrow'}
+        Serialization of the payload: a NumPy `.npz` archive (zero-dimensional
+        arrays are broadcast to the length of the other columns), a Parquet
+        file, or an Arrow IPC file (a.k.a. Feather v2).
+
+    Returns
+    -------
+    df : `pandas.DataFrame`
+        The photometry, with default values filled in for missing optional
+        columns.
+    kind : {'mag', 'flux'}
+        Whether the points are given in magnitude or flux space.
+    """
+    buffer = BytesIO(body)
+    try:
+        if format == 'npz':
+            with np.load(buffer, allow_pickle=False) as npz:
+                columns = {key: npz[key] for key in npz.files}
+            if any(column.ndim > 1 for column in columns.values()):
+                raise ValidationError('NPZ photometry columns must be 0- or 1-D.')
+            scalars = {k: v.item() for k, v in columns.items() if v.ndim == 0}
+            vectors = {k: v for k, v in columns.items() if v.ndim == 1}
+            df = pd.DataFrame(vectors if vectors else [scalars])
+            for key, value in scalars.items():
+                df[key] = value
+        elif format == 'parquet':
+            df = pd.read_parquet(buffer)
+        elif format == 'arrow':
+            df = pd.read_feather(buffer)
+        else:
+            raise ValidationError(
+                f'Invalid columnar format "{format}", must be one of '
+                f'{list(COLUMNAR_PHOTOMETRY_FORMATS)}.'
+            )
+    except (OSError, ValueError) as e:
+        raise ValidationError(f'Unable to read {format} photometry payload: {e}')
+
+    if len(df) == 0:
+        raise ValidationError('No photometry in payload.')
+
+    # mag space takes precedence, as in `standardize_photometry_data`
+    for kind, schema in [('mag', PhotMagFlexible), ('flux', PhotFluxFlexible)]:
+        if all(key in df for key in schema.required_keys):
+            break
+    else:
+        missing = {
+            kind: [key for key in schema.required_keys if key not in df]
+            for kind, schema in [('mag', PhotMagFlexible), ('flux', PhotFluxFlexible)]
+        }
+        raise ValidationError(
+            'Invalid input format: missing required columns for data in mag '
+            f'space: {missing["mag"]}; for data in flux space: {missing["flux"]}.'
+        )
+
+    # the schemas do not check the values of these columns, and sncosmo raises
+    # a bare Exception when normalizing unknown ones
+    invalid = df['magsys'].notna() & ~df['magsys'].isin(ALLOWED_MAGSYSTEMS)
+    if invalid.any():
+        raise ValidationError(
+            f'Invalid magsys "{df["magsys"][invalid].iloc[0]}", must be one of '
+            f'{list(ALLOWED_MAGSYSTEMS)}.'
+        )
+    invalid = df['filter'].notna() & ~df['filter'].isin(ALLOWED_BANDPASSES)
+    if invalid.any():
+        raise ValidationError(
+            f'Invalid filter "{df["filter"][invalid].iloc[0]}", must be an '
+            'allowed bandpass.'
+        )
+
+    optional_columns = ['ra', 'dec', 'ra_unc', 'dec_unc', 'origin', 'assignment_id']
+    optional_columns += ['mag', 'magerr'] if kind == 'mag' else ['flux']
+    for key in optional_columns:
+        if key not in df:
+            df[key] = None
+    if kind == 'mag' and 'limiting_mag_nsigma' not in df:
+        df['limiting_mag_nsigma'] = PHOT_DETECTION_THRESHOLD
+
+    if 'altdata' in df:
+        df['altdata'] = [
+            json.loads(altdata) if isinstance(altdata, (str, bytes)) else None
+            for altdata in df['altdata']
+        ]
+    else:
+        df['altdata'] = None
+
+    # columns are typed, so only all-null (object) columns need coercion
+    for key in NUMERIC_PHOTOMETRY_COLUMNS:
+        if key in df and not pd.api.types.is_numeric_dtype(df[key]):
+            try:
+                df[key] = pd.to_numeric(df[key])
+            except (ValueError, TypeError):
+                raise ValidationError(f'Column {key} must be numeric.')
+
+    df['obj_id'] = df['obj_id'].astype(str)
+
+    return df, kind
+
+
 def get_values_table_and_condition(df):
     """Return a postgres VALUES representation of the indexed columns of
     a photometry dataframe returned by `standardize_photometry_data`.
@@ -439,28 +1201,126 @@ def get_values_table_and_condition(df):
     return values_table, condition
 
 
-def insert_new_photometry_data(
-    df, instrument_cache, group_ids, stream_ids, user, validate=True
-):
-    # check for existing photometry and error if any is found
-    if validate:
-        values_table, condition = get_values_table_and_condition(df)
+def check_repeated_photometry(df):
+    """Raise a ValidationError if points of an upload repeat each other.
 
-        duplicated_photometry = (
-            DBSession()
-            .execute(sa.select(Photometry).join(values_table, condition))
-            .scalars()
-            .all()
+    Parameters
+    ----------
+    df : `pandas.DataFrame`
+        Photometry, as returned by `standardize_photometry_data`.
+    """
+    key_columns = [
+        'obj_id',
+        'instrument_id',
+        'origin',
+        'mjd',
+        'standardized_fluxerr',
+        'standardized_flux',
+    ]
+    repeated = df.duplicated(subset=key_columns, keep=False)
+    if repeated.any():
+        repeated_points = (
+            df.loc[repeated, key_columns]
+            .rename(
+                columns={
+                    'standardized_fluxerr': 'fluxerr',
+                    'standardized_flux': 'flux',
+                }
+            )
+            .astype(object)
+            .where(lambda d: d.notnull(), None)
+            .to_dict('records')
+        )
+        raise ValidationError(
+            'The following photometry is duplicated within the upload '
+            f'(rows {df.index[repeated].tolist()}): {repeated_points}.'
         )
 
-        dict_rep = [d.to_dict() for d in duplicated_photometry]
 
-        if len(dict_rep) > 0:
+def validate_new_photometry(df, instrument_cache, upload_id=None):
+    """Check a whole upload before inserting any of it: raise a
+    ValidationError if a point has a filter its instrument does not have,
+    repeats another point of the upload, or duplicates photometry that is
+    already in the database.
+
+    Parameters
+    ----------
+    df : `pandas.DataFrame`
+        Photometry, as returned by `standardize_photometry_data`.
+    instrument_cache : dict
+        Instrument metadata keyed by ID, as returned by
+        `standardize_photometry_data`.
+    upload_id : str, optional
+        Upload ID of the points of `df` already inserted (e.g., by an
+        interrupted upload), which are not reported as duplicates.
+    """
+    for instrument_id, filter in (
+        df[['instrument_id', 'filter']].drop_duplicates().itertuples(index=False)
+    ):
+        instrument = instrument_cache[int(instrument_id)]
+        if filter not in instrument.filters:
+            raise ValidationError(
+                f"Instrument {instrument.name} has no filter {filter}."
+            )
+
+    check_repeated_photometry(df)
+
+    session = DBSession()
+    for start in range(0, len(df), PHOTOMETRY_INGESTION_CHUNK_SIZE):
+        chunk = df.iloc[start : start + PHOTOMETRY_INGESTION_CHUNK_SIZE]
+        values_table, condition = get_values_table_and_condition(chunk)
+        query = sa.select(Photometry).join(values_table, condition)
+        if upload_id is not None:
+            query = query.where(Photometry.upload_id != upload_id)
+        existing = session.execute(query).scalars().all()
+        if len(existing) > 0:
+            dict_rep = [d.to_dict() for d in existing]
             raise ValidationError(
                 'The following photometry already exists '
                 f'in the database: {dict_rep}.'
             )
 
+
+def insert_new_photometry_data(
+    df, instrument_cache, group_ids, stream_ids, user, validate=True, upload_id=None
+):
+    """Insert standardized photometry into the database. The caller is
+    responsible for committing the transaction.
+
+    Parameters
+    ----------
+    df : `pandas.DataFrame`
+        Photometry, as returned by `standardize_photometry_data`.
+    instrument_cache : dict
+        Instrument metadata keyed by ID, as returned by
+        `standardize_photometry_data`.
+    group_ids : list of int
+        IDs of the groups that can access the new photometry.
+    stream_ids : list of int
+        IDs of the streams associated with the new photometry.
+    user : User
+        User uploading the photometry.
+    validate : bool, optional
+        If True (default), raise a ValidationError if any point duplicates
+        another point of `df` or photometry that is already in the database.
+        Otherwise, silently skip the duplicates.
+    upload_id : str, optional
+        Upload ID to assign to the inserted points. By default, a new one is
+        generated.
+
+    Returns
+    -------
+    ids : list of int
+        IDs of the inserted photometry, in the order of `df`.
+    upload_id : str
+        Upload ID shared by all inserted points.
+    """
+
+    # points repeated within the upload conflict with each other rather than
+    # with the database, so report them before inserting anything
+    if validate:
+        check_repeated_photometry(df)
+
     # pre-fetch the photometry PKs. these are not guaranteed to be
     # gapless (e.g., 1, 2, 3, 4, 5, ...) but they are guaranteed
     # to be unique in the table and thus can be used to "reserve"
@@ -478,14 +1338,13 @@ def insert_new_photometry_data(
     df.loc[df['standardized_flux'].isna(), 'standardized_flux'] = np.nan
 
     rows = df.to_dict('records')
-    upload_id = str(uuid.uuid4())
+    if upload_id is None:
+        upload_id = str(uuid.uuid4())
 
     params = []
-    group_photometry_params = []
-    stream_photometry_params = []
     for packet in rows:
-        if packet["filter"] not in instrument_cache[packet['instrument_id']].filters:
-            instrument = instrument_cache[packet['instrument_id']]
+        instrument = instrument_cache[int(packet['instrument_id'])]
+        if packet["filter"] not in instrument.filters:
             raise ValidationError(
                 f"Instrument {instrument.name} has no filter " f"{packet['filter']}."
             )
@@ -499,7 +1358,7 @@ def insert_new_photometry_data(
         if original_user_data == {}:
             original_user_data = None
 
-        utcnow = datetime.datetime.utcnow().isoformat()
+        utcnow = datetime.datetime.utcnow()
         phot = dict(
             id=packet['id'],
             original_user_data=json.dumps(original_user_data),
@@ -523,10 +1382,41 @@ def insert_new_photometry_data(
 
         params.append(phot)
 
+    inserted_ids = set()
+    if len(params) > 0:
+        inserted_ids = insert_photometry_using_staging_table(params)
+
+    # check for existing photometry and error if any is found
+    if validate and len(inserted_ids) < len(params):
+        duplicates = df[~df['id'].isin(list(inserted_ids))]
+        values_table, condition = get_values_table_and_condition(duplicates)
+
+        duplicated_photometry = (
+            DBSession()
+            .execute(
+                sa.select(Photometry)
+                .join(values_table, condition)
+                .filter(Photometry.id.notin_(ids))
+            )
+            .scalars()
+            .all()
+        )
+
+        dict_rep = [d.to_dict() for d in duplicated_photometry]
+        raise ValidationError(
+            'The following photometry already exists ' f'in the database: {dict_rep}.'
+        )
+
+    ids = [id for id in ids if id in inserted_ids]
+
+    group_photometry_params = []
+    stream_photometry_params = []
+    utcnow = datetime.datetime.utcnow()
+    for id in ids:
         for group_id in group_ids:
             group_photometry_params.append(
                 {
-                    'photometr_id': packet['id'],
+                    'photometr_id': id,
                     'group_id': group_id,
                     'created_at': utcnow,
                     'modified': utcnow,
@@ -536,39 +1426,13 @@ def insert_new_photometry_data(
         for stream_id in stream_ids:
             stream_photometry_params.append(
                 {
-                    'photometr_id': packet['id'],
+                    'photometr_id': id,
                     'stream_id': stream_id,
                     'created_at': utcnow,
                     'modified': utcnow,
                 }
             )
 
-    if len(params) > 0:
-        save_data_using_copy(
-            params,
-            "photometry",
-            (
-                'id',
-                'original_user_data',
-                'upload_id',
-                'flux',
-                'fluxerr',
-                'obj_id',
-                'altdata',
-                'instrument_id',
-                'ra_unc',
-                'dec_unc',
-                'mjd',
-                'filter',
-                'ra',
-                'dec',
-                'origin',
-                'owner_id',
-                'created_at',
-                'modified',
-            ),
-        )
-
     if len(group_photometry_params) > 0:
         # Bulk COPY in the group_photometry records
         save_data_using_copy(
@@ -585,7 +1449,9 @@ def insert_new_photometry_data(
             ('photometr_id', 'stream_id', 'created_at', 'modified'),
         )
 
-    DBSession.commit()
+    if len(ids) > 0:
+        refresh_detection_summaries(df['obj_id'].unique().tolist())
+
     return ids, upload_id
 
 
@@ -664,20 +1530,12 @@ def add_external_photometry(json, user):
     stream_ids = get_stream_ids(json, user)
     df, instrument_cache = standardize_photometry_data(json)
 
-    # This lock ensures that the Photometry table data are not modified in any way
-    # between when the query for duplicate photometry is first executed and
-    # when the insert statement with the new photometry is performed.
-    # From the psql docs: This mode protects a table against concurrent
-    # data changes, and is self-exclusive so that only one session can
-    # hold it at a time.
     with DBSession() as session:
         try:
-            session.execute(
-                f'LOCK TABLE {Photometry.__tablename__} IN SHARE ROW EXCLUSIVE MODE'
-            )
             ids, upload_id = insert_new_photometry_data(
                 df, instrument_cache, group_ids, stream_ids, user
             )
+            session.commit()
         except Exception as e:
             session.rollback()
             log(f"Unable to post photometry: {e}")
@@ -685,6 +1543,221 @@ def add_external_photometry(json, user):
     log("Successfully posted photometry")
 
 
+def ingest_photometry(upload_id):
+    """
+    Standardize and insert a queued asynchronous photometry upload, recording
+    its progress in the matching PhotometryUpload. Runs on
+    `photometry_ingestion_executor`.
+
+    The upload is first claimed by switching it from 'queued' to 'running',
+    so that it is only processed once even if it was queued twice (see
+    `recover_photometry_uploads`). The whole upload is then checked with
+    `validate_new_photometry`, so that invalid or duplicate points fail it
+    before anything is inserted, like a synchronous upload. Points are then
+    inserted in chunks of `PHOTOMETRY_INGESTION_CHUNK_SIZE`, each committed
+    along with the updated `n_inserted`, so that an interrupted upload
+    resumes after its last committed chunk.
+
+    If a chunk still fails (e.g., a concurrent upload inserted the same
+    points after the checks), the upload is marked as failed and the points
+    of the previous chunks, its first `n_inserted` points, stay inserted
+    under its upload ID; the error says how to delete them.
+
+    Parameters
+    ----------
+    upload_id : str
+        Upload ID of the PhotometryUpload tracking this upload, whose
+        `payload` holds the photometry (schema of schemas/PhotMagFlexible or
+        schemas/PhotFluxFlexible) and the IDs of its groups and streams.
+    """
+
+    session = DBSession()
+    uploads = PhotometryUpload.__table__
+    utcnow = datetime.datetime.utcnow()
+    n_inserted = 0
+
+    def get_upload(for_update=False):
+        query = session.query(PhotometryUpload).filter(
+            PhotometryUpload.upload_id == upload_id
+        )
+        if for_update:
+            query = query.with_for_update()
+        return query.one()
+
+    try:
+        claimed = session.execute(
+            sa.update(uploads)
+            .where(uploads.c.upload_id == upload_id, uploads.c.status == 'queued')
+            .values(
+                status='running',
+                worker=PHOTOMETRY_INGESTION_WORKER,
+                started_at=sa.func.coalesce(uploads.c.started_at, utcnow),
+                modified=utcnow,
+            )
+            .returning(uploads.c.id)
+        ).first()
+        session.commit()
+        if claimed is None:
+            return
+
+        upload = get_upload()
+        payload = upload.payload
+        n_inserted = upload.n_inserted or 0
+        df, instrument_cache = standardize_photometry_data(payload['data'])
+        user = session.query(User).get(upload.owner_id)
+        validate_new_photometry(df, instrument_cache, upload_id=upload_id)
+        session.rollback()
+
+        for start in range(n_inserted, len(df), PHOTOMETRY_INGESTION_CHUNK_SIZE):
+            chunk = df.iloc[start : start + PHOTOMETRY_INGESTION_CHUNK_SIZE].copy()
+            # Stop if another process has taken the upload over in the meantime
+            upload = get_upload(for_update=True)
+            if upload.status != 'running' or upload.worker != (
+                PHOTOMETRY_INGESTION_WORKER
+            ):
+                session.rollback()
+                return
+            insert_new_photometry_data(
+                chunk,
+                instrument_cache,
+                payload['group_ids'],
+                payload['stream_ids'],
+                user,
+                upload_id=upload_id,
+            )
+            upload.n_inserted = start + len(chunk)
+            session.commit()
+            n_inserted = upload.n_inserted
+
+        upload = get_upload()
+        upload.status = 'complete'
+        upload.n_inserted = len(df)
+        upload.payload = None
+        upload.finished_at = datetime.datetime.utcnow()
+        session.commit()
+        log(f"Photometry upload {upload_id}: inserted {len(df)} points")
+    except Exception as e:
+        session.rollback()
+        log(f"Photometry upload {upload_id} failed: {e}")
+        error = str(e.args[0]) if len(e.args) > 0 else repr(e)
+        if n_inserted > 0:
+            error += (
+                f" The first {n_inserted} points were inserted before the "
+                "failure; delete them with "
+                f"/api/photometry/bulk_delete/{upload_id} before uploading again."
+            )
+        utcnow = datetime.datetime.utcnow()
+        # Leave the upload alone if another process has taken it over
+        session.execute(
+            sa.update(uploads)
+            .where(
+                uploads.c.upload_id == upload_id,
+                uploads.c.worker == PHOTOMETRY_INGESTION_WORKER,
+                uploads.c.status.in_(['queued', 'running']),
+            )
+            .values(
+                status='failed',
+                error=error,
+                payload=None,
+                finished_at=utcnow,
+                modified=utcnow,
+            )
+        )
+        session.commit()
+    finally:
+        DBSession.remove()
+
+
+def _worker_is_alive(worker):
+    """Whether the app server process of a `PhotometryUpload.worker` is
+    still running, if it ran on this host. Returns None for other hosts."""
+    try:
+        hostname, pid = worker.rsplit(':', 1)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False
+    if hostname != socket.gethostname():
+        return None
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recover_photometry_uploads():
+    """Resume the asynchronous photometry uploads left behind by app server
+    processes that stopped, e.g. when the app was restarted.
+
+    An upload that is 'queued' or 'running' is taken over if the process it
+    was queued on is no longer running (for processes on this host), or if
+    it has not made progress in `PHOTOMETRY_UPLOAD_STALE_AFTER` (for other
+    hosts). It is then queued again on this process, and resumes after its
+    last committed chunk. Uploads queued before their payload was stored
+    are marked as failed.
+
+    Returns
+    -------
+    upload_ids : list of str
+        IDs of the uploads that were queued again.
+    """
+    session = DBSession()
+    uploads = PhotometryUpload.__table__
+    stale_before = datetime.datetime.utcnow() - PHOTOMETRY_UPLOAD_STALE_AFTER
+    requeued = []
+    try:
+        pending = session.execute(
+            sa.select(
+                uploads.c.upload_id,
+                uploads.c.status,
+                uploads.c.worker,
+                uploads.c.modified,
+                uploads.c.payload.isnot(None),
+            ).where(uploads.c.status.in_(['queued', 'running']))
+        ).all()
+        for upload_id, status, worker, modified, has_payload in pending:
+            alive = _worker_is_alive(worker)
+            if alive or (alive is None and modified >= stale_before):
+                continue
+            utcnow = datetime.datetime.utcnow()
+            values = (
+                {'status': 'queued', 'worker': PHOTOMETRY_INGESTION_WORKER}
+                if has_payload
+                else {
+                    'status': 'failed',
+                    'error': 'The upload was interrupted and cannot be resumed.',
+                    'finished_at': utcnow,
+                }
+            )
+            # Only take the upload over if no one else did in the meantime
+            taken_over = session.execute(
+                sa.update(uploads)
+                .where(
+                    uploads.c.upload_id == upload_id,
+                    uploads.c.status == status,
+                    uploads.c.worker.is_not_distinct_from(worker),
+                    uploads.c.modified == modified,
+                )
+                .values(modified=utcnow, **values)
+                .returning(uploads.c.id)
+            ).first()
+            session.commit()
+            if taken_over is not None and has_payload:
+                requeued.append(upload_id)
+    finally:
+        DBSession.remove()
+
+    for upload_id in requeued:
+        photometry_ingestion_executor.submit(ingest_photometry, upload_id)
+    if len(requeued) > 0:
+        log(f"Resumed {len(requeued)} interrupted photometry uploads")
+    return requeued
+
+
 class PhotometryHandler(BaseHandler):
     @permissions(['Upload data'])
     def post(self):
@@ -693,6 +1766,19 @@ class PhotometryHandler(BaseHandler):
         description: Upload photometry
         tags:
           - photometry
+        parameters:
+          - in: query
+            name: async
+            required: false
+            schema:
+              type: boolean
+            description: |
+              If true, only check that the upload has the expected fields,
+              queue it for processing in the background and return
+              immediately (with status 202) with its upload ID. Use
+              `/api/photometry/uploads/{upload_id}` to follow its progress.
+              Invalid or duplicate points fail the upload before any point
+              is inserted. Defaults to false.
         requestBody:
           content:
             application/json:
@@ -723,8 +1809,28 @@ class PhotometryHandler(BaseHandler):
                                 Upload ID associated with all photometry points
                                 added in request. Can be used to later delete all
                                 points in a single request.
+          202:
+            content:
+              application/json:
+                schema:
+                  allOf:
+                    - $ref: '#/components/schemas/Success'
+                    - type: object
+                      properties:
+                        data:
+                          type: object
+                          properties:
+                            upload_id:
+                              type: string
+                              description: |
+                                Upload ID of the queued upload.
         """
 
+        try:
+            async_upload = strtobool(str(self.get_query_argument('async', 'false')))
+        except ValueError:
+            return self.error('Invalid value for async (must be true or false)')
+
         try:
             group_ids = get_group_ids(self.get_json(), self.associated_user_object)
         except ValidationError as e:
@@ -734,22 +1840,39 @@ class PhotometryHandler(BaseHandler):
         except ValidationError as e:
             return self.error(e.args[0])
 
+        if async_upload:
+            try:
+                data, _ = validate_photometry_envelope(self.get_json())
+            except ValidationError as e:
+                return self.error(e.args[0])
+
+            upload = PhotometryUpload(
+                upload_id=str(uuid.uuid4()),
+                owner_id=self.associated_user_object.id,
+                status='queued',
+                n_rows=count_photometry_points(data),
+                payload={
+                    'data': data,
+                    'group_ids': group_ids,
+                    'stream_ids': stream_ids,
+                },
+                worker=PHOTOMETRY_INGESTION_WORKER,
+            )
+            DBSession().add(upload)
+            self.verify_and_commit()
+
+            photometry_ingestion_executor.submit(ingest_photometry, upload.upload_id)
+            return self.success(data={'upload_id': upload.upload_id}, status=202)
+
         try:
             df, instrument_cache = standardize_photometry_data(self.get_json())
         except (ValidationError, RuntimeError) as e:
             return self.error(e.args[0])
 
-        # This lock ensures that the Photometry table data are not modified in any way
-        # between when the query for duplicate photometry is first executed and
-        # when the insert statement with the new photometry is performed.
-        # From the psql docs: This mode protects a table against concurrent
-        # data changes, and is self-exclusive so that only one session can
-        # hold it at a time.
+        # Duplicates are detected by the deduplication index at insert time,
+        # so no table lock is needed to guard against concurrent uploads.
         with DBSession() as session:
             try:
-                session.execute(
-                    f'LOCK TABLE {Photometry.__tablename__} IN SHARE ROW EXCLUSIVE MODE'
-                )
                 ids, upload_id = insert_new_photometry_data(
                     df,
                     instrument_cache,
@@ -757,6 +1880,7 @@ class PhotometryHandler(BaseHandler):
                     stream_ids,
                     self.associated_user_object,
                 )
+                self.verify_and_commit()
             except Exception as e:
                 session.rollback()
                 return self.error(e.args[0])
@@ -817,89 +1941,36 @@ class PhotometryHandler(BaseHandler):
         except ValidationError as e:
             return self.error(e.args[0])
 
-        values_table, condition = get_values_table_and_condition(df)
-
-        # This lock ensures that the Photometry table data are not modified
-        # in any way between when the query for duplicate photometry is first
-        # executed and when the insert statement with the new photometry is
-        # performed. From the psql docs: This mode protects a table against
-        # concurrent data changes, and is self-exclusive so that only one
-        # session can hold it at a time.
-
+        # New points are inserted with ON CONFLICT DO NOTHING against the
+        # deduplication index, which waits only on concurrent inserts of the
+        # very same points. Once the insert returns, every row of `df` has a
+        # committed or self-inserted counterpart in the photometry table.
         with DBSession() as session:
             try:
-                session.execute(
-                    f'LOCK TABLE {Photometry.__tablename__} IN SHARE ROW EXCLUSIVE MODE'
-                )
-                new_photometry_query = session.execute(
-                    sa.select(values_table.c.pdidx)
-                    .outerjoin(Photometry, condition)
-                    .filter(Photometry.id.is_(None))
+                new_ids, _ = insert_new_photometry_data(
+                    df,
+                    instrument_cache,
+                    group_ids,
+                    stream_ids,
+                    self.associated_user_object,
+                    validate=False,
                 )
 
-                new_photometry_df_idxs = [g[0] for g in new_photometry_query]
-
-                duplicated_photometry = (
+                values_table, condition = get_values_table_and_condition(df)
+                id_map = dict(
                     session.execute(
-                        sa.select(values_table.c.pdidx, Photometry)
-                        .join(Photometry, condition)
-                        .options(joinedload(Photometry.groups))
-                        .options(joinedload(Photometry.streams))
-                    )
-                    .unique()
-                    .all()
-                )
-
-                id_map = {}
-
-                for df_index, duplicate in duplicated_photometry:
-                    id_map[df_index] = duplicate.id
-                    duplicate_group_ids = set([g.id for g in duplicate.groups])
-                    duplicate_stream_ids = set([s.id for s in duplicate.streams])
-
-                    # posting to new groups?
-                    if len(set(group_ids) - duplicate_group_ids) > 0:
-                        # select old + new groups
-                        group_ids_update = set(group_ids).union(duplicate_group_ids)
-                        groups = (
-                            session.execute(
-                                sa.select(Group).filter(Group.id.in_(group_ids_update))
-                            )
-                            .scalars()
-                            .all()
+                        sa.select(values_table.c.pdidx, Photometry.id).join(
+                            Photometry, condition
                         )
-                        # update the corresponding photometry entry in the db
-                        duplicate.groups = groups
-
-                    # posting to new streams?
-                    if stream_ids:
-                        # Add new stream_photometry rows if not already present
-                        stream_ids_update = set(stream_ids) - duplicate_stream_ids
-                        if len(stream_ids_update) > 0:
-                            for id in stream_ids_update:
-                                session.add(
-                                    StreamPhotometry(
-                                        photometr_id=duplicate.id, stream_id=id
-                                    )
-                                )
-
-                # now safely drop the duplicates:
-                new_photometry = df.loc[new_photometry_df_idxs]
-
-                if len(new_photometry) > 0:
-                    ids, _ = insert_new_photometry_data(
-                        new_photometry,
-                        instrument_cache,
-                        group_ids,
-                        stream_ids,
-                        self.associated_user_object,
-                        validate=False,
-                    )
+                    ).all()
+                )
 
-                    for (df_index, _), id in zip(new_photometry.iterrows(), ids):
-                        id_map[df_index] = id
+                # share the pre-existing duplicates with any new groups/streams
+                duplicate_ids = list(set(id_map.values()) - set(new_ids))
+                add_photometry_to_groups_and_streams(
+                    duplicate_ids, group_ids, stream_ids
+                )
 
-                # release the lock
                 self.verify_and_commit()
 
             except Exception as e:
@@ -1060,6 +2131,138 @@ class PhotometryHandler(BaseHandler):
         return self.success()
 
 
+class ColumnarPhotometryHandler(BaseHandler):
+    @permissions(['Upload data'])
+    def post(self):
+        """
+        ---
+        description: |
+          Upload photometry as a typed, columnar binary payload. This is
+          equivalent to a POST to /api/photometry, but skips JSON parsing and
+          per-point validation, which dominate the cost of large uploads.
+        tags:
+          - photometry
+        parameters:
+          - in: query
+            name: format
+            required: false
+            description: |
+              Serialization of the request body: a NumPy `.npz` archive, a
+              Parquet file, or an Arrow IPC file. Defaults to the format
+              implied by the Content-Type header (application/x-npz,
+              application/vnd.apache.parquet, or
+              application/vnd.apache.arrow.file).
+            schema:
+              type: string
+              enum: [npz, parquet, arrow]
+          - in: query
+            name: group_ids
+            required: false
+            description: |
+              Comma-separated list of IDs of the groups to which the
+              photometry will be visible, or 'all' to share it with the
+              site-wide public group.
+            schema:
+              type: string
+          - in: query
+            name: stream_ids
+            required: false
+            description: |
+              Comma-separated list of IDs of the streams associated with the
+              photometry.
+            schema:
+              type: string
+        requestBody:
+          content:
+            application/octet-stream:
+              schema:
+                type: string
+                format: binary
+                description: |
+                  One column per field of PhotMagFlexible or PhotFluxFlexible
+                  (except group_ids and stream_ids). `altdata`, if given, is a
+                  column of JSON strings.
+        responses:
+          200:
+            content:
+              application/json:
+                schema:
+                  allOf:
+                    - $ref: '#/components/schemas/Success'
+                    - type: object
+                      properties:
+                        data:
+                          type: object
+                          properties:
+                            ids:
+                              type: array
+                              items:
+                                type: integer
+                              description: List of new photometry IDs
+                            upload_id:
+                              type: string
+                              description: |
+                                Upload ID associated with all photometry points
+                                added in request. Can be used to later delete all
+                                points in a single request.
+          400:
+            content:
+              application/json:
+                schema: Error
+        """
+        content_type = self.request.headers.get('Content-Type', '')
+        format = self.get_query_argument(
+            'format',
+            COLUMNAR_PHOTOMETRY_CONTENT_TYPES.get(content_type.split(';')[0].strip()),
+        )
+        if format not in COLUMNAR_PHOTOMETRY_FORMATS:
+            return self.error(
+                'Unable to determine payload format. Specify a `format` of '
+                f'{list(COLUMNAR_PHOTOMETRY_FORMATS)} or a matching Content-Type.'
+            )
+
+        ids_data = {}
+        try:
+            for key in ['group_ids', 'stream_ids']:
+                value = self.get_query_argument(key, None)
+                if value == 'all':
+                    ids_data[key] = value
+                elif value is not None:
+                    ids_data[key] = [int(id) for id in value.split(',')]
+        except ValueError:
+            return self.error(
+                'Invalid group_ids or stream_ids: must be comma-separated integers.'
+            )
+
+        try:
+            group_ids = get_group_ids(ids_data, self.associated_user_object)
+            stream_ids = get_stream_ids(ids_data, self.associated_user_object)
+        except ValidationError as e:
+            return self.error(e.args[0])
+
+        try:
+            df, kind = read_columnar_photometry(self.request.body, format)
+            df, instrument_cache = standardize_photometry_dataframe(df, kind)
+        except (ValidationError, RuntimeError) as e:
+            return self.error(e.args[0])
+
+        with DBSession() as session:
+            try:
+                ids, upload_id = insert_new_photometry_data(
+                    df,
+                    instrument_cache,
+                    group_ids,
+                    stream_ids,
+                    self.associated_user_object,
+                )
+                self.verify_and_commit()
+            except Exception as e:
+                session.rollback()
+                return self.error(e.args[0])
+
+        return self.success(data={'ids': ids, 'upload_id': upload_id})
+
+
 class ObjPhotometryHandler(BaseHandler):
     @auth_or_token
     def get(self, obj_id):
@@ -1068,14 +2271,16 @@ class ObjPhotometryHandler(BaseHandler):
         )
 
         Obj.get_if_accessible_by(obj_id, self.current_user, raise_if_none=True)
-        photometry = Photometry.query_records_accessible_by(self.current_user).filter(
-            Photometry.obj_id == obj_id
-        )
+        photometry = photometry_serialization_query(
+            Photometry.query_records_accessible_by(self.current_user).filter(
+                Photometry.obj_id == obj_id
+            )
+        ).all()
         format = self.get_query_argument('format', 'mag')
         outsys = self.get_query_argument('magsys', 'ab')
 
         self.verify_and_commit()
-        data = [serialize(phot, outsys, format) for phot in photometry]
+        data = serialize_photometry(photometry, outsys, format)
 
         if phase_fold_data:
             period, modified = None, arrow.Arrow(1, 1, 1)
@@ -1093,12 +2298,178 @@ class ObjPhotometryHandler(BaseHandler):
                         period = an.data[period_str]
                         modified = arrow.get(an.modified)
             if period is None:
-                self.error(f'No period for object {obj_id}')
-            for ii in range(len(data)):
-                data[ii]['phase'] = np.mod(data[ii]['mjd'], period) / period
+                return self.error(f'No period for object {obj_id}')
+            phases = phase_fold([point['mjd'] for point in data], float(period))
+            for point, phase in zip(data, phases.tolist()):
+                point['phase'] = phase
+
+        return self.success(data=data)
+
+
+class PhotometryUploadHandler(BaseHandler):
+    @auth_or_token
+    def get(self, upload_id):
+        """
+        ---
+        description: Retrieve the status of an asynchronous photometry upload
+        tags:
+          - photometry
+        parameters:
+          - in: path
+            name: upload_id
+            required: true
+            schema:
+              type: string
+        responses:
+          200:
+            content:
+              application/json:
+                schema: SinglePhotometryUpload
+          404:
+            content:
+              application/json:
+                schema: Error
+        """
+        upload = (
+            PhotometryUpload.query_records_accessible_by(self.current_user)
+            .filter(PhotometryUpload.upload_id == upload_id)
+            .first()
+        )
+        if upload is None:
+            return self.error(f'No photometry upload with ID {upload_id}', status=404)
 
+        data = upload.to_dict()
+        data.pop('payload', None)
+        data.pop('worker', None)
+        self.verify_and_commit()
         return self.success(data=data)
 
+    @permissions(['Upload data'])
+    def put(self, upload_id):
+        """
+        ---
+        description: |
+          Share all photometry of an upload with groups and/or streams, with
+          one set-based statement per group/stream table.
+        tags:
+          - photometry
+        parameters:
+          - in: path
+            name: upload_id
+            required: true
+            schema:
+              type: string
+        requestBody:
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  group_ids:
+                    oneOf:
+                      - type: array
+                        items:
+                          type: integer
+                      - type: string
+                    description: |
+                      List of IDs of groups to share the photometry with, or
+                      "all" for the sitewide group.
+                  stream_ids:
+                    type: array
+                    items:
+                      type: integer
+                    description: |
+                      List of IDs of streams to associate the photometry with.
+                  replace:
+                    type: boolean
+                    description: |
+                      If true, also remove the photometry from the groups
+                      (if `group_ids` is given) and streams (if `stream_ids`
+                      is given) that are not listed. The photometry always
+                      stays shared with its owner's single user group.
+                      Defaults to false.
+        responses:
+          200:
+            content:
+              application/json:
+                schema:
+                  allOf:
+                    - $ref: '#/components/schemas/Success'
+                    - type: object
+                      properties:
+                        data:
+                          type: object
+                          properties:
+                            n_photometry:
+                              type: integer
+                              description: Number of photometry points updated
+                            groups_added:
+                              type: integer
+                            groups_removed:
+                              type: integer
+                            streams_added:
+                              type: integer
+                            streams_removed:
+                              type: integer
+          400:
+            content:
+              application/json:
+                schema: Error
+        """
+        data = self.get_json()
+        if 'group_ids' not in data and 'stream_ids' not in data:
+            return self.error('At least one of group_ids or stream_ids is required')
+        update_groups = 'group_ids' in data
+        update_streams = 'stream_ids' in data
+        replace = data.pop('replace', False)
+
+        try:
+            group_ids = (
+                [int(i) for i in get_group_ids(data, self.associated_user_object)]
+                if update_groups
+                else []
+            )
+            stream_ids = (
+                [int(i) for i in get_stream_ids(data, self.associated_user_object)]
+                if update_streams
+                else []
+            )
+        except ValidationError as e:
+            return self.error(e.args[0])
+
+        photometry_ids = accessible_upload_photometry_ids(
+            self.current_user, upload_id, 'update'
+        )
+        n_photometry = (
+            DBSession()
+            .execute(sa.select(sa.func.count()).select_from(photometry_ids.subquery()))
+            .scalar()
+        )
+        if n_photometry == 0:
+            return self.error('Invalid bulk upload id.')
+
+        n_added = add_photometry_to_groups_and_streams(
+            photometry_ids, group_ids, stream_ids
+        )
+        n_removed = {'groups': 0, 'streams': 0}
+        if replace:
+            n_removed = remove_photometry_from_groups_and_streams(
+                photometry_ids,
+                keep_group_ids=group_ids if update_groups else None,
+                keep_stream_ids=stream_ids if update_streams else None,
+            )
+        self.verify_and_commit()
+
+        return self.success(
+            data={
+                'n_photometry': n_photometry,
+                'groups_added': n_added['groups'],
+                'groups_removed': n_removed['groups'],
+                'streams_added': n_added['streams'],
+                'streams_removed': n_removed['streams'],
+            }
+        )
+
 
 class BulkDeletePhotometryHandler(BaseHandler):
     @permissions(["Upload data"])
@@ -1124,32 +2495,40 @@ class BulkDeletePhotometryHandler(BaseHandler):
               application/json:
                 schema: Error
         """
-        photometry_to_delete = (
-            Photometry.query_records_accessible_by(self.current_user, mode="delete")
-            .filter(Photometry.upload_id == upload_id)
-            .all()
-        )
-
-        n = len(photometry_to_delete)
+        n = delete_photometry_by_upload_id(self.current_user, upload_id)
         if n == 0:
             return self.error('Invalid bulk upload id.')
 
-        for phot in photometry_to_delete:
-            DBSession().delete(phot)
-
-        self.verify_and_commit()
         return self.success(f"Deleted {n} photometry points.")
 
 
+def render_photometry_csv(photometry, write_header):
+    """Render serialized photometry points as CSV rows. Nested fields (groups
+    and altdata) are rendered as JSON."""
+    output = StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(photometry[0].keys()))
+    if write_header:
+        writer.writeheader()
+    for point in photometry:
+        writer.writerow(
+            {
+                **point,
+                'groups': json.dumps([g.id for g in point['groups']]),
+                'altdata': json.dumps(point['altdata']),
+            }
+        )
+    return output.getvalue()
+
+
 class PhotometryRangeHandler(BaseHandler):
     @auth_or_token
-    def get(self):
+    async def get(self):
         """Docstring appears below as an f-string."""
 
-        json = self.get_json()
+        data = self.get_json()
 
         try:
-            standardized = PhotometryRangeQuery.load(json)
+            standardized = PhotometryRangeQuery.load(data)
         except ValidationError as e:
             return self.error(f'Invalid request body: {e.normalized_messages()}')
 
@@ -1162,6 +2541,18 @@ class PhotometryRangeHandler(BaseHandler):
         if format not in ['mag', 'flux']:
             return self.error('Invalid output format.')
 
+        stream_format = self.get_query_argument('streamFormat', None)
+        if stream_format not in [None, 'ndjson', 'csv']:
+            return self.error('Invalid streamFormat, must be one of [ndjson, csv].')
+
+        try:
+            after_id = self.get_query_argument('afterId', None)
+            after_id = int(after_id) if after_id is not None else None
+            num_per_page = self.get_query_argument('numPerPage', None)
+            num_per_page = int(num_per_page) if num_per_page is not None else None
+        except ValueError:
+            return self.error('afterId and numPerPage must be integers.')
+
         instrument_ids = standardized['instrument_ids']
         min_date = standardized['min_date']
         max_date = standardized['max_date']
@@ -1169,7 +2560,9 @@ class PhotometryRangeHandler(BaseHandler):
         gids = [g.id for g in self.current_user.accessible_groups]
 
         group_phot_subquery = (
-            GroupPhotometry.query_records_accessible_by(self.current_user)
+            GroupPhotometry.query_records_accessible_by(
+                self.current_user, columns=[GroupPhotometry.photometr_id]
+            )
             .filter(GroupPhotometry.group_id.in_(gids))
             .subquery()
         )
@@ -1184,13 +2577,60 @@ class PhotometryRangeHandler(BaseHandler):
             mjd = Time(max_date, format='datetime').mjd
             query = query.filter(Photometry.mjd <= mjd)
 
-        query = query.join(
-            group_phot_subquery, Photometry.id == group_phot_subquery.c.photometr_id
+        query = query.filter(
+            Photometry.id.in_(sa.select(group_phot_subquery.c.photometr_id))
         )
 
-        output = [serialize(p, magsys, format) for p in query]
-        self.verify_and_commit()
-        return self.success(data=output)
+        query = photometry_serialization_query(query)
+
+        # keyset pagination: clients resume from the last ID they received
+        if after_id is not None:
+            query = query.filter(Photometry.id > after_id)
+        query = query.order_by(Photometry.id)
+        if num_per_page is not None:
+            query = query.limit(num_per_page)
+
+        if stream_format is None:
+            output = serialize_photometry(query.all(), magsys, format)
+            self.verify_and_commit()
+            return self.success(data=output)
+
+        # Stream the results with a server-side cursor, on a session of our
+        # own so that the cursor survives the other requests served by this
+        # process while we wait for the client to consume each chunk.
+        self.set_status(200)
+        if stream_format == 'csv':
+            self.set_header('Content-Type', 'text/csv; charset=utf-8')
+        else:
+            self.set_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+
+        with Session(bind=DBSession().bind) as session:
+            rows = iter(
+                query.with_session(session).yield_per(PHOTOMETRY_STREAM_CHUNK_SIZE)
+            )
+            self.verify_and_commit()
+
+            first_chunk = True
+            while True:
+                chunk = list(itertools.islice(rows, PHOTOMETRY_STREAM_CHUNK_SIZE))
+                if len(chunk) == 0:
+                    break
+
+                serialized = serialize_photometry(
+                    chunk, magsys, format, session=session
+                )
+                if stream_format == 'csv':
+                    self.write(render_photometry_csv(serialized, first_chunk))
+                else:
+                    self.write(''.join(f'{to_json(p)}\n' for p in serialized))
+                first_chunk = False
+                del chunk, serialized
+
+                try:
+                    await self.flush()
+                except StreamClosedError:
+                    # the client went away; it can resume later with `afterId`
+                    break
 
 
 PhotometryHandler.get.__doc__ = f"""
@@ -1318,6 +2758,36 @@ PhotometryRangeHandler.get.__doc__ = f"""
             schema:
               type: string
               enum: {list(ALLOWED_MAGSYSTEMS)}
+          - in: query
+            name: streamFormat
+            required: false
+            description: >-
+              Stream the results as newline-delimited JSON (one point per
+              line) or CSV, as they are read from the database, instead of
+              returning them in a single JSON response. Memory use is bounded
+              regardless of the size of the result.
+            schema:
+              type: string
+              enum:
+                - ndjson
+                - csv
+          - in: query
+            name: afterId
+            required: false
+            description: >-
+              Only return photometry with an ID larger than this one. Results
+              are ordered by ID, so a client can resume an interrupted export
+              or fetch the next page by passing the last ID it received.
+            schema:
+              type: integer
+          - in: query
+            name: numPerPage
+            required: false
+            description: >-
+              Maximum number of points to return. Defaults to all matching
+              points.
+            schema:
+              type: integer
         requestBody:
           content:
             application/json:
@@ -1326,6 +2796,12 @@ PhotometryRangeHandler.get.__doc__ = f"""
         responses:
           200:
             content:
+              application/x-ndjson:
+                schema:
+                  type: string
+              text/csv:
+                schema:
+                  type: string
               application/json:
                 schema:
                   oneOf:
@@ -1,7 +1,6 @@
 import datetime
 from json.decoder import JSONDecodeError
 from dateutil.tz import UTC
-import astropy.units as u
 from geojson import Point, Feature
 import python_http_client.exceptions
 from twilio.base.exceptions import TwilioException
@@ -16,7 +15,6 @@ from marshmallow import Schema, fields
 from marshmallow.exceptions import ValidationError
 import functools
 import conesearch_alchemy as ca
-import healpix_alchemy as ha
 from distutils.util import strtobool
 
 from baselayer.app.access import permissions, auth_or_token
@@ -51,6 +49,8 @@ from ...models import (
     Listing,
     Spectrum,
     SourceView,
+    ObjDuplicate,
+    obj_distances,
 )
 from ...utils.offset import (
     get_nearby_offset_stars,
@@ -61,12 +61,20 @@ from ...utils.offset import (
 )
 from .candidate import (
     grab_query_results,
+    grab_query_results_by_cursor,
     update_redshift_history_if_relevant,
     add_linked_thumbnails_and_push_ws_msg,
     Session,
 )
-from .photometry import serialize
+from .photometry import serialized_photometry_by_obj_id
 from .color_mag import get_color_mag
+from .batch_loaders import (
+    classifications_by_obj_id,
+    obj_ids_with_records,
+    records_by_obj_id,
+    records_exist,
+    source_groups_by_obj_id,
+)
 
 DEFAULT_SOURCES_PER_PAGE = 100
 MAX_SOURCES_PER_PAGE = 500
@@ -87,6 +95,290 @@ def apply_active_or_requested_filtering(query, include_requested, requested_only
     return query
 
 
+PERIOD_KEYS = ['period', 'Period', 'PERIOD']
+
+
+def serialize_sources_page(
+    objs,
+    user,
+    include_comments=False,
+    include_thumbnails=False,
+    include_photometry=False,
+    include_photometry_exists=False,
+    include_spectrum_exists=False,
+    include_period_exists=False,
+    include_color_mag=False,
+    remove_nested=False,
+    include_requested=False,
+    requested_only=False,
+):
+    """Serialize a page of sources along with their nested records.
+
+    Each kind of nested record is fetched for the whole page with a single
+    query (see `batch_loaders`), so the number of queries issued does not
+    depend on the number of sources on the page.
+
+    Parameters
+    ----------
+    objs : list of `skyportal.models.Obj`
+        Objs on the page, in order.
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions nested records are filtered by.
+    include_comments, include_thumbnails, include_photometry, \
+    include_photometry_exists, include_spectrum_exists, \
+    include_period_exists, include_color_mag : bool, optional
+        Whether to include the matching fields (see `SourceHandler.get`).
+    remove_nested : bool, optional
+        Whether to leave out classifications, annotations and groups.
+    include_requested, requested_only : bool, optional
+        Which saves of each source to list under `groups` (see
+        `apply_active_or_requested_filtering`).
+
+    Returns
+    -------
+    sources : list of dict
+    """
+    obj_ids = [obj.id for obj in objs]
+
+    if include_comments:
+        comments = records_by_obj_id(Comment, obj_ids, user)
+    if include_thumbnails:
+        thumbnails = records_by_obj_id(Thumbnail, obj_ids, user)
+    if not remove_nested:
+        classifications = classifications_by_obj_id(obj_ids, user)
+        groups = source_groups_by_obj_id(
+            obj_ids,
+            user,
+            filter_sources=lambda query: apply_active_or_requested_filtering(
+                query, include_requested, requested_only
+            ),
+        )
+    if not remove_nested or include_period_exists or include_color_mag:
+        annotations = records_by_obj_id(Annotation, obj_ids, user)
+    if include_photometry:
+        photometry = serialized_photometry_by_obj_id(obj_ids, user, 'ab', 'flux')
+    if include_photometry_exists:
+        obj_ids_with_photometry = obj_ids_with_records(Photometry, obj_ids, user)
+    if include_spectrum_exists:
+        obj_ids_with_spectra = obj_ids_with_records(Spectrum, obj_ids, user)
+    distances = obj_distances(objs)
+
+    sources = []
+    for obj, obj_distance in zip(objs, distances):
+        source = obj.to_dict()
+
+        if include_comments:
+            source["comments"] = sorted(
+                [
+                    {k: v for k, v in c.to_dict().items() if k != "attachment_bytes"}
+                    for c in comments[obj.id]
+                ],
+                key=lambda x: x["created_at"],
+                reverse=True,
+            )
+        if include_thumbnails:
+            source["thumbnails"] = thumbnails[obj.id]
+        if not remove_nested:
+            source["classifications"] = classifications[obj.id]
+            source["annotations"] = sorted(annotations[obj.id], key=lambda x: x.origin)
+
+        source["gal_lon"] = obj.gal_lon_deg
+        source["gal_lat"] = obj.gal_lat_deg
+        source.update(obj_distance)
+
+        if include_photometry:
+            source["photometry"] = photometry[obj.id]
+        if include_photometry_exists:
+            source["photometry_exists"] = obj.id in obj_ids_with_photometry
+        if include_spectrum_exists:
+            source["spectrum_exists"] = obj.id in obj_ids_with_spectra
+        if include_period_exists:
+            source["period_exists"] = any(
+                isinstance(an.data, dict) and period_key in an.data
+                for an in annotations[obj.id]
+                for period_key in PERIOD_KEYS
+            )
+        if not remove_nested:
+            source["groups"] = groups[obj.id]
+        if include_color_mag:
+            source["color_magnitude"] = get_color_mag(
+                sorted(annotations[obj.id], key=lambda x: x.origin)
+            )
+
+        sources.append(source)
+    return sources
+
+
+def serialize_source_detail(
+    obj,
+    user,
+    include_comments=False,
+    include_photometry=False,
+    include_photometry_exists=False,
+    include_spectrum_exists=False,
+    include_period_exists=False,
+    include_detection_stats=False,
+    include_color_mag=False,
+    include_requested=False,
+    requested_only=False,
+):
+    """Serialize a single source for the source page.
+
+    Each part of the source is fetched with a single set-based statement:
+    related records with their relationships eagerly loaded, the saved groups
+    with one Source-Group join, detection statistics together, and the
+    existence of photometry and spectra with EXISTS subqueries.
+
+    Parameters
+    ----------
+    obj : `skyportal.models.Obj`
+        The source's Obj (with `thumbnails` loaded, if they are to be
+        included).
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose read permissions related records are filtered by.
+    include_comments, include_photometry, include_photometry_exists, \
+    include_spectrum_exists, include_period_exists, include_detection_stats, \
+    include_color_mag : bool, optional
+        Whether to include the matching fields (see `SourceHandler.get`).
+    include_requested, requested_only : bool, optional
+        Which saves of the source to list under `groups` (see
+        `apply_active_or_requested_filtering`).
+
+    Returns
+    -------
+    source : dict
+    """
+    source = obj.to_dict()
+    obj_ids = [obj.id]
+
+    source["followup_requests"] = (
+        FollowupRequest.query_records_accessible_by(
+            user,
+            options=[
+                joinedload(FollowupRequest.allocation).joinedload(
+                    Allocation.instrument
+                ),
+                joinedload(FollowupRequest.allocation).joinedload(Allocation.group),
+                joinedload(FollowupRequest.requester),
+            ],
+        )
+        .filter(FollowupRequest.obj_id == obj.id)
+        .filter(FollowupRequest.status != "deleted")
+        .all()
+    )
+    source["assignments"] = (
+        ClassicalAssignment.query_records_accessible_by(
+            user,
+            options=[
+                joinedload(ClassicalAssignment.run)
+                .joinedload(ObservingRun.instrument)
+                .joinedload(Instrument.telescope)
+            ],
+        )
+        .filter(ClassicalAssignment.obj_id == obj.id)
+        .all()
+    )
+
+    # Duplicates (objects within 4 arcsecs, see ObjDuplicate)
+    duplicates = [
+        dup_id
+        for dup_id, in Obj.query_records_accessible_by(user, columns=[Obj.id])
+        .join(ObjDuplicate, ObjDuplicate.duplicate_obj_id == Obj.id)
+        .filter(ObjDuplicate.obj_id == obj.id)
+        .order_by(ObjDuplicate.separation)
+    ]
+    source["duplicates"] = duplicates if len(duplicates) > 0 else None
+
+    if include_comments:
+        comments = records_by_obj_id(
+            Comment,
+            obj_ids,
+            user,
+            options=[joinedload(Comment.author), joinedload(Comment.groups)],
+        )[obj.id]
+        source["comments"] = sorted(
+            [
+                {
+                    **{k: v for k, v in c.to_dict().items() if k != "attachment_bytes"},
+                    "author": {
+                        **c.author.to_dict(),
+                        "gravatar_url": c.author.gravatar_url,
+                    },
+                }
+                for c in comments
+            ],
+            key=lambda x: x["created_at"],
+            reverse=True,
+        )
+
+    source["annotations"] = sorted(
+        records_by_obj_id(
+            Annotation, obj_ids, user, options=[joinedload(Annotation.author)]
+        )[obj.id],
+        key=lambda x: x.origin,
+    )
+    if include_period_exists:
+        source["period_exists"] = any(
+            isinstance(an.data, dict) and period_key in an.data
+            for an in source["annotations"]
+            for period_key in PERIOD_KEYS
+        )
+    source["classifications"] = classifications_by_obj_id(obj_ids, user)[obj.id]
+
+    if include_detection_stats:
+        (
+            source["last_detected_at"],
+            source["last_detected_mag"],
+            source["peak_detected_at"],
+            source["peak_detected_mag"],
+        ) = (
+            DBSession()
+            .query(
+                Obj.last_detected_at(user),
+                Obj.last_detected_mag(user),
+                Obj.peak_detected_at(user),
+                Obj.peak_detected_mag(user),
+            )
+            .filter(Obj.id == obj.id)
+            .one()
+        )
+    source["gal_lat"] = obj.gal_lat_deg
+    source["gal_lon"] = obj.gal_lon_deg
+    source.update(obj_distances([obj])[0])
+
+    if include_photometry:
+        source["photometry"] = serialized_photometry_by_obj_id(
+            obj_ids, user, 'ab', 'flux'
+        )[obj.id]
+
+    exists_fields = {
+        "photometry_exists": (include_photometry_exists, Photometry),
+        "spectrum_exists": (include_spectrum_exists, Spectrum),
+    }
+    exists_fields = {
+        key: cls for key, (include, cls) in exists_fields.items() if include
+    }
+    source.update(
+        zip(
+            exists_fields,
+            records_exist(obj.id, user, list(exists_fields.values())),
+        )
+    )
+
+    source["groups"] = source_groups_by_obj_id(
+        obj_ids,
+        user,
+        filter_sources=lambda query: apply_active_or_requested_filtering(
+            query, include_requested, requested_only
+        ),
+    )[obj.id]
+
+    if include_color_mag:
+        source["color_magnitude"] = get_color_mag(source["annotations"])
+
+    return source
+
+
 def add_ps1_thumbnail_and_push_ws_msg(obj_id, user_id):
     session = Session()
     try:
@@ -299,6 +591,33 @@ class SourceHandler(BaseHandler):
             description: |
               Used only in the case of paginating query results - if provided, this
               allows for avoiding a potentially expensive query.count() call.
+          - in: query
+            name: useCursor
+            nullable: true
+            schema:
+              type: boolean
+            description: |
+              Boolean indicating whether to paginate with cursors rather than page
+              numbers: the response then includes a `nextCursor` to pass as `cursor`
+              to fetch the next page (null on the last page), and deep pages are as
+              fast to retrieve as the first one. Only available when sorting by id,
+              origin, ra, dec, redshift or saved_at. Defaults to false.
+          - in: query
+            name: cursor
+            nullable: true
+            schema:
+              type: string
+            description: |
+              Cursor returned as `nextCursor` with the previous page, implies
+              `useCursor`.
+          - in: query
+            name: includeTotalMatches
+            nullable: true
+            schema:
+              type: boolean
+            description: |
+              With cursor pagination, whether to also count the total number of
+              matches (`totalMatches`). Defaults to false.
           - in: query
             name: startDate
             nullable: true
@@ -506,6 +825,22 @@ class SourceHandler(BaseHandler):
               type: number
             description: |
               If provided, return only sources with a redshift of at most this value
+          - in: query
+            name: minGalLat
+            nullable: true
+            schema:
+              type: number
+            description: |
+              If provided, return only sources with an absolute galactic latitude
+              of at least this value [deg], i.e. away from the Galactic plane
+          - in: query
+            name: maxGalLat
+            nullable: true
+            schema:
+              type: number
+            description: |
+              If provided, return only sources with an absolute galactic latitude
+              of at most this value [deg]
           - in: query
             name: minPeakMagnitude
             nullable: true
@@ -604,6 +939,9 @@ class SourceHandler(BaseHandler):
                                 type: integer
                               numPerPage:
                                 type: integer
+                              nextCursor:
+                                type: string
+                                nullable: true
             400:
               content:
                 application/json:
@@ -631,6 +969,13 @@ class SourceHandler(BaseHandler):
         save_summary = self.get_query_argument('saveSummary', False)
         sort_by = self.get_query_argument("sortBy", None)
         sort_order = self.get_query_argument("sortOrder", "asc")
+        cursor = self.get_query_argument("cursor", None)
+        use_cursor = cursor is not None or bool(
+            strtobool(self.get_query_argument("useCursor", "False"))
+        )
+        include_total_matches = bool(
+            strtobool(self.get_query_argument("includeTotalMatches", "False"))
+        )
         include_comments = self.get_query_argument("includeComments", False)
         include_photometry_exists = self.get_query_argument(
             "includePhotometryExists", False
@@ -648,6 +993,8 @@ class SourceHandler(BaseHandler):
         classifications = self.get_query_argument("classifications", None)
         min_redshift = self.get_query_argument("minRedshift", None)
         max_redshift = self.get_query_argument("maxRedshift", None)
+        min_gal_lat = self.get_query_argument("minGalLat", None)
+        max_gal_lat = self.get_query_argument("maxGalLat", None)
         min_peak_magnitude = self.get_query_argument("minPeakMagnitude", None)
         max_peak_magnitude = self.get_query_argument("maxPeakMagnitude", None)
         min_latest_magnitude = self.get_query_argument("minLatestMagnitude", None)
@@ -740,48 +1087,19 @@ class SourceHandler(BaseHandler):
                 s = Obj.get_if_accessible_by(obj_id, self.current_user)
             if s is None:
                 return self.error("Source not found", status=404)
-            source_info = s.to_dict()
-            source_info["followup_requests"] = (
-                FollowupRequest.query_records_accessible_by(
-                    self.current_user,
-                    options=[
-                        joinedload(FollowupRequest.allocation).joinedload(
-                            Allocation.instrument
-                        ),
-                        joinedload(FollowupRequest.allocation).joinedload(
-                            Allocation.group
-                        ),
-                        joinedload(FollowupRequest.requester),
-                    ],
-                )
-                .filter(FollowupRequest.obj_id == obj_id)
-                .filter(FollowupRequest.status != "deleted")
-                .all()
+            source_info = serialize_source_detail(
+                s,
+                self.current_user,
+                include_comments=include_comments,
+                include_photometry=include_photometry,
+                include_photometry_exists=include_photometry_exists,
+                include_spectrum_exists=include_spectrum_exists,
+                include_period_exists=include_period_exists,
+                include_detection_stats=include_detection_stats,
+                include_color_mag=include_color_mag,
+                include_requested=include_requested,
+                requested_only=requested_only,
             )
-            source_info["assignments"] = (
-                ClassicalAssignment.query_records_accessible_by(
-                    self.current_user,
-                    options=[
-                        joinedload(ClassicalAssignment.run)
-                        .joinedload(ObservingRun.instrument)
-                        .joinedload(Instrument.telescope)
-                    ],
-                )
-                .filter(ClassicalAssignment.obj_id == obj_id)
-                .all()
-            )
-            point = ca.Point(ra=s.ra, dec=s.dec)
-            # Check for duplicates (within 4 arcsecs)
-            duplicates = (
-                Obj.query_records_accessible_by(self.current_user)
-                .filter(Obj.within(point, 4 / 3600))
-                .filter(Obj.id != s.id)
-                .all()
-            )
-            if len(duplicates) > 0:
-                source_info["duplicates"] = [dup.id for dup in duplicates]
-            else:
-                source_info["duplicates"] = None
 
             if is_token_request:
                 # Logic determining whether to register front-end request as view lives in front-end
@@ -791,9 +1109,6 @@ class SourceHandler(BaseHandler):
                     is_token=True,
                 )
                 DBSession.add(sv)
-                # To keep loaded relationships from being cleared in verify_and_commit:
-                source_info = recursive_to_dict(source_info)
-                self.verify_and_commit()
 
             if include_thumbnails:
                 existing_thumbnail_types = [thumb.type for thumb in s.thumbnails]
@@ -814,148 +1129,6 @@ class SourceHandler(BaseHandler):
                             obj_id, self.associated_user_object.id
                         ),
                     )
-            if include_comments:
-                comments = (
-                    Comment.query_records_accessible_by(
-                        self.current_user,
-                        options=[
-                            joinedload(Comment.author),
-                            joinedload(Comment.groups),
-                        ],
-                    )
-                    .filter(Comment.obj_id == obj_id)
-                    .all()
-                )
-                source_info["comments"] = sorted(
-                    [
-                        {
-                            **{
-                                k: v
-                                for k, v in c.to_dict().items()
-                                if k != "attachment_bytes"
-                            },
-                            "author": {
-                                **c.author.to_dict(),
-                                "gravatar_url": c.author.gravatar_url,
-                            },
-                        }
-                        for c in comments
-                    ],
-                    key=lambda x: x["created_at"],
-                    reverse=True,
-                )
-            if include_period_exists:
-                annotations = (
-                    Annotation.query_records_accessible_by(self.current_user)
-                    .filter(Annotation.obj_id == obj_id)
-                    .all()
-                )
-                period_str_options = ['period', 'Period', 'PERIOD']
-                source_info["period_exists"] = any(
-                    [
-                        isinstance(an.data, dict) and period_str in an.data
-                        for an in annotations
-                        for period_str in period_str_options
-                    ]
-                )
-
-            source_info["annotations"] = sorted(
-                Annotation.query_records_accessible_by(
-                    self.current_user, options=[joinedload(Annotation.author)]
-                )
-                .filter(Annotation.obj_id == obj_id)
-                .all(),
-                key=lambda x: x.origin,
-            )
-            readable_classifications = (
-                Classification.query_records_accessible_by(self.current_user)
-                .filter(Classification.obj_id == obj_id)
-                .all()
-            )
-
-            readable_classifications_json = []
-            for classification in readable_classifications:
-                classification_dict = classification.to_dict()
-                classification_dict['groups'] = [
-                    g.to_dict() for g in classification.groups
-                ]
-                readable_classifications_json.append(classification_dict)
-
-            source_info["classifications"] = readable_classifications_json
-            if include_detection_stats:
-                source_info["last_detected_at"] = s.last_detected_at(self.current_user)
-                source_info["last_detected_mag"] = s.last_detected_mag(
-                    self.current_user
-                )
-                source_info["peak_detected_at"] = s.peak_detected_at(self.current_user)
-                source_info["peak_detected_mag"] = s.peak_detected_mag(
-                    self.current_user
-                )
-            source_info["gal_lat"] = s.gal_lat_deg
-            source_info["gal_lon"] = s.gal_lon_deg
-            source_info["luminosity_distance"] = s.luminosity_distance
-            source_info["dm"] = s.dm
-            source_info["angular_diameter_distance"] = s.angular_diameter_distance
-
-            if include_photometry:
-                photometry = (
-                    Photometry.query_records_accessible_by(self.current_user)
-                    .filter(Photometry.obj_id == obj_id)
-                    .all()
-                )
-                source_info["photometry"] = [
-                    serialize(phot, 'ab', 'flux') for phot in photometry
-                ]
-            if include_photometry_exists:
-                source_info["photometry_exists"] = (
-                    len(
-                        Photometry.query_records_accessible_by(self.current_user)
-                        .filter(Photometry.obj_id == obj_id)
-                        .all()
-                    )
-                    > 0
-                )
-            if include_spectrum_exists:
-                source_info["spectrum_exists"] = (
-                    len(
-                        Spectrum.query_records_accessible_by(self.current_user)
-                        .filter(Spectrum.obj_id == obj_id)
-                        .all()
-                    )
-                    > 0
-                )
-            source_query = Source.query_records_accessible_by(self.current_user).filter(
-                Source.obj_id == source_info["id"]
-            )
-            source_query = apply_active_or_requested_filtering(
-                source_query, include_requested, requested_only
-            )
-            source_subquery = source_query.subquery()
-            groups = (
-                Group.query_records_accessible_by(self.current_user)
-                .join(source_subquery, Group.id == source_subquery.c.group_id)
-                .all()
-            )
-            source_info["groups"] = [g.to_dict() for g in groups]
-            for group in source_info["groups"]:
-                source_table_row = (
-                    Source.query_records_accessible_by(self.current_user)
-                    .filter(Source.obj_id == s.id, Source.group_id == group["id"])
-                    .first()
-                )
-                if source_table_row is not None:
-                    group["active"] = source_table_row.active
-                    group["requested"] = source_table_row.requested
-                    group["saved_at"] = source_table_row.saved_at
-                    group["saved_by"] = (
-                        source_table_row.saved_by.to_dict()
-                        if source_table_row.saved_by is not None
-                        else None
-                    )
-            if include_color_mag:
-                source_info["color_magnitude"] = get_color_mag(
-                    source_info["annotations"]
-                )
 
             source_info = recursive_to_dict(source_info)
             self.verify_and_commit()
@@ -1095,6 +1268,25 @@ class SourceHandler(BaseHandler):
                     "Invalid values for maxRedshift - could not convert to float"
                 )
             obj_query = obj_query.filter(Obj.redshift <= max_redshift)
+        # Ranges on gal_lat rather than abs(gal_lat), so that its index is used
+        if min_gal_lat is not None:
+            try:
+                min_gal_lat = float(min_gal_lat)
+            except ValueError:
+                return self.error(
+                    "Invalid values for minGalLat - could not convert to float"
+                )
+            obj_query = obj_query.filter(
+                or_(Obj.gal_lat >= min_gal_lat, Obj.gal_lat <= -min_gal_lat)
+            )
+        if max_gal_lat is not None:
+            try:
+                max_gal_lat = float(max_gal_lat)
+            except ValueError:
+                return self.error(
+                    "Invalid values for maxGalLat - could not convert to float"
+                )
+            obj_query = obj_query.filter(Obj.gal_lat.between(-max_gal_lat, max_gal_lat))
         if min_peak_magnitude is not None:
             try:
                 min_peak_magnitude = float(min_peak_magnitude)
@@ -1229,26 +1421,7 @@ class SourceHandler(BaseHandler):
                         f"Localization {localization_dateobs} not found", status=404
                     )
 
-            cum_prob = (
-                sa.func.sum(
-                    LocalizationTile.probdensity * LocalizationTile.healpix.area
-                )
-                .over(order_by=LocalizationTile.probdensity.desc())
-                .label('cum_prob')
-            )
-            localizationtile_subquery = (
-                sa.select(LocalizationTile.probdensity, cum_prob).filter(
-                    LocalizationTile.localization_id == localization.id
-                )
-            ).subquery()
-
-            min_probdensity = (
-                sa.select(
-                    sa.func.min(localizationtile_subquery.columns.probdensity)
-                ).filter(
-                    localizationtile_subquery.columns.cum_prob <= localization_cumprob
-                )
-            ).scalar_subquery()
+            min_probdensity = localization.min_probdensity(localization_cumprob)
 
             tiles_subquery = (
                 sa.select(Obj.id)
@@ -1337,193 +1510,106 @@ class SourceHandler(BaseHandler):
                 total_matches,
             )
         else:
-            try:
-                query_results = grab_query_results(
-                    query,
-                    total_matches,
-                    page_number,
-                    num_per_page,
-                    "sources",
-                    order_by=order_by,
-                    # We'll join thumbnails in manually, as they lead to duplicate
-                    # results downstream with the detection stats being added in
-                    include_thumbnails=False,
-                    # include detection stats here as it is a query column,
-                    include_detection_stats=include_detection_stats,
-                    current_user=self.current_user,
-                )
-            except ValueError as e:
-                if "Page number out of range" in str(e):
-                    return self.error("Page number out of range.")
-                raise
+            if use_cursor:
+                cursor_sort_columns = {
+                    None: Obj.id,
+                    "id": Obj.id,
+                    "origin": Obj.origin,
+                    "ra": Obj.ra,
+                    "dec": Obj.dec,
+                    "redshift": Obj.redshift,
+                    "saved_at": source_subquery.c.saved_at,
+                }
+                if sort_by not in cursor_sort_columns:
+                    return self.error(
+                        f"Cursor pagination is not available when sorting by {sort_by}."
+                    )
+                try:
+                    query_results = grab_query_results_by_cursor(
+                        query,
+                        cursor_sort_columns[sort_by],
+                        sort_by or "id",
+                        sort_order,
+                        cursor,
+                        num_per_page,
+                        "sources",
+                        include_thumbnails=False,
+                        include_detection_stats=include_detection_stats,
+                        current_user=self.current_user,
+                        include_total_matches=include_total_matches,
+                    )
+                except ValueError as e:
+                    return self.error(str(e))
+            else:
+                try:
+                    query_results = grab_query_results(
+                        query,
+                        total_matches,
+                        page_number,
+                        num_per_page,
+                        "sources",
+                        order_by=order_by,
+                        # We'll join thumbnails in manually, as they lead to duplicate
+                        # results downstream with the detection stats being added in
+                        include_thumbnails=False,
+                        # include detection stats here as it is a query column,
+                        include_detection_stats=include_detection_stats,
+                        current_user=self.current_user,
+                    )
+                except ValueError as e:
+                    if "Page number out of range" in str(e):
+                        return self.error("Page number out of range.")
+                    raise
 
             # Records are Objs, not Sources
-            obj_list = []
-
+            objs = []
+            detection_stats = []
             for result in query_results["sources"]:
                 if include_detection_stats:
-                    (
-                        obj,
-                        last_detected_at,
-                        last_detected_mag,
-                        peak_detected_at,
-                        peak_detected_mag,
-                    ) = result
+                    obj, *stats = result
+                    detection_stats.append(stats)
                 else:
                     (obj,) = result
-                obj_list.append(obj.to_dict())
-
-                if include_comments:
-                    obj_list[-1]["comments"] = sorted(
-                        [
-                            {
-                                k: v
-                                for k, v in c.to_dict().items()
-                                if k != "attachment_bytes"
-                            }
-                            for c in Comment.query_records_accessible_by(
-                                self.current_user
-                            )
-                            .filter(Comment.obj_id == obj.id)
-                            .all()
-                        ],
-                        key=lambda x: x["created_at"],
-                        reverse=True,
-                    )
-
-                if include_thumbnails and not remove_nested:
-                    obj_list[-1]["thumbnails"] = (
-                        Thumbnail.query_records_accessible_by(self.current_user)
-                        .filter(Thumbnail.obj_id == obj.id)
-                        .all()
-                    )
-
-                if not remove_nested:
-                    readable_classifications = (
-                        Classification.query_records_accessible_by(self.current_user)
-                        .filter(Classification.obj_id == obj.id)
-                        .all()
-                    )
+                objs.append(obj)
+
+            obj_list = serialize_sources_page(
+                objs,
+                self.current_user,
+                include_comments=include_comments,
+                include_thumbnails=include_thumbnails and not remove_nested,
+                include_photometry=include_photometry,
+                include_photometry_exists=include_photometry_exists,
+                include_spectrum_exists=include_spectrum_exists,
+                include_period_exists=include_period_exists,
+                include_color_mag=include_color_mag,
+                remove_nested=remove_nested,
+                include_requested=include_requested,
+                requested_only=requested_only,
+            )
 
-                    readable_classifications_json = []
-                    for classification in readable_classifications:
-                        classification_dict = classification.to_dict()
-                        classification_dict['groups'] = [
-                            g.to_dict() for g in classification.groups
-                        ]
-                        readable_classifications_json.append(classification_dict)
-
-                    obj_list[-1]["classifications"] = readable_classifications_json
-
-                    obj_list[-1]["annotations"] = sorted(
-                        Annotation.query_records_accessible_by(
-                            self.current_user
-                        ).filter(Annotation.obj_id == obj.id),
-                        key=lambda x: x.origin,
-                    )
-                if include_detection_stats:
-                    obj_list[-1]["last_detected_at"] = (
-                        (last_detected_at - last_detected_at.utcoffset()).replace(
-                            tzinfo=UTC
-                        )
-                        if last_detected_at
-                        else None
-                    )
-                    obj_list[-1]["last_detected_mag"] = last_detected_mag
-                    obj_list[-1]["peak_detected_at"] = (
-                        (peak_detected_at - peak_detected_at.utcoffset()).replace(
-                            tzinfo=UTC
-                        )
-                        if peak_detected_at
-                        else None
+            for source, stats in zip(obj_list, detection_stats):
+                (
+                    last_detected_at,
+                    last_detected_mag,
+                    peak_detected_at,
+                    peak_detected_mag,
+                ) = stats
+                source["last_detected_at"] = (
+                    (last_detected_at - last_detected_at.utcoffset()).replace(
+                        tzinfo=UTC
                     )
-                    obj_list[-1]["peak_detected_mag"] = peak_detected_mag
-
-                obj_list[-1]["gal_lon"] = obj.gal_lon_deg
-                obj_list[-1]["gal_lat"] = obj.gal_lat_deg
-                obj_list[-1]["luminosity_distance"] = obj.luminosity_distance
-                obj_list[-1]["dm"] = obj.dm
-                obj_list[-1][
-                    "angular_diameter_distance"
-                ] = obj.angular_diameter_distance
-
-                if include_photometry:
-                    photometry = Photometry.query_records_accessible_by(
-                        self.current_user
-                    ).filter(Photometry.obj_id == obj.id)
-                    obj_list[-1]["photometry"] = [
-                        serialize(phot, 'ab', 'flux') for phot in photometry
-                    ]
-                if include_photometry_exists:
-                    obj_list[-1]["photometry_exists"] = (
-                        len(
-                            Photometry.query_records_accessible_by(self.current_user)
-                            .filter(Photometry.obj_id == obj.id)
-                            .all()
-                        )
-                        > 0
-                    )
-                if include_spectrum_exists:
-                    obj_list[-1]["spectrum_exists"] = (
-                        len(
-                            Spectrum.query_records_accessible_by(self.current_user)
-                            .filter(Spectrum.obj_id == obj.id)
-                            .all()
-                        )
-                        > 0
-                    )
-                if include_period_exists:
-                    annotations = (
-                        Annotation.query_records_accessible_by(self.current_user)
-                        .filter(Annotation.obj_id == obj.id)
-                        .all()
-                    )
-                    period_str_options = ['period', 'Period', 'PERIOD']
-                    obj_list[-1]["period_exists"] = any(
-                        [
-                            isinstance(an.data, dict) and 'period' in an.data
-                            for an in annotations
-                            for period_str in period_str_options
-                        ]
-                    )
-                if not remove_nested:
-                    source_query = Source.query_records_accessible_by(
-                        self.current_user
-                    ).filter(Source.obj_id == obj_list[-1]["id"])
-                    source_query = apply_active_or_requested_filtering(
-                        source_query, include_requested, requested_only
-                    )
-                    source_subquery = source_query.subquery()
-                    groups = (
-                        Group.query_records_accessible_by(self.current_user)
-                        .join(source_subquery, Group.id == source_subquery.c.group_id)
-                        .all()
-                    )
-                    obj_list[-1]["groups"] = [g.to_dict() for g in groups]
-
-                    for group in obj_list[-1]["groups"]:
-                        source_table_row = (
-                            Source.query_records_accessible_by(self.current_user)
-                            .filter(
-                                Source.obj_id == obj_list[-1]["id"],
-                                Source.group_id == group["id"],
-                            )
-                            .first()
-                        )
-                        if source_table_row is not None:
-                            group["active"] = source_table_row.active
-                            group["requested"] = source_table_row.requested
-                            group["saved_at"] = source_table_row.saved_at
-                            group["saved_by"] = (
-                                source_table_row.saved_by.to_dict()
-                                if source_table_row.saved_by is not None
-                                else None
-                            )
-
-                if include_color_mag:
-                    obj_list[-1]["color_magnitude"] = get_color_mag(
-                        obj_list[-1]["annotations"]
+                    if last_detected_at
+                    else None
+                )
+                source["last_detected_mag"] = last_detected_mag
+                source["peak_detected_at"] = (
+                    (peak_detected_at - peak_detected_at.utcoffset()).replace(
+                        tzinfo=UTC
                     )
+                    if peak_detected_at
+                    else None
+                )
+                source["peak_detected_mag"] = peak_detected_mag
             query_results["sources"] = obj_list
 
         query_results = recursive_to_dict(query_results)
@@ -1645,10 +1731,6 @@ class SourceHandler(BaseHandler):
                 'Invalid/missing parameters: ' f'{e.normalized_messages()}'
             )
 
-        if (ra is not None) and (dec is not None):
-            # This adds a healpix index for a new object being created
-            obj.healpix = ha.constants.HPX.lonlat_to_healpix(ra * u.deg, dec * u.deg)
-
         groups = (
             Group.query_records_accessible_by(self.current_user)
             .filter(Group.id.in_(group_ids))
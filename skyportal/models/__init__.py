@@ -4,10 +4,12 @@ from baselayer.app.models import *
 # SkyPortal models
 from .allocation import *
 from .annotation import *
+from .annotation_value import *
 from .assignment import *
 from .candidate import *
 from .classification import *
 from .comment import *
+from .detection_summary import *
 from .facility_transaction import *
 from .filter import *
 from .followup_request import *
@@ -20,6 +22,7 @@ from .invitation import *
 from .listing import *
 from .localization import *
 from .obj import *
+from .obj_duplicate import *
 from .observation import *
 from .observation_plan import *
 from .observing_run import *
@@ -0,0 +1,201 @@
+__all__ = ['AnnotationValue', 'refresh_annotation_values']
+
+import datetime
+import itertools
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from baselayer.app.models import Base, DBSession, public
+
+from .annotation import Annotation
+
+
+class AnnotationValue(Base):
+    """A field of the `data` of an Annotation, with its value stored in a
+    column of the matching type, so that annotations can be filtered and
+    sorted by value with indexes rather than by casting their JSON data.
+
+    Rows are kept up to date by `refresh_annotation_values` whenever an
+    annotation is created or updated, and are deleted with their annotation.
+    """
+
+    __tablename__ = 'annotation_values'
+
+    # Access is controlled by filtering on the accessible annotations
+    read = public
+
+    annotation_id = sa.Column(
+        sa.ForeignKey('annotations.id', ondelete='CASCADE'),
+        nullable=False,
+        doc="ID of the Annotation.",
+    )
+    obj_id = sa.Column(
+        sa.ForeignKey('objs.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+        doc="ID of the Annotation's Obj.",
+    )
+    origin = sa.Column(sa.String, nullable=False, doc="Origin of the Annotation.")
+    key = sa.Column(sa.String, nullable=False, doc="Key of the field.")
+    type = sa.Column(
+        sa.String,
+        nullable=False,
+        doc="JSON type of the value (as given by `jsonb_typeof`).",
+    )
+    numeric_value = sa.Column(
+        sa.Float, nullable=True, doc="Value of the field, if a number."
+    )
+    text_value = sa.Column(
+        sa.String,
+        nullable=True,
+        doc="Value of the field as text (as given by the `->>` operator).",
+    )
+    bool_value = sa.Column(
+        sa.Boolean, nullable=True, doc="Value of the field, if a boolean."
+    )
+
+
+AnnotationValue.__table_args__ = (
+    sa.UniqueConstraint(
+        AnnotationValue.annotation_id,
+        AnnotationValue.key,
+        name='annotation_values_annotation_id_key_key',
+    ),
+    sa.Index(
+        'annotation_values_origin_key_numeric_value_index',
+        AnnotationValue.origin,
+        AnnotationValue.key,
+        AnnotationValue.numeric_value,
+    ),
+    sa.Index(
+        'annotation_values_origin_key_bool_value_index',
+        AnnotationValue.origin,
+        AnnotationValue.key,
+        AnnotationValue.bool_value,
+    ),
+    # Long text values (e.g. nested objects) would not fit in a B-tree index,
+    # so text equality is looked up through their hash
+    sa.Index(
+        'annotation_values_origin_key_text_value_md5_index',
+        AnnotationValue.origin,
+        AnnotationValue.key,
+        sa.func.md5(AnnotationValue.text_value),
+    ),
+)
+
+
+def annotation_value_statement(annotation_ids=None):
+    """Query computing the `AnnotationValue`s of a set of annotations.
+
+    Parameters
+    ----------
+    annotation_ids : list of int, optional
+        IDs of the annotations. By default, all annotations.
+
+    Returns
+    -------
+    statement : `sqlalchemy.sql.Select`
+        Query returning one row per field of the annotations, with the
+        columns listed in `VALUE_COLUMNS`.
+    """
+    fields = sa.func.jsonb_each(Annotation.data).table_valued(
+        sa.column('key', sa.String), 'value'
+    )
+    value = Annotation.data[fields.c.key]
+    value_type = sa.func.jsonb_typeof(value)
+
+    utcnow = datetime.datetime.utcnow()
+    statement = (
+        sa.select(
+            Annotation.id,
+            Annotation.obj_id,
+            Annotation.origin,
+            fields.c.key,
+            value_type,
+            sa.case((value_type == 'number', value.cast(sa.Float))),
+            value.astext,
+            sa.case((value_type == 'boolean', value.astext.cast(sa.Boolean))),
+            sa.literal(utcnow),
+            sa.literal(utcnow),
+        )
+        .select_from(Annotation)
+        .join(fields, sa.true())
+    )
+    if annotation_ids is not None:
+        statement = statement.where(Annotation.id.in_(annotation_ids))
+    return statement
+
+
+VALUE_COLUMNS = [
+    'annotation_id',
+    'obj_id',
+    'origin',
+    'key',
+    'type',
+    'numeric_value',
+    'text_value',
+    'bool_value',
+    'created_at',
+    'modified',
+]
+
+
+def refresh_annotation_values(annotation_ids, session=None):
+    """Recompute the `AnnotationValue`s of a set of annotations, with one
+    DELETE and one INSERT ... SELECT.
+
+    Parameters
+    ----------
+    annotation_ids : iterable of int
+        IDs of the annotations that were created or updated.
+    session : `sqlalchemy.orm.Session`, optional
+        Session whose transaction to run in. Defaults to `DBSession()`.
+    """
+    annotation_ids = list(
+        {annotation_id for annotation_id in annotation_ids if annotation_id}
+    )
+    if len(annotation_ids) == 0:
+        return
+    if session is None:
+        session = DBSession()
+
+    table = AnnotationValue.__table__
+    connection = session.connection()
+    connection.execute(
+        sa.delete(table).where(table.c.annotation_id.in_(annotation_ids))
+    )
+
+    insert = pg_insert(table).from_select(
+        VALUE_COLUMNS, annotation_value_statement(annotation_ids)
+    )
+    # A concurrent refresh of the same annotation may have inserted its rows
+    # after our DELETE; the latest computation wins.
+    connection.execute(
+        insert.on_conflict_do_update(
+            index_elements=['annotation_id', 'key'],
+            set_={
+                column: insert.excluded[column]
+                for column in VALUE_COLUMNS
+                if column not in ('annotation_id', 'key', 'created_at')
+            },
+        )
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def refresh_annotation_values_after_flush(session, flush_context):
+    """Keep annotation values in sync with annotations created or updated
+    through the ORM."""
+    annotation_ids = {
+        instance.id
+        for instance in itertools.chain(session.new, session.dirty)
+        if isinstance(instance, Annotation)
+        and any(
+            getattr(sa.inspect(instance).attrs, attr).history.has_changes()
+            for attr in ('data', 'origin', 'obj_id')
+        )
+    }
+    refresh_annotation_values(annotation_ids, session=session)
@@ -1,8 +1,9 @@
-__all__ = ['cosmo']
+__all__ = ['cosmo', 'distance_grid']
 
 from baselayer.app.env import load_env
 
-from ..utils.cosmology import establish_cosmology
+from ..utils.cosmology import establish_cosmology, DistanceGrid
 
 _, cfg = load_env()
 cosmo = establish_cosmology(cfg)
+distance_grid = DistanceGrid(cosmo)
@@ -0,0 +1,238 @@
+__all__ = ['ObjDetectionSummary', 'refresh_detection_summaries']
+
+import datetime
+import itertools
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import array_agg, aggregate_order_by
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from baselayer.app.env import load_env
+from baselayer.app.models import Base, DBSession, public
+
+from .photometry import Photometry
+
+_, cfg = load_env()
+
+# The minimum signal-to-noise ratio to consider a photometry point as a detection
+PHOT_DETECTION_THRESHOLD = cfg["misc.photometry_detection_threshold_nsigma"]
+
+# First key of the transaction-level advisory locks taken on the objects whose
+# summaries are refreshed (the second one is the hash of the object ID)
+DETECTION_SUMMARY_LOCK_KEY = 1
+
+
+class ObjDetectionSummary(Base):
+    """Detection statistics of an Obj, computed over the photometry shared
+    with a Group. A detection is a photometry point with a S/N above
+    `misc.photometry_detection_threshold_nsigma`.
+
+    Rows are kept up to date by `refresh_detection_summaries` whenever
+    photometry is inserted, updated, deleted, or shared with or removed from
+    groups, and back the detection statistics of `Obj` (e.g.,
+    `Obj.last_detected_at`). They must be recomputed (with
+    `refresh_detection_summaries`) if the detection threshold is changed.
+    """
+
+    __tablename__ = 'obj_detection_summaries'
+
+    # Access is controlled through `group_id` by the Obj hybrids
+    read = public
+
+    obj_id = sa.Column(
+        sa.ForeignKey('objs.id', ondelete='CASCADE'),
+        nullable=False,
+        doc="ID of the Obj.",
+    )
+    group_id = sa.Column(
+        sa.ForeignKey('groups.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+        doc="ID of the Group the photometry is shared with.",
+    )
+    last_detected_mjd = sa.Column(
+        sa.Float, nullable=False, doc="MJD of the latest detection."
+    )
+    last_detected_mag = sa.Column(
+        sa.Float, nullable=True, doc="AB magnitude of the latest detection."
+    )
+    peak_detected_mjd = sa.Column(
+        sa.Float, nullable=False, doc="MJD of the detection at peak magnitude."
+    )
+    peak_detected_mag = sa.Column(
+        sa.Float, nullable=True, doc="Peak AB magnitude of the detections."
+    )
+
+
+ObjDetectionSummary.__table_args__ = (
+    sa.UniqueConstraint(
+        ObjDetectionSummary.obj_id,
+        ObjDetectionSummary.group_id,
+        name='obj_detection_summaries_obj_id_group_id_key',
+    ),
+)
+
+
+def detection_summary_statement(obj_ids=None):
+    """Query computing the detection summaries of a set of objects.
+
+    Parameters
+    ----------
+    obj_ids : list of str or `sqlalchemy.sql.Select`, optional
+        IDs of the objects to summarize, or a query selecting them. By
+        default, summarize all objects.
+
+    Returns
+    -------
+    statement : `sqlalchemy.sql.Select`
+        Query returning one row per (obj_id, group_id) with at least one
+        detection, with the columns of `ObjDetectionSummary`.
+    """
+    group_photometry = Base.metadata.tables['group_photometry']
+    detections = (
+        sa.select(
+            Photometry.obj_id,
+            group_photometry.c.group_id,
+            Photometry.mjd,
+            Photometry.mag.label('mag'),
+        )
+        .join(group_photometry, group_photometry.c.photometr_id == Photometry.id)
+        .where(Photometry.snr.isnot(None))
+        .where(Photometry.snr > PHOT_DETECTION_THRESHOLD)
+    )
+    if obj_ids is not None:
+        detections = detections.where(Photometry.obj_id.in_(obj_ids))
+    detections = detections.subquery()
+
+    utcnow = datetime.datetime.utcnow()
+    return sa.select(
+        detections.c.obj_id,
+        detections.c.group_id,
+        sa.func.max(detections.c.mjd).label('last_detected_mjd'),
+        array_agg(aggregate_order_by(detections.c.mag, detections.c.mjd.desc()))[
+            1
+        ].label('last_detected_mag'),
+        array_agg(aggregate_order_by(detections.c.mjd, detections.c.mag.desc()))[
+            1
+        ].label('peak_detected_mjd'),
+        sa.func.max(detections.c.mag).label('peak_detected_mag'),
+        sa.literal(utcnow).label('created_at'),
+        sa.literal(utcnow).label('modified'),
+    ).group_by(detections.c.obj_id, detections.c.group_id)
+
+
+SUMMARY_COLUMNS = [
+    'obj_id',
+    'group_id',
+    'last_detected_mjd',
+    'last_detected_mag',
+    'peak_detected_mjd',
+    'peak_detected_mag',
+    'created_at',
+    'modified',
+]
+
+
+def lock_detection_summaries(obj_ids, connection):
+    """Take the transaction-level advisory locks of a set of objects, in
+    order of ID so that concurrent refreshes cannot deadlock.
+
+    Parameters
+    ----------
+    obj_ids : list of str or `sqlalchemy.sql.Select`
+        IDs of the objects to lock, or a query selecting them.
+    connection : `sqlalchemy.engine.Connection`
+        Connection of the transaction holding the locks until it ends.
+    """
+    if isinstance(obj_ids, sa.sql.Select):
+        selected = obj_ids.subquery()
+        obj_id = selected.c[0]
+    else:
+        selected = sa.values(sa.column('obj_id', sa.String), name='obj_ids').data(
+            [(obj_id,) for obj_id in obj_ids]
+        )
+        obj_id = selected.c.obj_id
+    ordered = sa.select(obj_id.label('obj_id')).distinct().order_by(obj_id).subquery()
+    connection.execute(
+        sa.select(
+            sa.func.pg_advisory_xact_lock(
+                DETECTION_SUMMARY_LOCK_KEY, sa.func.hashtext(ordered.c.obj_id)
+            )
+        )
+    ).all()
+
+
+def refresh_detection_summaries(obj_ids, session=None):
+    """Recompute the detection summaries of a set of objects, with one
+    DELETE and one INSERT ... SELECT.
+
+    The objects are locked first, until the end of the transaction: a
+    concurrent refresh of the same objects waits for it to commit, and then
+    recomputes the summaries from the photometry committed by both.
+
+    Parameters
+    ----------
+    obj_ids : iterable of str or `sqlalchemy.sql.Select`
+        IDs of the objects whose photometry (or its groups) changed, or a
+        query selecting them.
+    session : `sqlalchemy.orm.Session`, optional
+        Session whose transaction to run in. Defaults to `DBSession()`.
+    """
+    if not isinstance(obj_ids, sa.sql.Select):
+        obj_ids = list({obj_id for obj_id in obj_ids if obj_id is not None})
+        if len(obj_ids) == 0:
+            return
+    if session is None:
+        session = DBSession()
+
+    table = ObjDetectionSummary.__table__
+    connection = session.connection()
+    lock_detection_summaries(obj_ids, connection)
+    # Each statement below reads the data committed before it started
+    # (READ COMMITTED), including that of the refreshes we waited for
+    connection.execute(sa.delete(table).where(table.c.obj_id.in_(obj_ids)))
+
+    insert = pg_insert(table).from_select(
+        SUMMARY_COLUMNS, detection_summary_statement(obj_ids)
+    )
+    connection.execute(
+        insert.on_conflict_do_update(
+            index_elements=['obj_id', 'group_id'],
+            set_={
+                column: insert.excluded[column]
+                for column in SUMMARY_COLUMNS
+                if column not in ('obj_id', 'group_id', 'created_at')
+            },
+        )
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def refresh_detection_summaries_after_flush(session, flush_context):
+    """Keep detection summaries in sync with photometry changed through the
+    ORM. Bulk (Core) inserts and deletes call `refresh_detection_summaries`
+    directly."""
+    group_photometry = Base.metadata.tables['group_photometry']
+
+    obj_ids = set()
+    photometry_ids = set()
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Photometry):
+            # includes the previous object of photometry moved to another one
+            history = sa.inspect(instance).attrs.obj_id.history
+            obj_ids.update(history.added, history.unchanged, history.deleted)
+        elif getattr(instance, '__table__', None) is group_photometry:
+            photometry_ids.add(instance.photometr_id)
+
+    if len(photometry_ids) > 0:
+        obj_ids.update(
+            session.connection()
+            .execute(
+                sa.select(Photometry.obj_id).where(Photometry.id.in_(photometry_ids))
+            )
+            .scalars()
+        )
+
+    refresh_detection_summaries(obj_ids, session=session)
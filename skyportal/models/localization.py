@@ -136,6 +136,55 @@ class Localization(Base):
         else:
             return self.table_2d
 
+    @property
+    def cumprob(self):
+        """Cumulative probability of each tile (in the order of `uniq`), i.e.
+        the total probability of the tiles at least as probable. The tiles
+        with a cumulative probability below p form the p credible region."""
+        uniq = np.asarray(self.uniq, dtype=np.int64)
+        probdensity = np.asarray(self.probdensity, dtype=float)
+        level = np.floor(np.log2(uniq // 4) / 2).astype(int)
+        prob = probdensity * np.pi / (3 * 4.0**level)
+
+        order = np.argsort(-probdensity, kind='stable')
+        cumprob = np.cumsum(prob[order])
+        # Tiles with equal densities share the cumulative probability of the
+        # last of them, as in an SQL window ordered by probdensity
+        sorted_density = probdensity[order]
+        last_of_ties = np.append(np.nonzero(np.diff(sorted_density))[0], len(order) - 1)
+        ties = np.searchsorted(last_of_ties, np.arange(len(order)))
+
+        result = np.empty_like(cumprob)
+        result[order] = cumprob[last_of_ties[ties]]
+        return result
+
+    def min_probdensity(self, cumprob):
+        """Probability density of the least probable tile of the `cumprob`
+        credible region, found with the index on the precomputed
+        `LocalizationTile.cumprob`.
+
+        Parameters
+        ----------
+        cumprob : float
+            Cumulative probability of the credible region.
+
+        Returns
+        -------
+        min_probdensity : `sqlalchemy.sql.expression.ScalarSelect`
+            SQL scalar subquery, NULL if even the most probable tile is
+            beyond `cumprob`.
+        """
+        return (
+            sa.select(LocalizationTile.probdensity)
+            .where(
+                LocalizationTile.localization_id == self.id,
+                LocalizationTile.cumprob <= float(cumprob),
+            )
+            .order_by(LocalizationTile.cumprob.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+
     @property
     def flat_2d(self):
         """Get flat resolution HEALPix dataset, probability density only."""
@@ -173,3 +222,19 @@ class LocalizationTile(Base):
     )
 
     healpix = sa.Column(healpix_alchemy.Tile, primary_key=True, index=True)
+
+    cumprob = sa.Column(
+        sa.Float,
+        nullable=True,
+        doc="Total probability of the tiles of the localization with at least "
+        "this probability density (see Localization.cumprob)",
+    )
+
+
+LocalizationTile.__table_args__ = (
+    sa.Index(
+        'localizationtiles_localization_id_cumprob_index',
+        LocalizationTile.localization_id,
+        LocalizationTile.cumprob,
+    ),
+)
@@ -1,5 +1,6 @@
-__all__ = ['Obj']
+__all__ = ['Obj', 'obj_distances', 'derived_coordinates']
 
+import itertools
 import uuid
 import requests
 import re
@@ -7,7 +8,7 @@ import os
 
 import sqlalchemy as sa
 from sqlalchemy import event
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.hybrid import hybrid_method
 
@@ -29,17 +30,15 @@ from baselayer.app.models import (
 from baselayer.log import make_log
 
 from .photometry import Photometry
+from .detection_summary import ObjDetectionSummary
 from .spectrum import Spectrum
 from .candidate import Candidate
 from .thumbnail import Thumbnail
-from .cosmo import cosmo
+from .cosmo import distance_grid
 
 _, cfg = load_env()
 log = make_log('models.obj')
 
-# The minimum signal-to-noise ratio to consider a photometry point as a detection
-PHOT_DETECTION_THRESHOLD = cfg["misc.photometry_detection_threshold_nsigma"]
-
 
 def delete_obj_if_all_data_owned(cls, user_or_token):
     from .source import Source
@@ -141,6 +140,179 @@ def delete_obj_if_all_data_owned(cls, user_or_token):
     )
 
 
+def _mjd_to_timestamp(mjd):
+    # same conversion as Photometry.iso
+    return sa.func.to_timestamp((mjd - 40_587) * 86400.0)
+
+
+def _accessible_detection_summaries(obj_id, user):
+    """Filter conditions selecting the detection summaries of an object over
+    the groups a user has access to."""
+    return (
+        ObjDetectionSummary.obj_id == obj_id,
+        ObjDetectionSummary.group_id.in_([g.id for g in user.accessible_groups]),
+    )
+
+
+def _last_detected_at(obj_id, user):
+    return sa.select(
+        _mjd_to_timestamp(sa.func.max(ObjDetectionSummary.last_detected_mjd))
+    ).where(*_accessible_detection_summaries(obj_id, user))
+
+
+def _last_detected_mag(obj_id, user):
+    return (
+        sa.select(ObjDetectionSummary.last_detected_mag)
+        .where(*_accessible_detection_summaries(obj_id, user))
+        .order_by(ObjDetectionSummary.last_detected_mjd.desc())
+        .limit(1)
+    )
+
+
+def _peak_detected_at(obj_id, user):
+    return (
+        sa.select(_mjd_to_timestamp(ObjDetectionSummary.peak_detected_mjd))
+        .where(*_accessible_detection_summaries(obj_id, user))
+        .order_by(ObjDetectionSummary.peak_detected_mag.desc().nulls_last())
+        .limit(1)
+    )
+
+
+def _peak_detected_mag(obj_id, user):
+    return sa.select(sa.func.max(ObjDetectionSummary.peak_detected_mag)).where(
+        *_accessible_detection_summaries(obj_id, user)
+    )
+
+
+def galactic_coordinates(ra, dec):
+    """Galactic coordinates of equatorial positions, transformed in a single
+    vectorized call.
+
+    Parameters
+    ----------
+    ra, dec : float or array_like
+        J2000 Right Ascension and Declination [deg].
+
+    Returns
+    -------
+    gal_lon, gal_lat : numpy.ndarray
+        Galactic longitude and latitude [deg].
+    """
+    coord = ap_coord.SkyCoord(ra, dec, unit="deg").galactic
+    return coord.l.deg, coord.b.deg
+
+
+def derived_coordinates(ra, dec):
+    """Galactic coordinates and HEALPix index of equatorial positions, as
+    stored in the `gal_lon`, `gal_lat` and `healpix` columns of `Obj`.
+
+    Parameters
+    ----------
+    ra, dec : array_like
+        J2000 Right Ascension and Declination [deg].
+
+    Returns
+    -------
+    gal_lon, gal_lat : numpy.ndarray
+        Galactic longitude and latitude [deg].
+    healpix : numpy.ndarray
+        HEALPix index of the positions.
+    """
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    gal_lon, gal_lat = galactic_coordinates(ra, dec)
+    healpix = healpix_alchemy.constants.HPX.lonlat_to_healpix(ra * u.deg, dec * u.deg)
+    return gal_lon, gal_lat, healpix
+
+
+def _altdata_distance(altdata):
+    """Luminosity distance [Mpc] given in the `altdata` of an object, if any
+    (see `Obj.luminosity_distance`)."""
+    if not altdata:
+        return None
+    if altdata.get("dm") is not None:
+        # see eq (24) of https://ned.ipac.caltech.edu/level5/Hogg/Hogg7.html
+        return (10 ** (float(altdata.get("dm")) / 5.0)) * 1e-5
+    if altdata.get("parallax") is not None:
+        if float(altdata.get("parallax")) > 0:
+            # assume parallax in arcsec
+            return 1e-6 / float(altdata.get("parallax"))
+    if altdata.get("dist_kpc") is not None:
+        return float(altdata.get("dist_kpc")) * 1e-3
+    if altdata.get("dist_Mpc") is not None:
+        return float(altdata.get("dist_Mpc"))
+    if altdata.get("dist_pc") is not None:
+        return float(altdata.get("dist_pc")) * 1e-6
+    if altdata.get("dist_cm") is not None:
+        return float(altdata.get("dist_cm")) / 3.085e18
+    return None
+
+
+def _in_hubble_flow(redshift):
+    # within ~5 Mpc (cz ~ 350 km/s) a given galaxy velocty
+    # can be between between ~0-500 km/s
+    # cf. https://www.aanda.org/articles/aa/full/2003/05/aa3077/aa3077.html
+    return bool(redshift) and redshift * 2.99e5 >= 350
+
+
+def obj_distances(objs):
+    """Luminosity distances, distance moduli and angular diameter distances
+    of a set of objects (see `Obj.luminosity_distance`). Distances from
+    redshifts are interpolated for all the objects at once with
+    `distance_grid`.
+
+    Parameters
+    ----------
+    objs : list of Obj
+
+    Returns
+    -------
+    distances : list of dict
+        `luminosity_distance` [Mpc], `dm` [mag] and
+        `angular_diameter_distance` [Mpc] of each object, in order. Each is
+        None if the object has no distance data and its redshift does not
+        put it within the Hubble flow.
+    """
+    luminosity_distances = [_altdata_distance(obj.altdata) for obj in objs]
+    from_redshift = [
+        i
+        for i, (obj, dl) in enumerate(zip(objs, luminosity_distances))
+        if dl is None and _in_hubble_flow(obj.redshift)
+    ]
+    if len(from_redshift) > 0:
+        redshift_distances = distance_grid.luminosity_distance(
+            [objs[i].redshift for i in from_redshift]
+        )
+        for i, dl in zip(from_redshift, redshift_distances):
+            luminosity_distances[i] = float(dl)
+
+    distances = []
+    for obj, dl in zip(objs, luminosity_distances):
+        if not dl:
+            distances.append(
+                {
+                    "luminosity_distance": dl,
+                    "dm": None,
+                    "angular_diameter_distance": None,
+                }
+            )
+            continue
+        if _in_hubble_flow(obj.redshift):
+            # see eq (20) of https://ned.ipac.caltech.edu/level5/Hogg/Hogg7.html
+            angular_diameter_distance = dl / (1 + obj.redshift) ** 2
+        else:
+            angular_diameter_distance = dl
+        distances.append(
+            {
+                "luminosity_distance": dl,
+                # 5 log10(dl / 10 pc), with dl in Mpc
+                "dm": 5.0 * np.log10(dl * 1e5),
+                "angular_diameter_distance": angular_diameter_distance,
+            }
+        )
+    return distances
+
+
 class Obj(Base, conesearch_alchemy.Point):
     """A record of an astronomical Object and its metadata, such as position,
     positional uncertainties, name, and redshift."""
@@ -218,6 +390,18 @@ class Obj(Base, conesearch_alchemy.Point):
 
     healpix = sa.Column(healpix_alchemy.Point, index=True)
 
+    gal_lon = sa.Column(
+        sa.Float,
+        nullable=True,
+        doc="Galactic longitude [deg], computed from the position when it is set.",
+    )
+    gal_lat = sa.Column(
+        sa.Float,
+        nullable=True,
+        index=True,
+        doc="Galactic latitude [deg], computed from the position when it is set.",
+    )
+
     internal_key = sa.Column(
         sa.String,
         nullable=False,
@@ -338,118 +522,64 @@ class Obj(Base, conesearch_alchemy.Point):
     @hybrid_method
     def last_detected_at(self, user):
         """UTC ISO date at which the object was last detected above a given S/N (3.0 by default)."""
-        detections = [
-            phot.iso
-            for phot in Photometry.query_records_accessible_by(user)
-            .filter(Photometry.obj_id == self.id)
-            .all()
-            if phot.snr is not None and phot.snr > PHOT_DETECTION_THRESHOLD
-        ]
-        return max(detections) if detections else None
+        return DBSession().execute(_last_detected_at(self.id, user)).scalar()
 
     @last_detected_at.expression
     def last_detected_at(cls, user):
         """UTC ISO date at which the object was last detected above a given S/N (3.0 by default)."""
         return (
-            Photometry.query_records_accessible_by(
-                user, columns=[sa.func.max(Photometry.iso)], mode="read"
-            )
-            .filter(Photometry.obj_id == cls.id)
-            .filter(Photometry.snr.isnot(None))
-            .filter(Photometry.snr > PHOT_DETECTION_THRESHOLD)
-            .label('last_detected_at')
+            _last_detected_at(cls.id, user).scalar_subquery().label('last_detected_at')
         )
 
     @hybrid_method
     def last_detected_mag(self, user):
         """Magnitude at which the object was last detected above a given S/N (3.0 by default)."""
-        return (
-            Photometry.query_records_accessible_by(
-                user, columns=[Photometry.mag], mode="read"
-            )
-            .filter(Photometry.obj_id == self.id)
-            .filter(Photometry.snr.isnot(None))
-            .filter(Photometry.snr > PHOT_DETECTION_THRESHOLD)
-            .order_by(Photometry.mjd.desc())
-            .limit(1)
-            .scalar()
-        )
+        return DBSession().execute(_last_detected_mag(self.id, user)).scalar()
 
     @last_detected_mag.expression
     def last_detected_mag(cls, user):
         """Magnitude at which the object was last detected above a given S/N (3.0 by default)."""
         return (
-            Photometry.query_records_accessible_by(
-                user, columns=[Photometry.mag], mode="read"
-            )
-            .filter(Photometry.obj_id == cls.id)
-            .filter(Photometry.snr.isnot(None))
-            .filter(Photometry.snr > PHOT_DETECTION_THRESHOLD)
-            .order_by(Photometry.mjd.desc())
-            .limit(1)
+            _last_detected_mag(cls.id, user)
+            .scalar_subquery()
             .label('last_detected_mag')
         )
 
     @hybrid_method
     def peak_detected_at(self, user):
         """UTC ISO date at which the object was detected at peak magnitude above a given S/N (3.0 by default)."""
-        detections = [
-            (phot.iso, phot.mag)
-            for phot in Photometry.query_records_accessible_by(user)
-            .filter(Photometry.obj_id == self.id)
-            .all()
-            if phot.snr is not None and phot.snr > PHOT_DETECTION_THRESHOLD
-        ]
-        return max(detections, key=(lambda x: x[1]))[0] if detections else None
+        return DBSession().execute(_peak_detected_at(self.id, user)).scalar()
 
     @peak_detected_at.expression
     def peak_detected_at(cls, user):
         """UTC ISO date at which the object was detected at peak magnitude above a given S/N (3.0 by default)."""
         return (
-            Photometry.query_records_accessible_by(
-                user, columns=[Photometry.iso], mode="read"
-            )
-            .filter(Photometry.obj_id == cls.id)
-            .filter(Photometry.snr.isnot(None))
-            .filter(Photometry.snr > PHOT_DETECTION_THRESHOLD)
-            .order_by(Photometry.mag.desc())
-            .limit(1)
-            .label('peak_detected_at')
+            _peak_detected_at(cls.id, user).scalar_subquery().label('peak_detected_at')
         )
 
     @hybrid_method
     def peak_detected_mag(self, user):
         """Peak magnitude at which the object was detected above a given S/N (3.0 by default)."""
-        return (
-            Photometry.query_records_accessible_by(
-                user, columns=[sa.func.max(Photometry.mag)], mode="read"
-            )
-            .filter(Photometry.obj_id == self.id)
-            .filter(Photometry.snr.isnot(None))
-            .filter(Photometry.snr > PHOT_DETECTION_THRESHOLD)
-            .scalar()
-        )
+        return DBSession().execute(_peak_detected_mag(self.id, user)).scalar()
 
     @peak_detected_mag.expression
     def peak_detected_mag(cls, user):
         """Peak magnitude at which the object was detected above a given S/N (3.0 by default)."""
         return (
-            Photometry.query_records_accessible_by(
-                user, columns=[sa.func.max(Photometry.mag)], mode="read"
-            )
-            .filter(Photometry.obj_id == cls.id)
-            .filter(Photometry.snr.isnot(None))
-            .filter(Photometry.snr > PHOT_DETECTION_THRESHOLD)
+            _peak_detected_mag(cls.id, user)
+            .scalar_subquery()
             .label('peak_detected_mag')
         )
 
-    def add_linked_thumbnails(self, session=DBSession):
+    def add_linked_thumbnails(self, session=DBSession, commit=True):
         """Determine the URLs of the SDSS and DESI DR8 thumbnails of the object,
-        insert them into the Thumbnails table, and link them to the object."""
+        insert them into the Thumbnails table, and link them to the object.
+        With `commit=False`, the thumbnails are only added to the session."""
         sdss_thumb = Thumbnail(obj=self, public_url=self.sdss_url, type='sdss')
         dr8_thumb = Thumbnail(obj=self, public_url=self.desi_dr8_url, type='dr8')
         session.add_all([sdss_thumb, dr8_thumb])
-        session.commit()
+        if commit:
+            session.commit()
 
     def add_ps1_thumbnail(self, session=DBSession):
         ps1_thumb = Thumbnail(obj=self, public_url=self.panstarrs_url, type="ps1")
@@ -500,14 +630,16 @@ class Obj(Base, conesearch_alchemy.Point):
     @property
     def gal_lat_deg(self):
         """Get the galactic latitute of this object"""
-        coord = ap_coord.SkyCoord(self.ra, self.dec, unit="deg")
-        return coord.galactic.b.deg
+        if self.gal_lat is None:
+            return float(galactic_coordinates(self.ra, self.dec)[1])
+        return self.gal_lat
 
     @property
     def gal_lon_deg(self):
         """Get the galactic longitude of this object"""
-        coord = ap_coord.SkyCoord(self.ra, self.dec, unit="deg")
-        return coord.galactic.l.deg
+        if self.gal_lon is None:
+            return float(galactic_coordinates(self.ra, self.dec)[0])
+        return self.gal_lon
 
     @property
     def luminosity_distance(self):
@@ -521,57 +653,16 @@ class Obj(Base, conesearch_alchemy.Point):
 
         Return None if the redshift puts the source not within the Hubble flow
         """
-
-        # there may be a non-redshift based measurement of distance
-        # for nearby sources
-        if self.altdata:
-            if self.altdata.get("dm") is not None:
-                # see eq (24) of https://ned.ipac.caltech.edu/level5/Hogg/Hogg7.html
-                return (
-                    (10 ** (float(self.altdata.get("dm")) / 5.0)) * 1e-5 * u.Mpc
-                ).value
-            if self.altdata.get("parallax") is not None:
-                if float(self.altdata.get("parallax")) > 0:
-                    # assume parallax in arcsec
-                    return (1e-6 * u.Mpc / float(self.altdata.get("parallax"))).value
-
-            if self.altdata.get("dist_kpc") is not None:
-                return (float(self.altdata.get("dist_kpc")) * 1e-3 * u.Mpc).value
-            if self.altdata.get("dist_Mpc") is not None:
-                return (float(self.altdata.get("dist_Mpc")) * u.Mpc).value
-            if self.altdata.get("dist_pc") is not None:
-                return (float(self.altdata.get("dist_pc")) * 1e-6 * u.Mpc).value
-            if self.altdata.get("dist_cm") is not None:
-                return (float(self.altdata.get("dist_cm")) * u.Mpc / 3.085e18).value
-
-        if self.redshift:
-            if self.redshift * 2.99e5 * u.km / u.s < 350 * u.km / u.s:
-                # stubbornly refuse to give a distance if the source
-                # is not in the Hubble flow
-                # cf. https://www.aanda.org/articles/aa/full/2003/05/aa3077/aa3077.html
-                # within ~5 Mpc (cz ~ 350 km/s) a given galaxy velocty
-                # can be between between ~0-500 km/s
-                return None
-            return (cosmo.luminosity_distance(self.redshift)).to(u.Mpc).value
-        return None
+        return obj_distances([self])[0]["luminosity_distance"]
 
     @property
     def dm(self):
         """Distance modulus to the object"""
-        dl = self.luminosity_distance
-        if dl:
-            return 5.0 * np.log10((dl * u.Mpc) / (10 * u.pc)).value
-        return None
+        return obj_distances([self])[0]["dm"]
 
     @property
     def angular_diameter_distance(self):
-        dl = self.luminosity_distance
-        if dl:
-            if self.redshift and self.redshift * 2.99e5 * u.km / u.s > 350 * u.km / u.s:
-                # see eq (20) of https://ned.ipac.caltech.edu/level5/Hogg/Hogg7.html
-                return dl / (1 + self.redshift) ** 2
-            return dl
-        return None
+        return obj_distances([self])[0]["angular_diameter_distance"]
 
     def airmass(self, telescope, time, below_horizon=np.inf):
         """Return the airmass of the object at a given time. Uses the Pickering
@@ -648,6 +739,34 @@ Obj.candidates = relationship(
 # It had to be defined there to prevent a circular import.
 
 
+@event.listens_for(Session, 'before_flush')
+def set_derived_coordinates_before_flush(session, flush_context, instances):
+    """Compute the galactic coordinates and HEALPix index of the objects
+    inserted or moved in this flush, all at once."""
+    objs = [
+        instance
+        for instance in itertools.chain(session.new, session.dirty)
+        if isinstance(instance, Obj)
+        and instance.ra is not None
+        and instance.dec is not None
+        and (
+            instance.gal_lat is None
+            or instance.healpix is None
+            or sa.inspect(instance).attrs.ra.history.has_changes()
+            or sa.inspect(instance).attrs.dec.history.has_changes()
+        )
+    ]
+    if len(objs) == 0:
+        return
+    gal_lon, gal_lat, healpix = derived_coordinates(
+        [obj.ra for obj in objs], [obj.dec for obj in objs]
+    )
+    for obj, lon, lat, hpx in zip(objs, gal_lon, gal_lat, healpix):
+        obj.gal_lon = float(lon)
+        obj.gal_lat = float(lat)
+        obj.healpix = int(hpx)
+
+
 @event.listens_for(Obj, 'before_delete')
 def delete_obj_thumbnails_from_disk(mapper, connection, target):
     for thumb in target.thumbnails:
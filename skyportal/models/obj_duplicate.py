@@ -0,0 +1,259 @@
+__all__ = ['ObjDuplicate', 'refresh_duplicates', 'duplicate_clusters']
+
+import datetime
+import itertools
+
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from healpix_alchemy.constants import LEVEL
+
+from baselayer.app.models import Base, DBSession, public
+
+from .obj import Obj
+from ..utils.healpix import cone_ranges
+
+# Objects closer than this are duplicates of one another [arcsec]
+DUPLICATE_RADIUS_ARCSEC = 4.0
+
+# HEALPix level of the cells locked while searching for duplicates (pixels of
+# about 3.4 arcmin), and first key of their transaction-level advisory locks
+# (the second one is the index of the cell)
+DUPLICATE_LOCK_LEVEL = 10
+DUPLICATE_LOCK_KEY = 2
+
+
+class ObjDuplicate(Base):
+    """A pair of distinct objects within `DUPLICATE_RADIUS_ARCSEC` of each
+    other, which are likely the same astronomical source. Each pair is stored
+    in both directions, so that the duplicates of an object are found by its
+    `obj_id`.
+
+    Rows are kept up to date by `refresh_duplicates` whenever an object is
+    created or moved.
+    """
+
+    __tablename__ = 'obj_duplicates'
+
+    # Access is controlled by filtering on the accessible objects
+    read = public
+
+    obj_id = sa.Column(
+        sa.ForeignKey('objs.id', ondelete='CASCADE'),
+        nullable=False,
+        doc="ID of the Obj.",
+    )
+    duplicate_obj_id = sa.Column(
+        sa.ForeignKey('objs.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+        doc="ID of the duplicate Obj.",
+    )
+    separation = sa.Column(
+        sa.Float, nullable=False, doc="Separation of the two objects [arcsec]."
+    )
+
+
+ObjDuplicate.__table_args__ = (
+    sa.UniqueConstraint(
+        ObjDuplicate.obj_id,
+        ObjDuplicate.duplicate_obj_id,
+        name='obj_duplicates_obj_id_duplicate_obj_id_key',
+    ),
+)
+
+
+def _separation_arcsec(ra1, dec1, ra2, dec2):
+    """Angular separation (haversine formula) [arcsec] of positions [deg]."""
+    ra1, dec1, ra2, dec2 = map(np.radians, (ra1, dec1, ra2, dec2))
+    sin2 = (
+        np.sin((dec2 - dec1) / 2) ** 2
+        + np.cos(dec1) * np.cos(dec2) * np.sin((ra2 - ra1) / 2) ** 2
+    )
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(sin2, 0, 1)))) * 3600
+
+
+def lock_duplicate_cells(ranges, connection):
+    """Take the transaction-level advisory locks of the coarse HEALPix cells
+    overlapping ranges of HEALPix indices, in order so that concurrent
+    refreshes cannot deadlock.
+
+    Parameters
+    ----------
+    ranges : iterable of (int, int)
+        Half-open ranges [lower, upper) of maximum level HEALPix indices.
+    connection : `sqlalchemy.engine.Connection`
+        Connection of the transaction holding the locks until it ends.
+    """
+    shift = 2 * (LEVEL - DUPLICATE_LOCK_LEVEL)
+    cells = set()
+    for lower, upper in ranges:
+        cells.update(range(lower >> shift, ((upper - 1) >> shift) + 1))
+    if len(cells) == 0:
+        return
+    cell = sa.values(sa.column('cell', sa.Integer), name='cells').data(
+        [(cell,) for cell in cells]
+    )
+    # The rows are sorted before the (volatile) lock function is evaluated
+    connection.execute(
+        sa.select(sa.func.pg_advisory_xact_lock(DUPLICATE_LOCK_KEY, cell.c.cell))
+        .select_from(cell)
+        .order_by(cell.c.cell)
+    ).all()
+
+
+def refresh_duplicates(obj_ids, session=None):
+    """Recompute the duplicates of a set of objects, searching for their
+    neighbors with range scans of the HEALPix index of `Obj`.
+
+    The coarse HEALPix cells overlapping the search cones are locked first,
+    until the end of the transaction. Nearby objects created or moved by
+    concurrent transactions share at least one of these cells, so their
+    refreshes run one after the other, and the later one finds the objects
+    committed by the earlier one.
+
+    Parameters
+    ----------
+    obj_ids : iterable of str
+        IDs of the objects that were created or moved.
+    session : `sqlalchemy.orm.Session`, optional
+        Session whose transaction to run in. Defaults to `DBSession()`.
+    """
+    obj_ids = list({obj_id for obj_id in obj_ids if obj_id is not None})
+    if len(obj_ids) == 0:
+        return
+    if session is None:
+        session = DBSession()
+
+    table = ObjDuplicate.__table__
+    connection = session.connection()
+    objs = connection.execute(
+        sa.select(Obj.id, Obj.ra, Obj.dec).where(
+            Obj.id.in_(obj_ids), Obj.ra.isnot(None), Obj.dec.isnot(None)
+        )
+    ).all()
+    obj_ranges = [
+        (obj.id, lower, upper)
+        for obj in objs
+        for lower, upper in cone_ranges(obj.ra, obj.dec, DUPLICATE_RADIUS_ARCSEC / 3600)
+    ]
+    lock_duplicate_cells([(lower, upper) for _, lower, upper in obj_ranges], connection)
+
+    connection.execute(
+        sa.delete(table).where(
+            sa.or_(table.c.obj_id.in_(obj_ids), table.c.duplicate_obj_id.in_(obj_ids))
+        )
+    )
+    if len(objs) == 0:
+        return
+    ranges = sa.values(
+        sa.column('obj_id', sa.String),
+        sa.column('lower', sa.BigInteger),
+        sa.column('upper', sa.BigInteger),
+        name='neighbor_ranges',
+    ).data(obj_ranges)
+    neighbors = connection.execute(
+        sa.select(ranges.c.obj_id, Obj.id, Obj.ra, Obj.dec).join(
+            Obj,
+            sa.and_(
+                Obj.healpix >= ranges.c.lower,
+                Obj.healpix < ranges.c.upper,
+                Obj.id != ranges.c.obj_id,
+            ),
+        )
+    ).all()
+    if len(neighbors) == 0:
+        return
+
+    positions = {obj.id: (obj.ra, obj.dec) for obj in objs}
+    ra1, dec1 = np.array([positions[row[0]] for row in neighbors]).T
+    ra2 = np.array([row.ra for row in neighbors])
+    dec2 = np.array([row.dec for row in neighbors])
+    separation = _separation_arcsec(ra1, dec1, ra2, dec2)
+
+    pairs = {}
+    for (obj_id, duplicate_obj_id, _, _), sep in zip(neighbors, separation):
+        if sep <= DUPLICATE_RADIUS_ARCSEC:
+            pairs[(obj_id, duplicate_obj_id)] = float(sep)
+            pairs[(duplicate_obj_id, obj_id)] = float(sep)
+    if len(pairs) == 0:
+        return
+    utcnow = datetime.datetime.utcnow()
+    insert = pg_insert(table).values(
+        [
+            {
+                'obj_id': obj_id,
+                'duplicate_obj_id': duplicate_obj_id,
+                'separation': sep,
+                'created_at': utcnow,
+                'modified': utcnow,
+            }
+            for (obj_id, duplicate_obj_id), sep in pairs.items()
+        ]
+    )
+    connection.execute(
+        insert.on_conflict_do_update(
+            index_elements=['obj_id', 'duplicate_obj_id'],
+            set_={'separation': insert.excluded.separation},
+        )
+    )
+
+
+def duplicate_clusters(user):
+    """Groups of objects accessible to a user that are connected by
+    duplicate pairs.
+
+    Parameters
+    ----------
+    user : `baselayer.app.models.User` or `baselayer.app.models.Token`
+        User or token whose accessible objects to consider.
+
+    Returns
+    -------
+    clusters : list of list of str
+        Sorted IDs of the objects of each cluster, sorted by their first ID.
+    """
+    accessible_obj_ids = Obj.query_records_accessible_by(
+        user, columns=[Obj.id]
+    ).subquery()
+    pairs = (
+        DBSession()
+        .query(ObjDuplicate.obj_id, ObjDuplicate.duplicate_obj_id)
+        .filter(ObjDuplicate.obj_id < ObjDuplicate.duplicate_obj_id)
+        .filter(ObjDuplicate.obj_id.in_(sa.select(accessible_obj_ids.c.id)))
+        .filter(ObjDuplicate.duplicate_obj_id.in_(sa.select(accessible_obj_ids.c.id)))
+    )
+
+    # Union-find over the pairs
+    parents = {}
+
+    def find(obj_id):
+        parents.setdefault(obj_id, obj_id)
+        while parents[obj_id] != obj_id:
+            parents[obj_id] = parents[parents[obj_id]]
+            obj_id = parents[obj_id]
+        return obj_id
+
+    for obj_id, duplicate_obj_id in pairs:
+        parents[find(obj_id)] = find(duplicate_obj_id)
+
+    clusters = {}
+    for obj_id in parents:
+        clusters.setdefault(find(obj_id), []).append(obj_id)
+    return sorted(sorted(cluster) for cluster in clusters.values())
+
+
+@event.listens_for(Session, 'after_flush')
+def refresh_duplicates_after_flush(session, flush_context):
+    """Keep duplicates in sync with objects created or moved through the
+    ORM."""
+    obj_ids = {
+        instance.id
+        for instance in itertools.chain(session.new, session.dirty)
+        if isinstance(instance, Obj)
+        # set from the position in `set_derived_coordinates_before_flush`
+        and sa.inspect(instance).attrs.healpix.history.has_changes()
+    }
+    refresh_duplicates(obj_ids, session=session)
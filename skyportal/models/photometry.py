@@ -1,9 +1,9 @@
-__all__ = ['Photometry', 'PHOT_ZP', 'PHOT_SYS']
+__all__ = ['Photometry', 'PhotometryUpload', 'PHOT_ZP', 'PHOT_SYS']
 
 import uuid
 
 import sqlalchemy as sa
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.hybrid import hybrid_property
 
@@ -248,3 +248,74 @@ Photometry.__table_args__ = (
         unique=True,
     ),
 )
+
+
+class PhotometryUpload(Base):
+    """Status of an asynchronous photometry upload."""
+
+    create = read = update = delete = accessible_by_owner
+
+    upload_id = sa.Column(
+        sa.String,
+        nullable=False,
+        unique=True,
+        index=True,
+        doc="Upload ID shared by all photometry points of this upload.",
+    )
+    owner_id = sa.Column(
+        sa.ForeignKey('users.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+        doc="ID of the User who submitted the upload.",
+    )
+    owner = relationship(
+        'User',
+        foreign_keys=[owner_id],
+        doc="The User who submitted the upload.",
+    )
+    status = sa.Column(
+        sa.String,
+        nullable=False,
+        default='queued',
+        doc="Status of the upload: 'queued', 'running', 'complete' or 'failed'.",
+    )
+    n_rows = sa.Column(
+        sa.Integer, nullable=False, doc="Number of photometry points submitted."
+    )
+    n_inserted = sa.Column(
+        sa.Integer,
+        nullable=True,
+        doc=(
+            "Number of photometry points inserted so far. Points are inserted "
+            "(and committed) in chunks, so this reports the progress of "
+            "running uploads, and the number of points of a failed upload "
+            "that stay inserted under its upload ID."
+        ),
+    )
+    payload = deferred(
+        sa.Column(
+            JSONB,
+            nullable=True,
+            doc=(
+                "Posted photometry, with the IDs of its groups and streams, kept "
+                "until the upload finishes so that it can be resumed if the "
+                "process running it stops."
+            ),
+        )
+    )
+    worker = sa.Column(
+        sa.String,
+        nullable=True,
+        doc="Host and process ID of the app server the upload is queued on.",
+    )
+    error = sa.Column(
+        sa.String, nullable=True, doc="Reason the upload failed, if it did."
+    )
+    started_at = sa.Column(
+        sa.DateTime, nullable=True, doc="UTC time the upload started processing."
+    )
+    finished_at = sa.Column(
+        sa.DateTime,
+        nullable=True,
+        doc="UTC time the upload finished processing (successfully or not).",
+    )
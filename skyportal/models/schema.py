@@ -183,6 +183,8 @@ def setup_schema():
                         'redshift_history',
                         'modified',
                         'internal_key',
+                        'gal_lon',
+                        'gal_lat',
                     ],
                 )
 
@@ -1,22 +1,53 @@
-__all__ = ['Thumbnail']
+__all__ = [
+    'Thumbnail',
+    'classify_thumbnails_grayscale',
+    'classify_unclassified_thumbnails',
+]
 
+import datetime
+import io
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import sqlalchemy as sa
 from sqlalchemy import event
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session
 
 import requests
 
-from baselayer.app.models import Base, AccessibleIfRelatedRowsAreAccessible
+from baselayer.app.env import load_env
+from baselayer.app.models import Base, DBSession, AccessibleIfRelatedRowsAreAccessible
 from baselayer.log import make_log
 
 from ..utils.thumbnail import image_is_grayscale
 from ..enum_types import thumbnail_types
 
 
+_, cfg = load_env()
+
 log = make_log('models.thumbnail')
 
+# Number of thumbnails classified per task of the classification pool
+GRAYSCALE_BATCH_SIZE = 20
+
+# Timeout of the download of thumbnails with a public URL [s]
+THUMBNAIL_DOWNLOAD_TIMEOUT = 10
+
+# Thumbnails whose download failed temporarily (e.g., timeouts or server
+# errors) are retried by `classify_unclassified_thumbnails` for this long
+# after their creation, and are then left unclassified
+GRAYSCALE_RETRY_PERIOD = datetime.timedelta(days=1)
+
+grayscale_executor = ThreadPoolExecutor(
+    max_workers=cfg.get("misc.thumbnail_grayscale_workers", 4),
+    thread_name_prefix='thumbnail_grayscale',
+)
+
+# Each worker keeps its own HTTP session, so that downloads from the same
+# host (e.g. the survey cutout services) reuse their connections
+_http = threading.local()
+
 
 class Thumbnail(Base):
     """Thumbnail image centered on the location of an Obj."""
@@ -56,23 +87,169 @@ class Thumbnail(Base):
     )
     is_grayscale = sa.Column(
         sa.Boolean(),
-        nullable=False,
-        default=False,
-        doc="Boolean indicating whether the thumbnail is (mostly) grayscale or not.",
+        nullable=True,
+        doc=(
+            "Boolean indicating whether the thumbnail is (mostly) grayscale or "
+            "not. None until the thumbnail has been classified, in the "
+            "background after it is committed, or if its image could not be "
+            "downloaded. Missing or unreadable images are not grayscale."
+        ),
     )
 
 
-@event.listens_for(Thumbnail, 'before_insert')
-def classify_thumbnail_grayscale(mapper, connection, target):
-    if target.file_uri is not None:
-        target.is_grayscale = image_is_grayscale(target.file_uri)
-    else:
+def _http_session():
+    session = getattr(_http, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _http.session = session
+    return session
+
+
+def _is_grayscale(file_uri, public_url):
+    """Classify a thumbnail, or return None if its image could not be
+    downloaded and may be later. Images that are missing (files or 4xx
+    responses) or cannot be decoded are not grayscale."""
+    source = file_uri or public_url
+    try:
+        if file_uri is not None:
+            return image_is_grayscale(file_uri)
+        response = _http_session().get(public_url, timeout=THUMBNAIL_DOWNLOAD_TIMEOUT)
+        if response.status_code >= 500:
+            log(f"Could not download thumbnail {source}: {response.status_code}")
+            return None
+        if response.status_code >= 400:
+            log(f"Thumbnail {source} not found: {response.status_code}")
+            return False
+        return image_is_grayscale(io.BytesIO(response.content))
+    except requests.exceptions.RequestException as e:
+        log(f"Could not download thumbnail {source}: {e}")
+        return None
+    except OSError as e:
+        log(f"Could not read thumbnail {source}: {e}")
+        return False
+
+
+def classify_thumbnails_grayscale(thumbnail_ids):
+    """Set `is_grayscale` of the thumbnails that have not been classified yet.
+
+    The images are read (or downloaded) outside of any transaction, and the
+    results are written with a single UPDATE.
+
+    Parameters
+    ----------
+    thumbnail_ids : list of int
+        IDs of the thumbnails to classify.
+    """
+    # The task may run in the thread of a request (or of a job), whose scoped
+    # session must be left alone: use a session of its own
+    with Session(bind=DBSession.session_factory.kw["bind"]) as session:
         try:
-            target.is_grayscale = image_is_grayscale(
-                requests.get(target.public_url, stream=True).raw
+            thumbnails = session.execute(
+                sa.select(Thumbnail.id, Thumbnail.file_uri, Thumbnail.public_url)
+                .where(Thumbnail.id.in_(thumbnail_ids))
+                .where(Thumbnail.is_grayscale.is_(None))
+            ).all()
+            # Do not hold a connection during the downloads
+            session.rollback()
+
+            results = []
+            for thumbnail_id, file_uri, public_url in thumbnails:
+                is_grayscale = _is_grayscale(file_uri, public_url)
+                if is_grayscale is not None:
+                    results.append((thumbnail_id, is_grayscale))
+            if len(results) == 0:
+                return
+
+            table = Thumbnail.__table__
+            classified = sa.values(
+                sa.column('id', sa.Integer),
+                sa.column('is_grayscale', sa.Boolean),
+                name='classified',
+            ).data(results)
+            session.execute(
+                sa.update(table)
+                .where(table.c.id == classified.c.id)
+                .values(is_grayscale=classified.c.is_grayscale)
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            log(f"Error classifying thumbnails {thumbnail_ids}: {e}")
+
+
+def classify_unclassified_thumbnails(batch_size=GRAYSCALE_BATCH_SIZE):
+    """Classify the thumbnails left with `is_grayscale` NULL, e.g. because the
+    server stopped before their background classification ran, in batches
+    run on `grayscale_executor`.
+
+    Only thumbnails created in the last `GRAYSCALE_RETRY_PERIOD` are
+    considered, so that those whose download keeps failing temporarily are
+    not retried forever.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        Number of thumbnails classified per task.
+
+    Returns
+    -------
+    int
+        Number of unclassified thumbnails that were processed.
+    """
+    created_after = datetime.datetime.utcnow() - GRAYSCALE_RETRY_PERIOD
+    with Session(bind=DBSession.session_factory.kw["bind"]) as session:
+        thumbnail_ids = (
+            session.execute(
+                sa.select(Thumbnail.id)
+                .where(Thumbnail.is_grayscale.is_(None))
+                .where(Thumbnail.created_at >= created_after)
+                .order_by(Thumbnail.id)
             )
-        except requests.exceptions.RequestException:
-            pass
+            .scalars()
+            .all()
+        )
+
+    tasks = [
+        grayscale_executor.submit(
+            classify_thumbnails_grayscale, thumbnail_ids[i : i + batch_size]
+        )
+        for i in range(0, len(thumbnail_ids), batch_size)
+    ]
+    for task in tasks:
+        task.result()
+    return len(thumbnail_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_unclassified_thumbnails(session, flush_context):
+    """Remember the thumbnails inserted in the transaction, to classify them
+    once it is committed."""
+    thumbnail_ids = [
+        instance.id
+        for instance in session.new
+        if isinstance(instance, Thumbnail) and instance.is_grayscale is None
+    ]
+    if len(thumbnail_ids) > 0:
+        session.info.setdefault('unclassified_thumbnail_ids', []).extend(thumbnail_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def classify_thumbnails_grayscale_after_commit(session):
+    """Classify the committed thumbnails in the background, in batches, rather
+    than downloading and decoding every image in the request inserting it."""
+    thumbnail_ids = session.info.pop('unclassified_thumbnail_ids', [])
+    for i in range(0, len(thumbnail_ids), GRAYSCALE_BATCH_SIZE):
+        grayscale_executor.submit(
+            classify_thumbnails_grayscale,
+            thumbnail_ids[i : i + GRAYSCALE_BATCH_SIZE],
+        )
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def forget_unclassified_thumbnails(session, previous_transaction):
+    # Rolling back a savepoint keeps the thumbnails of the outer transaction
+    if not session.in_transaction():
+        session.info.pop('unclassified_thumbnail_ids', None)
 
 
 # Also see the similar event listener on Obj
@@ -1,9 +1,11 @@
 import os
 import urllib.parse
 import requests
+import sqlalchemy as sa
 
 from .patch_requests import patch_requests
 from baselayer.app.env import load_env
+from baselayer.app.models import DBSession
 
 
 IS_CI_BUILD = "TRAVIS" in os.environ or "GITHUB_ACTIONS" in os.environ
@@ -63,3 +65,32 @@ def api(
         except requests.exceptions.JSONDecodeError:
             data = None
         return response.status_code, data
+
+
+def count_statements(func, *args, **kwargs):
+    """Call a function and count the SQL statements it executes.
+
+    Parameters
+    ----------
+    func : callable
+        Function to call with the remaining arguments.
+
+    Returns
+    -------
+    result
+        Return value of `func`.
+    count : int
+        Number of statements executed on the database engine.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = DBSession().get_bind()
+    sa.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return result, len(statements)
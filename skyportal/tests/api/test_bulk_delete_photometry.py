@@ -29,3 +29,137 @@ def test_bulk_delete_photometry(
     )
     assert status == 200
     assert data["data"] == "Deleted 3 photometry points."
+
+
+def test_bulk_reassign_photometry_groups(
+    upload_data_token,
+    view_only_token2,
+    public_source,
+    public_group,
+    public_group2,
+    ztf_camera,
+):
+    status, data = api(
+        "POST",
+        "photometry",
+        data={
+            "obj_id": str(public_source.id),
+            "mjd": [58100.0, 58101.0, 58102.0],
+            "instrument_id": ztf_camera.id,
+            "flux": [12.24, 12.52, 12.70],
+            "fluxerr": [0.031, 0.029, 0.030],
+            "filter": ["ztfg", "ztfg", "ztfg"],
+            "zp": [25.0, 25.0, 25.0],
+            "magsys": ["ab", "ab", "ab"],
+            "group_ids": [public_group.id],
+        },
+        token=upload_data_token,
+    )
+    assert status == 200
+    upload_id = data["data"]["upload_id"]
+    photometry_id = data["data"]["ids"][0]
+
+    # only the owner of the photometry can update it
+    status, data = api(
+        "PUT",
+        f"photometry/uploads/{upload_id}",
+        data={"group_ids": [public_group2.id]},
+        token=view_only_token2,
+    )
+    assert status == 401
+
+    status, data = api(
+        "PUT",
+        f"photometry/uploads/{upload_id}",
+        data={"group_ids": [public_group2.id]},
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert data["data"]["n_photometry"] == 3
+    assert data["data"]["groups_added"] == 3
+    assert data["data"]["groups_removed"] == 0
+
+    status, data = api(
+        "PUT",
+        f"photometry/uploads/{upload_id}",
+        data={"group_ids": [public_group2.id], "replace": True},
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert data["data"]["groups_added"] == 0
+    assert data["data"]["groups_removed"] == 3
+
+    status, data = api("GET", f"photometry/{photometry_id}", token=upload_data_token)
+    assert status == 200
+    group_ids = [g["id"] for g in data["data"]["groups"]]
+    assert public_group2.id in group_ids
+    assert public_group.id not in group_ids
+
+    status, data = api(
+        "PUT",
+        f"photometry/uploads/{upload_id}",
+        data={"group_ids": [public_group.id]},
+        token=upload_data_token,
+    )
+    assert status == 200
+
+    status, data = api(
+        "DELETE", f"photometry/bulk_delete/{upload_id}", token=upload_data_token
+    )
+    assert status == 200
+    assert data["data"] == "Deleted 3 photometry points."
+
+    status, data = api(
+        "PUT",
+        f"photometry/uploads/{upload_id}",
+        data={"group_ids": [public_group.id]},
+        token=upload_data_token,
+    )
+    assert status == 400
+
+
+def test_bulk_replace_photometry_groups_keeps_owner_single_user_group(
+    upload_data_token,
+    super_admin_token,
+    user,
+    public_source,
+    public_group,
+    public_group2,
+    ztf_camera,
+):
+    status, data = api(
+        "POST",
+        "photometry",
+        data={
+            "obj_id": str(public_source.id),
+            "mjd": [58200.0, 58201.0],
+            "instrument_id": ztf_camera.id,
+            "flux": [12.24, 12.52],
+            "fluxerr": [0.031, 0.029],
+            "filter": ["ztfg", "ztfg"],
+            "zp": [25.0, 25.0],
+            "magsys": ["ab", "ab"],
+            "group_ids": [public_group.id],
+        },
+        token=upload_data_token,
+    )
+    assert status == 200
+    upload_id = data["data"]["upload_id"]
+    photometry_id = data["data"]["ids"][0]
+
+    status, data = api(
+        "PUT",
+        f"photometry/uploads/{upload_id}",
+        data={"group_ids": [public_group2.id], "replace": True},
+        token=super_admin_token,
+    )
+    assert status == 200
+    assert data["data"]["groups_removed"] == 2
+
+    status, data = api("GET", f"photometry/{photometry_id}", token=super_admin_token)
+    assert status == 200
+    group_ids = {g["id"] for g in data["data"]["groups"]}
+    # still shared with the uploader's single user group
+    assert user.single_user_group.id in group_ids
+    assert public_group2.id in group_ids
+    assert public_group.id not in group_ids
@@ -3,7 +3,15 @@ import datetime
 import uuid
 import numpy.testing as npt
 
-from skyportal.tests import api
+import sqlalchemy as sa
+
+from skyportal.tests import api, count_statements
+from skyportal.tests.fixtures import ObjFactory
+from skyportal.models import DBSession, Candidate, Obj, Source
+from skyportal.handlers.api.candidate import (
+    grab_query_results_by_cursor,
+    serialize_candidates_page,
+)
 
 from tdtax import taxonomy, __version__
 
@@ -130,6 +138,68 @@ def test_cannot_add_candidate_without_passed_at(upload_data_token, public_filter
     assert status == 400
 
 
+def test_token_user_post_candidates_batch(
+    upload_data_token, view_only_token, public_filter
+):
+    obj_ids = [str(uuid.uuid4()) for _ in range(3)]
+    passed_at = str(datetime.datetime.utcnow())
+    candidates = [
+        {
+            "id": obj_id,
+            "ra": 234.22 + i,
+            "dec": -22.33,
+            "redshift": 0.1 * i,
+            "filter_ids": [public_filter.id],
+            "passed_at": passed_at,
+        }
+        for i, obj_id in enumerate(obj_ids)
+    ]
+    # Invalid items are reported, without failing the others
+    candidates.append({"id": str(uuid.uuid4()), "filter_ids": [public_filter.id]})
+
+    status, data = api(
+        "POST",
+        "candidates/batch",
+        data={"candidates": candidates},
+        token=upload_data_token,
+    )
+    assert status == 200
+    results = data["data"]["results"]
+    assert [r["status"] for r in results] == ["success"] * 3 + ["error"]
+    assert [r["obj_id"] for r in results[:3]] == obj_ids
+    ids = [r["ids"] for r in results[:3]]
+    assert all(len(i) == 1 for i in ids)
+
+    status, data = api("GET", f"candidates/{obj_ids[1]}", token=view_only_token)
+    assert status == 200
+    npt.assert_almost_equal(data["data"]["ra"], 235.22)
+    npt.assert_almost_equal(data["data"]["redshift"], 0.1)
+    assert data["data"]["gal_lat"] is not None
+    assert len(data["data"]["redshift_history"]) == 1
+
+    # Posting the same candidates again updates them in place
+    status, data = api(
+        "POST",
+        "candidates/batch",
+        data={"candidates": candidates[:3]},
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert [r["ids"] for r in data["data"]["results"]] == ids
+
+    status, data = api("GET", f"candidates/{obj_ids[1]}", token=view_only_token)
+    assert status == 200
+    assert len(data["data"]["redshift_history"]) == 2
+
+    for obj_id in obj_ids:
+        status, data = api(
+            "DELETE",
+            f"candidates/{obj_id}/{public_filter.id}",
+            token=upload_data_token,
+        )
+        assert status == 200
+
+
 def test_token_user_post_two_candidates_same_obj_filter(
     upload_data_token, view_only_token, public_filter
 ):
@@ -452,6 +522,75 @@ def test_candidate_list_filtering_numeric(
     assert data["data"]["candidates"][0]["id"] == public_candidate.id
 
 
+def test_candidate_list_filtering_follows_annotation_updates(
+    annotation_token, view_only_token, public_candidate
+):
+    origin = str(uuid.uuid4())
+    status, data = api(
+        "POST",
+        f"sources/{public_candidate.id}/annotations",
+        data={
+            "obj_id": public_candidate.id,
+            "origin": origin,
+            "data": {"numeric_field": 1, "string_field": "a"},
+        },
+        token=annotation_token,
+    )
+    assert status == 200
+    annotation_id = data["data"]["annotation_id"]
+
+    status, data = api("GET", "internal/annotations_info", token=view_only_token)
+    assert status == 200
+    assert data["data"][origin] == [
+        {"numeric_field": "number"},
+        {"string_field": "string"},
+    ]
+
+    annotation_filter = (
+        f'{{"origin":"{origin}","key":"numeric_field","min":0,"max":1.5}}'
+    )
+    status, data = api(
+        "GET",
+        "candidates",
+        params={"annotationFilterList": annotation_filter},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert [c["id"] for c in data["data"]["candidates"]] == [public_candidate.id]
+
+    status, data = api(
+        "PUT",
+        f"sources/{public_candidate.id}/annotations/{annotation_id}",
+        data={"data": {"numeric_field": 2, "string_field": "a"}},
+        token=annotation_token,
+    )
+    assert status == 200
+
+    status, data = api(
+        "GET",
+        "candidates",
+        params={"annotationFilterList": annotation_filter},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert len(data["data"]["candidates"]) == 0
+
+    # Each filter may match a different annotation field
+    status, data = api(
+        "GET",
+        "candidates",
+        params={
+            "annotationFilterList": (
+                f'{{"origin":"{origin}","key":"numeric_field","min":1.5,"max":2.5}},'
+                f'{{"origin":"{origin}","key":"string_field","value":"a"}}'
+            )
+        },
+        token=view_only_token,
+    )
+    assert status == 200
+    assert [c["id"] for c in data["data"]["candidates"]] == [public_candidate.id]
+
+
 def test_candidate_list_filtering_boolean(
     annotation_token, view_only_token, public_candidate, public_candidate2
 ):
@@ -686,6 +825,55 @@ def test_candidate_list_redshift_range(
     assert data["data"]["candidates"][0]["id"] == obj_id1
 
 
+def test_candidate_list_galactic_latitude_range(
+    upload_data_token, view_only_token, public_filter, public_group
+):
+    # Near the Galactic center and the north Galactic pole
+    in_plane_id = str(uuid.uuid4())
+    high_lat_id = str(uuid.uuid4())
+    for obj_id, ra, dec in [
+        (in_plane_id, 266.40, -28.94),
+        (high_lat_id, 192.86, 27.13),
+    ]:
+        status, data = api(
+            "POST",
+            "candidates",
+            data={
+                "id": obj_id,
+                "ra": ra,
+                "dec": dec,
+                "transient": False,
+                "ra_dis": 2.3,
+                "filter_ids": [public_filter.id],
+                "passed_at": str(datetime.datetime.utcnow()),
+            },
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    status, data = api(
+        "GET",
+        "candidates",
+        params={"minGalLat": "85", "groupIDs": f"{public_group.id}"},
+        token=view_only_token,
+    )
+    assert status == 200
+    obj_ids = {candidate["id"] for candidate in data["data"]["candidates"]}
+    assert high_lat_id in obj_ids
+    assert in_plane_id not in obj_ids
+
+    status, data = api(
+        "GET",
+        "candidates",
+        params={"maxGalLat": "0.5", "groupIDs": f"{public_group.id}"},
+        token=view_only_token,
+    )
+    assert status == 200
+    obj_ids = {candidate["id"] for candidate in data["data"]["candidates"]}
+    assert in_plane_id in obj_ids
+    assert high_lat_id not in obj_ids
+
+
 def test_exclude_by_outdated_annotations(
     annotation_token, view_only_token, public_group, public_candidate, public_candidate2
 ):
@@ -1506,3 +1694,266 @@ def test_candidate_list_pagination(
     )
     assert status == 400
     assert "Page number out of range" in data["message"]
+
+
+def test_candidate_list_cursor_pagination(
+    view_only_token, upload_data_token, public_group, public_filter
+):
+    # Candidates passing far in the future, newest first
+    passed_at = datetime.datetime(2099, 1, 1)
+    obj_ids = [str(uuid.uuid4()) for _ in range(3)]
+    for i, obj_id in enumerate(obj_ids):
+        status, data = api(
+            "POST",
+            "candidates",
+            data={
+                "id": obj_id,
+                "ra": 234.22,
+                "dec": -22.33,
+                "redshift": 3,
+                "transient": False,
+                "ra_dis": 2.3,
+                "filter_ids": [public_filter.id],
+                "passed_at": str(passed_at - datetime.timedelta(days=i)),
+            },
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    params = {
+        "numPerPage": 2,
+        "groupIDs": f"{public_group.id}",
+        "startDate": "2098-12-01",
+        "useCursor": True,
+        "includeTotalMatches": True,
+    }
+    status, data = api("GET", "candidates", params=params, token=view_only_token)
+    assert status == 200
+    assert [c["id"] for c in data["data"]["candidates"]] == obj_ids[:2]
+    assert data["data"]["totalMatches"] == 3
+    cursor = data["data"]["nextCursor"]
+    assert cursor is not None
+
+    params.pop("useCursor")
+    params.pop("includeTotalMatches")
+    status, data = api(
+        "GET",
+        "candidates",
+        params={**params, "cursor": cursor},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert [c["id"] for c in data["data"]["candidates"]] == obj_ids[2:]
+    assert data["data"]["nextCursor"] is None
+    assert "totalMatches" not in data["data"]
+
+    status, data = api(
+        "GET",
+        "candidates",
+        params={**params, "cursor": "not-a-cursor"},
+        token=view_only_token,
+    )
+    assert status == 400
+    assert "Invalid cursor" in data["message"]
+
+    status, data = api(
+        "GET",
+        "candidates",
+        params={
+            **params,
+            "useCursor": True,
+            "sortByAnnotationOrigin": "kowalski",
+            "sortByAnnotationKey": "offset_from_host_galaxy",
+        },
+        token=view_only_token,
+    )
+    assert status == 400
+
+
+def test_candidate_cursor_pages_read_rows_after_the_cursor(
+    user, public_filter, public_group
+):
+    base = datetime.datetime(2097, 6, 1)
+    objs = [ObjFactory(groups=[public_group]) for _ in range(5)]
+    # Objs passing several times are listed once, at their latest passage
+    days_ago = [[0, 10], [1], [2], [1.5, 3], [4]]
+    for obj, days in zip(objs, days_ago):
+        for d in days:
+            DBSession.add(
+                Candidate(
+                    obj_id=obj.id,
+                    filter_id=public_filter.id,
+                    passed_at=base - datetime.timedelta(days=d),
+                    uploader_id=user.id,
+                )
+            )
+    DBSession.commit()
+    expected = [objs[i].id for i in [0, 1, 3, 2, 4]]
+
+    candidate_subquery = (
+        Candidate.query_records_accessible_by(user)
+        .filter(
+            Candidate.filter_id == public_filter.id,
+            Candidate.passed_at.between(base - datetime.timedelta(days=30), base),
+        )
+        .subquery()
+    )
+    q = Obj.query_records_accessible_by(user).join(
+        candidate_subquery, Obj.id == candidate_subquery.c.obj_id
+    )
+
+    def get_page(cursor):
+        return grab_query_results_by_cursor(
+            q,
+            candidate_subquery.c.passed_at,
+            "passed_at",
+            "desc",
+            cursor,
+            2,
+            "candidates",
+            include_thumbnails=False,
+            include_total_matches=True,
+            id_column=candidate_subquery.c.obj_id,
+        )
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    ids = []
+    cursor = None
+    engine = DBSession().get_bind()
+    for page in range(3):
+        statements.clear()
+        sa.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            data = get_page(cursor)
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        assert data["totalMatches"] == 5
+        ids.extend(row[0].id for row in data["candidates"])
+        cursor = data["nextCursor"]
+
+        if page > 0:
+            # The rows following the cursor are read in order, up to a limit,
+            # without first aggregating all matches
+            statement, parameters = statements[0]
+            assert "GROUP BY" not in statement
+            plan = (
+                DBSession()
+                .connection()
+                .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                .scalar()
+            )
+            assert plan[0]["Plan"]["Node Type"] == "Limit"
+    assert ids == expected
+    assert cursor is None
+
+
+def test_candidate_query_cache_invalidated_by_new_candidates(
+    view_only_token, upload_data_token, public_group, public_filter
+):
+    def post_candidate():
+        status, data = api(
+            "POST",
+            "candidates",
+            data={
+                "id": str(uuid.uuid4()),
+                "ra": 234.22,
+                "dec": -22.33,
+                "redshift": 3,
+                "transient": False,
+                "ra_dis": 2.3,
+                "filter_ids": [public_filter.id],
+                "passed_at": str(datetime.datetime.utcnow()),
+            },
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    post_candidate()
+    params = {"numPerPage": 1, "groupIDs": f"{public_group.id}"}
+    status, data = api("GET", "candidates", params=params, token=view_only_token)
+    assert status == 200
+    query_id = data["data"]["queryID"]
+    total_matches = data["data"]["totalMatches"]
+
+    status, data = api(
+        "GET",
+        "candidates",
+        params={**params, "queryID": query_id},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert data["data"]["queryID"] == query_id
+
+    # New candidates passing the filter invalidate the cached results
+    post_candidate()
+    status, data = api(
+        "GET",
+        "candidates",
+        params={**params, "queryID": query_id},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert data["data"]["queryID"] != query_id
+    assert data["data"]["totalMatches"] == total_matches + 1
+
+
+def test_candidate_page_query_count_independent_of_page_size(
+    user, public_filter, public_group
+):
+    objs = []
+    for i in range(4):
+        obj = ObjFactory(groups=[public_group])
+        DBSession.add(
+            Candidate(
+                obj_id=obj.id,
+                filter_id=public_filter.id,
+                passed_at=datetime.datetime.utcnow(),
+                uploader_id=user.id,
+            )
+        )
+        if i % 2 == 0:
+            DBSession.add(Source(obj_id=obj.id, group_id=public_group.id))
+        objs.append(obj)
+    DBSession.commit()
+
+    try:
+        counts = []
+        for page in [objs[:1], objs]:
+            DBSession().expire_all()
+            page = (
+                DBSession()
+                .query(Obj)
+                .filter(Obj.id.in_([obj.id for obj in page]))
+                .order_by(Obj.id)
+                .all()
+            )
+            candidates, count = count_statements(
+                serialize_candidates_page,
+                page,
+                user,
+                [public_group.id],
+                include_photometry=True,
+                include_spectra=True,
+                include_comments=True,
+            )
+            assert [c['id'] for c in candidates] == [obj.id for obj in page]
+            is_source = {obj.id: i % 2 == 0 for i, obj in enumerate(objs)}
+            for candidate in candidates:
+                assert candidate['is_source'] == is_source[candidate['id']]
+                if candidate['is_source']:
+                    assert [g.id for g in candidate['saved_groups']] == [
+                        public_group.id
+                    ]
+                assert candidate['passing_group_ids'] == [public_filter.group_id]
+                assert len(candidate['photometry']) > 0
+                assert len(candidate['spectra']) > 0
+                assert len(candidate['comments']) > 0
+            counts.append(count)
+        assert counts[0] == counts[1]
+    finally:
+        for obj in objs:
+            ObjFactory.teardown(obj)
@@ -0,0 +1,79 @@
+import uuid
+
+import numpy as np
+
+from skyportal.tests import api
+
+
+def test_crossmatch_positions(upload_data_token, view_only_token, public_group):
+    ra, dec = np.random.uniform(10, 350), np.random.uniform(-60, 60)
+    near_id = str(uuid.uuid4())
+    far_id = str(uuid.uuid4())
+    # 1" and 10" north of the position
+    for obj_id, offset in [(near_id, 1), (far_id, 10)]:
+        status, data = api(
+            "POST",
+            "sources",
+            data={
+                "id": obj_id,
+                "ra": ra,
+                "dec": dec + offset / 3600,
+                "group_ids": [public_group.id],
+            },
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    status, data = api(
+        "POST",
+        "crossmatch",
+        data={
+            "positions": [
+                {"ra": ra, "dec": dec},
+                {"ra": ra, "dec": dec, "radius": 20 / 3600},
+                {"ra": (ra + 180) % 360, "dec": -dec},
+            ],
+            "radius": 5 / 3600,
+        },
+        token=view_only_token,
+    )
+    assert status == 200
+    matches = data["data"]["matches"]
+    assert len(matches) == 3
+    assert near_id in matches[0]
+    assert far_id not in matches[0]
+    assert matches[1].index(near_id) < matches[1].index(far_id)
+    assert near_id not in matches[2] and far_id not in matches[2]
+
+
+def test_crossmatch_invalid_positions(view_only_token):
+    status, data = api(
+        "POST", "crossmatch", data={"positions": []}, token=view_only_token
+    )
+    assert status == 400
+
+    status, data = api(
+        "POST",
+        "crossmatch",
+        data={"positions": [{"ra": 10, "dec": 10}]},
+        token=view_only_token,
+    )
+    assert status == 400
+    assert "Invalid position 0" in data["message"]
+
+    status, data = api(
+        "POST",
+        "crossmatch",
+        data={"positions": [{"ra": 10, "dec": 10, "radius": 2}]},
+        token=view_only_token,
+    )
+    assert status == 400
+    assert "radius" in data["message"]
+
+    status, data = api(
+        "POST",
+        "crossmatch",
+        data={"positions": [{"ra": 10, "dec": 91, "radius": 0.1}]},
+        token=view_only_token,
+    )
+    assert status == 400
@@ -2,6 +2,7 @@ import os
 import numpy as np
 
 from skyportal.tests import api
+from skyportal.models import Localization
 
 
 def test_gcn_GW(super_admin_token, view_only_token):
@@ -92,3 +93,22 @@ def test_gcn_Fermi(super_admin_token, view_only_token):
         token=super_admin_token,
     )
     assert status == 200
+
+
+def test_localization_cumprob():
+    # Two level 0 tiles and four level 1 tiles, two of them equally probable
+    uniq = np.array([4, 5, 24, 25, 26, 27])
+    probdensity = np.array([0.1, 0.05, 0.2, 0.4, 0.2, 0.02])
+    localization = Localization(uniq=uniq, probdensity=probdensity)
+
+    area = 4 * np.pi / 12 / 4 ** np.array([0, 0, 1, 1, 1, 1])
+    prob = probdensity * area
+    cumprob = localization.cumprob
+
+    assert np.isclose(cumprob[3], prob[3])
+    # Ties share the cumulative probability of the last of them
+    assert np.isclose(cumprob[2], prob[3] + prob[2] + prob[4])
+    assert cumprob[2] == cumprob[4]
+    assert np.isclose(cumprob[0], cumprob[2] + prob[0])
+    assert np.isclose(cumprob[1], cumprob[0] + prob[1])
+    assert np.isclose(cumprob.max(), prob.sum())
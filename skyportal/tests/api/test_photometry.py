@@ -1,16 +1,29 @@
+import csv
+import datetime
+import io
+import json
 import math
 
 import os
 import numpy as np
 import pandas as pd
 import sncosmo
+import sqlalchemy as sa
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from baselayer.app.env import load_env
-from skyportal.models import DBSession, Token
-from skyportal.tests import api
+from skyportal.models import DBSession, Photometry, PhotometryUpload, Token
+from skyportal.tests import api, session
 
-from skyportal.handlers.api.photometry import add_external_photometry
+from skyportal.handlers.api import photometry as photometry_handlers
+from skyportal.handlers.api.photometry import (
+    add_external_photometry,
+    photometry_serialization_query,
+    serialize,
+    serialize_photometry,
+)
 
 _, cfg = load_env()
 PHOT_DETECTION_THRESHOLD = cfg["misc.photometry_detection_threshold_nsigma"]
@@ -57,6 +70,61 @@ def test_token_user_post_get_photometry_data(
     )
 
 
+def test_serialize_photometry_matches_serialize(
+    upload_data_token, public_source_no_data, public_group, ztf_camera
+):
+    obj_id = str(public_source_no_data.id)
+    # with and without a limiting magnitude, including non-detections
+    for data in [
+        {
+            'mag': [19.2, None, 20.1],
+            'magerr': [0.05, None, 0.2],
+            'limiting_mag': [20.5, 20.6, 20.7],
+            'magsys': ['ab', 'vega', 'ab'],
+        },
+        {
+            'flux': [120.0, -3.0, None, 0.0],
+            'fluxerr': [2.0, 1.5, 1.0, 0.5],
+            'zp': 25.0,
+            'magsys': 'ab',
+        },
+    ]:
+        n_points = max(len(v) for v in data.values() if isinstance(v, list))
+        status, response = api(
+            'POST',
+            'photometry',
+            data={
+                'obj_id': obj_id,
+                'instrument_id': ztf_camera.id,
+                'mjd': [59000.0 + i for i in range(n_points)],
+                'filter': ['ztfg', 'ztfr', 'ztfi', 'ztfg'][:n_points],
+                'group_ids': [public_group.id],
+                **data,
+            },
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    query = DBSession().query(Photometry).filter(Photometry.obj_id == obj_id)
+    photometry = query.order_by(Photometry.id).all()
+    rows = photometry_serialization_query(query).order_by(Photometry.id).all()
+    assert len(rows) == 7
+
+    for outsys in ['ab', 'vega']:
+        for format in ['mag', 'flux']:
+            batch = serialize_photometry(rows, outsys, format)
+            for phot, packet in zip(photometry, batch):
+                expected = serialize(phot, outsys, format)
+                assert packet.keys() == expected.keys()
+                for key, value in expected.items():
+                    if key == 'groups':
+                        assert {g.id for g in packet[key]} == {g.id for g in value}
+                    elif isinstance(value, float):
+                        np.testing.assert_allclose(packet[key], value)
+                    else:
+                        assert packet[key] == value, key
+
+
 def test_post_multiple_photometry_vector_altdata(
     upload_data_token, public_source, public_group, ztf_camera
 ):
@@ -142,6 +210,127 @@ def test_post_multiple_photometry_scalar_altdata(
         assert data["data"]["altdata"] == {"key1": "value1"}
 
 
+def test_token_user_post_columnar_photometry_data(
+    upload_data_token, public_source, public_group, ztf_camera
+):
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        obj_id=np.array(str(public_source.id)),
+        instrument_id=np.array(ztf_camera.id),
+        mjd=np.array([59300.0, 59301.0, 59302.0]),
+        mag=np.array([19.2, 19.3, np.nan]),
+        magerr=np.array([0.05, 0.06, np.nan]),
+        limiting_mag=np.array([20.0, 20.1, 20.2]),
+        magsys=np.array(["ab", "ab", "ab"]),
+        filter=np.array(["ztfr", "ztfg", "ztfr"]),
+    )
+
+    _, cfg = load_env()
+    response = session.post(
+        f'http://localhost:{cfg["ports.app"]}/api/photometry/columnar',
+        params={'format': 'npz', 'group_ids': str(public_group.id)},
+        data=buffer.getvalue(),
+        headers={'Authorization': f'token {upload_data_token}'},
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert data['status'] == 'success'
+    ids = data['data']['ids']
+    assert len(ids) == 3
+
+    status, data = api('GET', f'photometry/{ids[0]}', token=upload_data_token)
+    assert status == 200
+    assert data['status'] == 'success'
+    np.testing.assert_allclose(data['data']['mag'], 19.2)
+
+    status, data = api('GET', f'photometry/{ids[2]}', token=upload_data_token)
+    assert status == 200
+    assert data['data']['mag'] is None
+    np.testing.assert_allclose(data['data']['limiting_mag'], 20.2)
+
+
+def post_columnar_photometry(columns, format, group_id, token):
+    buffer = io.BytesIO()
+    if format == 'npz':
+        np.savez(buffer, **columns)
+    elif format == 'parquet':
+        pd.DataFrame(columns).to_parquet(buffer)
+    else:
+        pd.DataFrame(columns).to_feather(buffer)
+
+    response = session.post(
+        f'http://localhost:{cfg["ports.app"]}/api/photometry/columnar',
+        params={'format': format, 'group_ids': str(group_id)},
+        data=buffer.getvalue(),
+        headers={'Authorization': f'token {token}'},
+    )
+    return response.status_code, response.json()
+
+
+def test_token_user_post_parquet_and_arrow_photometry_data(
+    upload_data_token, public_source, public_group, ztf_camera
+):
+    for i, format in enumerate(['parquet', 'arrow']):
+        mjd = 59310.0 + 10 * i
+        status, data = post_columnar_photometry(
+            {
+                'obj_id': [str(public_source.id)] * 2,
+                'instrument_id': [ztf_camera.id] * 2,
+                'mjd': [mjd, mjd + 1],
+                'flux': [12.24, None],
+                'fluxerr': [0.031, 0.029],
+                'zp': [25.0, 25.0],
+                'magsys': ['ab', 'ab'],
+                'filter': ['ztfg', 'ztfr'],
+            },
+            format,
+            public_group.id,
+            upload_data_token,
+        )
+        assert status == 200
+        assert data['status'] == 'success'
+        ids = data['data']['ids']
+        assert len(ids) == 2
+
+        status, data = api(
+            'GET', f'photometry/{ids[0]}?format=flux', token=upload_data_token
+        )
+        assert status == 200
+        np.testing.assert_allclose(data['data']['flux'], 12.24)
+        assert data['data']['mjd'] == mjd
+
+        status, data = api(
+            'GET', f'photometry/{ids[1]}?format=flux', token=upload_data_token
+        )
+        assert status == 200
+        assert data['data']['flux'] is None
+
+
+def test_token_user_post_columnar_photometry_invalid_values(
+    upload_data_token, public_source, public_group, ztf_camera
+):
+    for format in ['npz', 'parquet', 'arrow']:
+        for key, value in [('magsys', 'not_a_magsys'), ('filter', 'not_a_filter')]:
+            columns = {
+                'obj_id': [str(public_source.id)] * 2,
+                'instrument_id': [ztf_camera.id] * 2,
+                'mjd': [59320.0, 59321.0],
+                'mag': [19.2, 19.3],
+                'magerr': [0.05, 0.06],
+                'limiting_mag': [20.0, 20.1],
+                'magsys': ['ab', 'ab'],
+                'filter': ['ztfr', 'ztfg'],
+            }
+            columns[key] = [columns[key][0], value]
+            status, data = post_columnar_photometry(
+                columns, format, public_group.id, upload_data_token
+            )
+            assert status == 400
+            assert data['status'] == 'error'
+            assert f'Invalid {key} "{value}"' in data['message']
+
+
 def test_token_user_post_put_photometry_data(
     upload_data_token, public_source, public_group, ztf_camera
 ):
@@ -221,6 +410,82 @@ def test_token_user_post_put_photometry_data(
     assert len(set(new_ids).intersection(set(ids))) == 1
 
 
+def test_post_photometry_duplicated_within_upload(
+    upload_data_token, public_source, public_group, ztf_camera
+):
+    payload = {
+        'obj_id': str(public_source.id),
+        'instrument_id': ztf_camera.id,
+        "mjd": [59600, 59601, 59600],
+        "mag": [19.2, 19.3, 19.2],
+        "magerr": [0.05, 0.06, 0.05],
+        "limiting_mag": [20.0, 20.1, 20.0],
+        "magsys": ["ab", "ab", "ab"],
+        "filter": ["ztfr", "ztfr", "ztfr"],
+        "origin": [None, None, None],
+        'group_ids': [public_group.id],
+    }
+
+    # The repeated points are reported, and nothing is inserted
+    status, data = api('POST', 'photometry', data=payload, token=upload_data_token)
+    assert status == 400
+    assert 'duplicated within the upload (rows [0, 2])' in data['message']
+    assert "'mjd': 59600" in data['message']
+    assert "'mjd': 59601" not in data['message']
+
+    status, data = api(
+        'GET',
+        f'sources/{public_source.id}/photometry',
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert not any(point['mjd'] in (59600, 59601) for point in data['data'])
+
+    # PUT skips the repeated point and returns its ID for both rows
+    status, data = api('PUT', 'photometry', data=payload, token=upload_data_token)
+    assert status == 200
+    ids = data['data']['ids']
+    assert ids[0] == ids[2]
+    assert len(set(ids)) == 2
+
+
+def test_concurrent_put_photometry_data(
+    upload_data_token, public_source, public_group, ztf_camera
+):
+    payload = {
+        'obj_id': str(public_source.id),
+        'instrument_id': ztf_camera.id,
+        "mjd": [59500, 59501, 59502],
+        "mag": [19.2, 19.3, np.random.uniform(19, 20)],
+        "magerr": [0.05, 0.06, np.random.uniform(0.01, 0.1)],
+        "limiting_mag": [20.0, 20.1, 20.2],
+        "magsys": ["ab", "ab", "ab"],
+        "filter": ["ztfr", "ztfg", "ztfr"],
+        "origin": [None, "lol", "lol"],
+        'group_ids': [public_group.id],
+    }
+
+    # Uploads of the same points racing each other should all succeed and
+    # resolve to the same photometry rows
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(
+            executor.map(
+                lambda _: api(
+                    'PUT', 'photometry', data=payload, token=upload_data_token
+                ),
+                range(4),
+            )
+        )
+
+    for status, data in results:
+        assert status == 200
+        assert data['status'] == 'success'
+
+    ids = [data["data"]["ids"] for _, data in results]
+    assert all(i == ids[0] for i in ids)
+    assert len(set(ids[0])) == 3
+
+
 def test_token_user_post_put_get_photometry_data(
     upload_data_token_two_groups, public_source, public_group, public_group2, ztf_camera
 ):
@@ -1493,6 +1758,72 @@ def test_token_user_get_range_photometry(
     assert len(data['data']) == 2
 
 
+def test_token_user_stream_and_paginate_range_photometry(
+    upload_data_token, public_source, public_group, ztf_camera
+):
+    status, data = api(
+        'POST',
+        'photometry',
+        data={
+            'obj_id': str(public_source.id),
+            'mjd': [58000.0, 58500.0, 59000.0],
+            'instrument_id': ztf_camera.id,
+            'flux': 12.24,
+            'fluxerr': 0.031,
+            'zp': 25.0,
+            'magsys': 'ab',
+            'filter': 'ztfg',
+            'group_ids': [public_group.id],
+        },
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert data['status'] == 'success'
+    ids = sorted(data['data']['ids'])
+
+    status, data = api(
+        'GET',
+        f'photometry/range?numPerPage=2&afterId={ids[0] - 1}',
+        token=upload_data_token,
+        data={'instrument_ids': [ztf_camera.id]},
+    )
+    assert status == 200
+    assert data['status'] == 'success'
+    assert [p['id'] for p in data['data']] == ids[:2]
+
+    status, data = api(
+        'GET',
+        f'photometry/range?numPerPage=2&afterId={ids[1]}',
+        token=upload_data_token,
+        data={'instrument_ids': [ztf_camera.id]},
+    )
+    assert status == 200
+    assert [p['id'] for p in data['data']] == ids[2:]
+
+    response = api(
+        'GET',
+        'photometry/range?streamFormat=ndjson&format=flux',
+        token=upload_data_token,
+        data={'instrument_ids': [ztf_camera.id]},
+        raw_response=True,
+    )
+    assert response.status_code == 200
+    points = [json.loads(line) for line in response.text.splitlines()]
+    assert [p['id'] for p in points] == ids
+    assert all(p['instrument_id'] == ztf_camera.id for p in points)
+
+    response = api(
+        'GET',
+        f'photometry/range?streamFormat=csv&afterId={ids[0]}',
+        token=upload_data_token,
+        data={'instrument_ids': [ztf_camera.id]},
+        raw_response=True,
+    )
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row['id']) for row in rows] == ids[1:]
+
+
 def test_reject_photometry_inf(
     upload_data_token, public_source, public_group, ztf_camera
 ):
@@ -2675,3 +3006,540 @@ def test_post_external_photometry(
 
     assert all(p['obj_id'] == obj_id for p in data["data"]["photometry"])
     assert all(p['instrument_id'] == instrument_id for p in data["data"]["photometry"])
+
+
+def test_photometry_filter_validation_follows_instrument_updates(
+    super_admin_token, upload_data_token, public_source, public_group
+):
+    name = str(uuid.uuid4())
+    status, data = api(
+        'POST',
+        'telescope',
+        data={
+            'name': name,
+            'nickname': name,
+            'lat': 0.0,
+            'lon': 0.0,
+            'elevation': 0.0,
+            'diameter': 10.0,
+        },
+        token=super_admin_token,
+    )
+    assert status == 200
+    telescope_id = data['data']['id']
+
+    status, data = api(
+        'POST',
+        'instrument',
+        data={
+            'name': str(uuid.uuid4()),
+            'type': 'imager',
+            'band': 'optical',
+            'filters': ['ztfg'],
+            'telescope_id': telescope_id,
+        },
+        token=super_admin_token,
+    )
+    assert status == 200
+    instrument_id = data['data']['id']
+
+    def post_photometry(filter):
+        return api(
+            'POST',
+            'photometry',
+            data={
+                'obj_id': str(public_source.id),
+                'mjd': [58000.0, 58001.0],
+                'instrument_id': instrument_id,
+                'flux': [12.24, 13.1],
+                'fluxerr': [0.031, 0.04],
+                'zp': 25.0,
+                'magsys': 'ab',
+                'filter': filter,
+                'group_ids': [public_group.id],
+            },
+            token=upload_data_token,
+        )
+
+    status, data = post_photometry('ztfg')
+    assert status == 200
+    assert data['status'] == 'success'
+
+    status, data = post_photometry('ztfr')
+    assert status == 400
+    assert 'has no filter ztfr' in data['message']
+
+    status, data = api(
+        'PUT',
+        f'instrument/{instrument_id}',
+        data={'filters': ['ztfg', 'ztfr']},
+        token=super_admin_token,
+    )
+    assert status == 200
+
+    # the cached instrument metadata must not keep rejecting the new filter
+    status, data = post_photometry('ztfr')
+    assert status == 200
+    assert data['status'] == 'success'
+
+
+def test_post_photometry_invalid_obj_id(upload_data_token, public_group, ztf_camera):
+    status, data = api(
+        'POST',
+        'photometry',
+        data={
+            'obj_id': [str(uuid.uuid4()), str(uuid.uuid4())],
+            'mjd': [58000.0, 58001.0],
+            'instrument_id': ztf_camera.id,
+            'flux': [12.24, 13.1],
+            'fluxerr': [0.031, 0.04],
+            'zp': 25.0,
+            'magsys': 'ab',
+            'filter': 'ztfg',
+            'group_ids': [public_group.id],
+        },
+        token=upload_data_token,
+    )
+    assert status == 400
+    assert 'Invalid object ID' in data['message']
+
+
+def wait_for_photometry_upload(upload_id, token, timeout=30):
+    for _ in range(timeout):
+        status, data = api('GET', f'photometry/uploads/{upload_id}', token=token)
+        assert status == 200
+        if data['data']['status'] in ('complete', 'failed'):
+            return data['data']
+        time.sleep(1)
+    raise AssertionError(f'Photometry upload {upload_id} did not finish')
+
+
+def test_token_user_post_photometry_async(
+    upload_data_token, view_only_token2, public_source, public_group, ztf_camera
+):
+    n_points = 50
+    status, data = api(
+        'POST',
+        'photometry?async=true',
+        data={
+            'obj_id': str(public_source.id),
+            'mjd': [59000.0 + i for i in range(n_points)],
+            'instrument_id': ztf_camera.id,
+            'flux': [12.24] * n_points,
+            'fluxerr': [0.031] * n_points,
+            'zp': 25.0,
+            'magsys': 'ab',
+            'filter': 'ztfg',
+            'group_ids': [public_group.id],
+        },
+        token=upload_data_token,
+    )
+    assert status == 202
+    assert data['status'] == 'success'
+    upload_id = data['data']['upload_id']
+
+    upload = wait_for_photometry_upload(upload_id, upload_data_token)
+    assert upload['status'] == 'complete'
+    assert upload['n_rows'] == n_points
+    assert upload['n_inserted'] == n_points
+    assert upload['error'] is None
+
+    status, data = api(
+        'GET',
+        f'sources/{public_source.id}/photometry',
+        params={'format': 'flux'},
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert (
+        len([p for p in data['data'] if p['mjd'] >= 59000 and p['mjd'] < 59050])
+        == n_points
+    )
+
+    # only the uploader can see the status of the upload
+    status, data = api('GET', f'photometry/uploads/{upload_id}', token=view_only_token2)
+    assert status == 404
+
+
+def test_recover_interrupted_photometry_uploads(
+    upload_data_token,
+    user,
+    public_source_no_data,
+    public_group,
+    ztf_camera,
+    monkeypatch,
+):
+    monkeypatch.setattr(photometry_handlers, 'PHOTOMETRY_INGESTION_CHUNK_SIZE', 2)
+    obj_id = str(public_source_no_data.id)
+    long_ago = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    n_points = 5
+    # The process running the first upload, on another host, stopped after
+    # committing its first chunk; the second one was queued before payloads
+    # were stored
+    interrupted, unresumable = [
+        PhotometryUpload(
+            upload_id=str(uuid.uuid4()),
+            owner_id=user.id,
+            status=status,
+            n_rows=n_points,
+            n_inserted=n_inserted,
+            payload=payload,
+            worker='another-host:1234',
+        )
+        for status, n_inserted, payload in [
+            (
+                'running',
+                2,
+                {
+                    'data': {
+                        'obj_id': obj_id,
+                        'mjd': [59000.0 + i for i in range(n_points)],
+                        'instrument_id': ztf_camera.id,
+                        'flux': [12.24] * n_points,
+                        'fluxerr': [0.031] * n_points,
+                        'zp': 25.0,
+                        'magsys': 'ab',
+                        'filter': 'ztfg',
+                    },
+                    'group_ids': [public_group.id],
+                    'stream_ids': [],
+                },
+            ),
+            ('queued', None, None),
+        ]
+    ]
+    DBSession().add_all([interrupted, unresumable])
+    DBSession().commit()
+    DBSession().execute(
+        sa.update(PhotometryUpload)
+        .where(
+            PhotometryUpload.upload_id.in_(
+                [interrupted.upload_id, unresumable.upload_id]
+            )
+        )
+        .values(modified=long_ago)
+    )
+    DBSession().commit()
+
+    requeued = photometry_handlers.recover_photometry_uploads()
+    assert interrupted.upload_id in requeued
+    assert unresumable.upload_id not in requeued
+
+    upload = wait_for_photometry_upload(interrupted.upload_id, upload_data_token)
+    assert upload['status'] == 'complete'
+    assert upload['n_inserted'] == n_points
+    assert 'payload' not in upload
+
+    # the points of the committed chunk are not inserted again
+    status, data = api(
+        'GET',
+        f'sources/{obj_id}/photometry',
+        params={'format': 'flux'},
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert sorted(p['mjd'] for p in data['data']) == [59002.0, 59003.0, 59004.0]
+
+    upload = wait_for_photometry_upload(unresumable.upload_id, upload_data_token)
+    assert upload['status'] == 'failed'
+    assert 'interrupted' in upload['error']
+
+
+def queue_photometry_upload(user, payload, n_rows):
+    upload = PhotometryUpload(
+        upload_id=str(uuid.uuid4()),
+        owner_id=user.id,
+        status='queued',
+        n_rows=n_rows,
+        payload=payload,
+        worker=photometry_handlers.PHOTOMETRY_INGESTION_WORKER,
+    )
+    DBSession().add(upload)
+    DBSession().commit()
+    return upload.upload_id
+
+
+def test_async_photometry_upload_checked_before_first_chunk(
+    upload_data_token,
+    user,
+    public_source_no_data,
+    public_group,
+    ztf_camera,
+    monkeypatch,
+):
+    monkeypatch.setattr(photometry_handlers, 'PHOTOMETRY_INGESTION_CHUNK_SIZE', 2)
+    obj_id = str(public_source_no_data.id)
+    point = {
+        'obj_id': obj_id,
+        'instrument_id': ztf_camera.id,
+        'fluxerr': 0.031,
+        'zp': 25.0,
+        'magsys': 'ab',
+        'filter': 'ztfg',
+    }
+    status, data = api(
+        'POST',
+        'photometry',
+        data={**point, 'mjd': 59104.0, 'flux': 12.24, 'group_ids': [public_group.id]},
+        token=upload_data_token,
+    )
+    assert status == 200
+
+    # The last point, in the third chunk, already exists
+    n_points = 5
+    upload_id = queue_photometry_upload(
+        user,
+        {
+            'data': {
+                **point,
+                'mjd': [59100.0 + i for i in range(n_points)],
+                'flux': [12.24] * n_points,
+            },
+            'group_ids': [public_group.id],
+            'stream_ids': [],
+        },
+        n_points,
+    )
+    photometry_handlers.photometry_ingestion_executor.submit(
+        photometry_handlers.ingest_photometry, upload_id
+    ).result()
+
+    upload = wait_for_photometry_upload(upload_id, upload_data_token)
+    assert upload['status'] == 'failed'
+    assert 'already exists' in upload['error']
+    assert not upload['n_inserted']
+
+    # Nothing was inserted, so the upload can be fixed and sent again
+    status, data = api(
+        'GET',
+        f'sources/{obj_id}/photometry',
+        params={'format': 'flux'},
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert [p['mjd'] for p in data['data']] == [59104.0]
+
+
+def test_failed_async_photometry_upload_taken_over(
+    upload_data_token,
+    user,
+    public_source_no_data,
+    public_group,
+    ztf_camera,
+    monkeypatch,
+):
+    upload_id = queue_photometry_upload(
+        user,
+        {
+            'data': {
+                'obj_id': str(public_source_no_data.id),
+                'mjd': 59200.0,
+                'instrument_id': ztf_camera.id,
+                'flux': 12.24,
+                'fluxerr': 0.031,
+                'zp': 25.0,
+                'magsys': 'ab',
+                'filter': 'ztfg',
+            },
+            'group_ids': [public_group.id],
+            'stream_ids': [],
+        },
+        1,
+    )
+
+    # Another process takes the upload over while this one is running it
+    def take_over_and_fail(*args, **kwargs):
+        with DBSession.session_factory() as session:
+            session.execute(
+                sa.update(PhotometryUpload)
+                .where(PhotometryUpload.upload_id == upload_id)
+                .values(worker='another-host:1234')
+            )
+            session.commit()
+        raise ValueError('interrupted')
+
+    monkeypatch.setattr(
+        photometry_handlers, 'validate_new_photometry', take_over_and_fail
+    )
+    photometry_handlers.photometry_ingestion_executor.submit(
+        photometry_handlers.ingest_photometry, upload_id
+    ).result()
+
+    # The displaced process does not mark the upload as failed
+    upload = (
+        DBSession()
+        .execute(
+            sa.select(PhotometryUpload).where(PhotometryUpload.upload_id == upload_id)
+        )
+        .scalar_one()
+    )
+    DBSession().refresh(upload)
+    assert upload.status == 'running'
+    assert upload.worker == 'another-host:1234'
+    assert upload.error is None
+
+
+def test_token_user_post_photometry_async_errors(
+    upload_data_token, public_group, ztf_camera
+):
+    # malformed uploads are rejected before being queued
+    status, data = api(
+        'POST',
+        'photometry?async=true',
+        data={'mjd': [59000.0], 'group_ids': [public_group.id]},
+        token=upload_data_token,
+    )
+    assert status == 400
+    assert 'Invalid input format' in data['message']
+
+    # errors found while processing are reported in the upload status
+    status, data = api(
+        'POST',
+        'photometry?async=true',
+        data={
+            'obj_id': str(uuid.uuid4()),
+            'mjd': 59000.0,
+            'instrument_id': ztf_camera.id,
+            'flux': 12.24,
+            'fluxerr': 0.031,
+            'zp': 25.0,
+            'magsys': 'ab',
+            'filter': 'ztfg',
+            'group_ids': [public_group.id],
+        },
+        token=upload_data_token,
+    )
+    assert status == 202
+    upload = wait_for_photometry_upload(data['data']['upload_id'], upload_data_token)
+    assert upload['status'] == 'failed'
+    assert 'Invalid object ID' in upload['error']
+    assert upload['n_inserted'] is None
+
+
+def test_periodogram_annotation_and_phase_folding(
+    upload_data_token, view_only_token, public_source_no_data, ztf_camera
+):
+    obj_id = str(public_source_no_data.id)
+    period = 0.731
+    n_points = 100
+    mjd = np.sort(np.random.default_rng(0).uniform(59000, 59060, n_points)).tolist()
+    status, data = api(
+        'POST',
+        'photometry',
+        data={
+            'obj_id': obj_id,
+            'mjd': mjd,
+            'instrument_id': ztf_camera.id,
+            'flux': [100 + 20 * np.sin(2 * np.pi * t / period) for t in mjd],
+            'fluxerr': 1.0,
+            'zp': 25.0,
+            'magsys': 'ab',
+            'filter': ['ztfg', 'ztfr'] * (n_points // 2),
+        },
+        token=upload_data_token,
+    )
+    assert status == 200
+
+    status, data = api(
+        'GET',
+        f'sources/{obj_id}/photometry',
+        params={'phaseFoldData': True},
+        token=upload_data_token,
+    )
+    assert status == 400
+    assert 'No period' in data['message']
+
+    status, data = api(
+        'POST',
+        'periodogram',
+        data={'obj_ids': [obj_id], 'minPeriod': 0.5, 'maxPeriod': 2.0},
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert data['data']['obj_ids'] == [obj_id]
+
+    for _ in range(30):
+        status, data = api(
+            'GET', f'sources/{obj_id}/annotations', token=view_only_token
+        )
+        assert status == 200
+        annotations = [
+            a for a in data['data'] if a['origin'] == 'skyportal_periodogram'
+        ]
+        if len(annotations) > 0:
+            break
+        time.sleep(1)
+    else:
+        raise AssertionError('Periodogram annotation was not created')
+    found_period = annotations[0]['data']['period']
+    assert np.isclose(found_period, period, rtol=1e-2)
+    assert 'period_ztfg' in annotations[0]['data']
+
+    status, data = api(
+        'GET',
+        f'sources/{obj_id}/photometry',
+        params={'phaseFoldData': True},
+        token=upload_data_token,
+    )
+    assert status == 200
+    for point in data['data']:
+        assert np.isclose(
+            point['phase'], np.mod(point['mjd'], found_period) / found_period
+        )
+
+
+def test_periodogram_skips_annotations_of_other_users(
+    upload_data_token, annotation_token_two_groups, public_source, public_group
+):
+    obj_id = str(public_source.id)
+    status, data = api(
+        'POST',
+        f'sources/{obj_id}/annotations',
+        data={
+            'origin': 'skyportal_periodogram',
+            'data': {'period': 1.0},
+            'group_ids': [public_group.id],
+        },
+        token=annotation_token_two_groups,
+    )
+    assert status == 200
+    annotation_id = data['data']['annotation_id']
+
+    status, data = api(
+        'POST', 'periodogram', data={'obj_ids': [obj_id]}, token=upload_data_token
+    )
+    assert status == 200
+    assert data['data']['obj_ids'] == []
+    assert data['data']['skipped_obj_ids'] == [obj_id]
+
+    status, data = api(
+        'GET',
+        f'sources/{obj_id}/annotations/{annotation_id}',
+        token=annotation_token_two_groups,
+    )
+    assert status == 200
+    assert data['data']['data'] == {'period': 1.0}
+
+
+def test_periodogram_errors(upload_data_token, public_source):
+    status, data = api(
+        'POST', 'periodogram', data={'obj_ids': []}, token=upload_data_token
+    )
+    assert status == 400
+
+    status, data = api(
+        'POST',
+        'periodogram',
+        data={'obj_ids': [public_source.id, 'not_an_obj']},
+        token=upload_data_token,
+    )
+    assert status == 400
+    assert 'not_an_obj' in data['message']
+
+    status, data = api(
+        'POST',
+        'periodogram',
+        data={'obj_ids': [public_source.id], 'minPeriod': 2, 'maxPeriod': 1},
+        token=upload_data_token,
+    )
+    assert status == 400
@@ -1,4 +1,7 @@
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import healpix_alchemy as ha
 import numpy.testing as npt
 import numpy as np
@@ -6,8 +9,26 @@ import arrow
 from tdtax import taxonomy, __version__
 import astropy.units as u
 
-from skyportal.tests import api
-from skyportal.models import cosmo
+from skyportal.tests import api, count_statements
+from skyportal.tests.fixtures import ObjFactory
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from skyportal.models import (
+    cosmo,
+    DBSession,
+    Group,
+    Obj,
+    ObjDetectionSummary,
+    ObjDuplicate,
+    Photometry,
+    Source,
+)
+from skyportal.models.detection_summary import detection_summary_statement
+from skyportal.handlers.api.source import (
+    serialize_source_detail,
+    serialize_sources_page,
+)
 
 from datetime import datetime, timezone, timedelta
 from dateutil import parser
@@ -28,6 +49,79 @@ def test_source_existence(view_only_token, public_source):
     assert status == 404
 
 
+def test_source_page_query_count_independent_of_page_size(user, public_group):
+    objs = []
+    for _ in range(4):
+        obj = ObjFactory(groups=[public_group])
+        DBSession.add(Source(obj_id=obj.id, group_id=public_group.id))
+        objs.append(obj)
+    DBSession.commit()
+
+    try:
+        counts = []
+        for page in [objs[:1], objs]:
+            # start from the same session state on each page, with the page
+            # loaded beforehand as the page query itself would
+            DBSession().expire_all()
+            page = (
+                DBSession()
+                .query(Obj)
+                .filter(Obj.id.in_([obj.id for obj in page]))
+                .order_by(Obj.id)
+                .all()
+            )
+            sources, count = count_statements(
+                serialize_sources_page,
+                page,
+                user,
+                include_comments=True,
+                include_thumbnails=True,
+                include_photometry=True,
+                include_photometry_exists=True,
+                include_spectrum_exists=True,
+                include_period_exists=True,
+                include_color_mag=True,
+            )
+            assert [s['id'] for s in sources] == [obj.id for obj in page]
+            for source in sources:
+                assert len(source['comments']) > 0
+                assert len(source['thumbnails']) > 0
+                assert len(source['photometry']) > 0
+                assert source['photometry_exists']
+                assert source['spectrum_exists']
+                assert [g['id'] for g in source['groups']] == [public_group.id]
+            counts.append(count)
+        assert counts[0] == counts[1]
+    finally:
+        for obj in objs:
+            ObjFactory.teardown(obj)
+
+
+def test_source_detail_query_count_independent_of_groups(
+    user_two_groups, public_source, public_source_two_groups
+):
+    counts = []
+    for obj in [public_source, public_source_two_groups]:
+        DBSession().expire_all()
+        obj = DBSession().query(Obj).get(obj.id)
+        source, count = count_statements(
+            serialize_source_detail,
+            obj,
+            user_two_groups,
+            include_comments=True,
+            include_photometry_exists=True,
+            include_spectrum_exists=True,
+            include_period_exists=True,
+            include_detection_stats=True,
+        )
+        assert source['photometry_exists']
+        assert source['spectrum_exists']
+        assert len(source['groups']) > 0
+        assert all('saved_at' in group for group in source['groups'])
+        counts.append(count)
+    assert counts[0] == counts[1]
+
+
 def test_token_user_retrieving_source(view_only_token, public_source):
     status, data = api("GET", f"sources/{public_source.id}", token=view_only_token)
     assert status == 200
@@ -227,6 +321,101 @@ def test_duplicate_sources(public_group, upload_data_token, ztf_camera):
     assert data["data"]["duplicates"] == [obj_id1]
 
 
+def test_duplicate_clusters_follow_position_changes(
+    upload_data_token, view_only_token, public_group
+):
+    ra, dec = np.random.uniform(0, 360), np.random.uniform(-60, 60)
+    obj_ids = [str(uuid.uuid4()) for _ in range(3)]
+    # 2.5" apart in declination: the first and last are only connected
+    # through the middle one
+    for i, obj_id in enumerate(obj_ids):
+        status, data = api(
+            "POST",
+            "sources",
+            data={
+                "id": obj_id,
+                "ra": ra,
+                "dec": dec + i * 2.5 / 3600,
+                "group_ids": [public_group.id],
+            },
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    status, data = api("GET", f"sources/{obj_ids[1]}", token=view_only_token)
+    assert status == 200
+    assert set(data["data"]["duplicates"]) == {obj_ids[0], obj_ids[2]}
+
+    status, data = api(
+        "GET", "duplicates", params={"numPerPage": 1000}, token=view_only_token
+    )
+    assert status == 200
+    assert sorted(obj_ids) in data["data"]["clusters"]
+
+    # Move the last object away
+    status, data = api(
+        "PATCH",
+        f"sources/{obj_ids[2]}",
+        data={"ra": (ra + 180) % 360, "dec": -dec},
+        token=upload_data_token,
+    )
+    assert status == 200
+
+    status, data = api("GET", f"sources/{obj_ids[2]}", token=view_only_token)
+    assert status == 200
+    assert data["data"]["duplicates"] is None
+
+    status, data = api(
+        "GET", "duplicates", params={"numPerPage": 1000}, token=view_only_token
+    )
+    assert status == 200
+    assert sorted(obj_ids[:2]) in data["data"]["clusters"]
+    assert all(obj_ids[2] not in cluster for cluster in data["data"]["clusters"])
+
+    status, data = api(
+        "GET", "duplicates", params={"numPerPage": 1001}, token=view_only_token
+    )
+    assert status == 400
+
+
+def test_concurrent_nearby_objs_are_duplicates():
+    bind = DBSession.session_factory.kw["bind"]
+    ra, dec = np.random.uniform(0, 360), np.random.uniform(-60, 60)
+    first_id, second_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    def create_second_obj():
+        with Session(bind=bind) as session:
+            # finds its neighbors when flushed
+            session.add(Obj(id=second_id, ra=ra, dec=dec + 1 / 3600))
+            session.commit()
+
+    # Two nearby objects created by overlapping transactions, each unaware of
+    # the object of the other
+    with Session(bind=bind) as first, ThreadPoolExecutor(max_workers=1) as executor:
+        first.add(Obj(id=first_id, ra=ra, dec=dec))
+        first.flush()
+        second = executor.submit(create_second_obj)
+        time.sleep(1)
+        # The second search waits for the first transaction
+        assert not second.done()
+        first.commit()
+        second.result()
+
+    try:
+        pairs = DBSession().execute(
+            sa.select(ObjDuplicate.obj_id, ObjDuplicate.duplicate_obj_id).where(
+                ObjDuplicate.obj_id.in_([first_id, second_id])
+            )
+        )
+        assert {tuple(pair) for pair in pairs} == {
+            (first_id, second_id),
+            (second_id, first_id),
+        }
+    finally:
+        DBSession().execute(sa.delete(Obj).where(Obj.id.in_([first_id, second_id])))
+        DBSession().commit()
+
+
 def test_token_user_update_source(upload_data_token, public_source):
     status, data = api(
         "PATCH",
@@ -824,6 +1013,120 @@ def test_source_photometry_summary_info(
     assert data["data"]["peak_detected_mag"] == mag1_ab
 
 
+def test_source_detection_stats_follow_photometry_changes(
+    upload_data_token, view_only_token, public_source_no_data, ztf_camera, public_group
+):
+    status, data = api(
+        'POST',
+        'photometry',
+        data={
+            'obj_id': str(public_source_no_data.id),
+            'mjd': [58001.0, 58002.0],
+            'instrument_id': ztf_camera.id,
+            'flux': [13.24, 15.24],
+            'fluxerr': [0.031, 0.031],
+            'filter': ['ztfg', 'ztfg'],
+            'zp': [25.0, 25.0],
+            'magsys': ['ab', 'ab'],
+            'group_ids': [public_group.id],
+        },
+        token=upload_data_token,
+    )
+    assert status == 200
+    assert data["status"] == "success"
+    first_id, second_id = data["data"]["ids"]
+
+    status, data = api('DELETE', f'photometry/{second_id}', token=upload_data_token)
+    assert status == 200
+
+    status, data = api(
+        "GET",
+        f"sources/{public_source_no_data.id}",
+        params={"includeDetectionStats": "true"},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert (
+        data["data"]["last_detected_at"]
+        == arrow.get((58001.0 - 40_587) * 86400.0).isoformat()
+    )
+
+    status, data = api('DELETE', f'photometry/{first_id}', token=upload_data_token)
+    assert status == 200
+
+    status, data = api(
+        "GET",
+        f"sources/{public_source_no_data.id}",
+        params={"includeDetectionStats": "true"},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert data["data"]["last_detected_at"] is None
+    assert data["data"]["peak_detected_mag"] is None
+
+
+def test_concurrent_uploads_refresh_detection_summary(
+    user, public_source_no_data, ztf_camera, public_group
+):
+    obj_id = public_source_no_data.id
+    bind = DBSession.session_factory.kw["bind"]
+
+    def add_detection(session, mjd, flux):
+        session.add(
+            Photometry(
+                obj_id=obj_id,
+                instrument_id=ztf_camera.id,
+                mjd=mjd,
+                flux=flux,
+                fluxerr=0.1,
+                filter='ztfg',
+                origin=uuid.uuid4().hex,
+                owner_id=user.id,
+                groups=[session.get(Group, public_group.id)],
+            )
+        )
+        # refreshes the summary of the object
+        session.flush()
+
+    def upload_earlier_detection():
+        with Session(bind=bind) as session:
+            add_detection(session, 58001.0, 20.0)
+            session.commit()
+
+    # The first summary of the object is computed by two overlapping
+    # transactions, each unaware of the photometry of the other
+    with Session(bind=bind) as first, ThreadPoolExecutor(max_workers=1) as executor:
+        add_detection(first, 58002.0, 30.0)
+        second = executor.submit(upload_earlier_detection)
+        time.sleep(1)
+        # The second refresh waits for the first transaction
+        assert not second.done()
+        first.commit()
+        second.result()
+
+    DBSession().expire_all()
+    summary = (
+        DBSession()
+        .execute(
+            sa.select(ObjDetectionSummary).where(
+                ObjDetectionSummary.obj_id == obj_id,
+                ObjDetectionSummary.group_id == public_group.id,
+            )
+        )
+        .scalar_one()
+    )
+    (expected,) = [
+        row
+        for row in DBSession().execute(detection_summary_statement([obj_id]))
+        if row.group_id == public_group.id
+    ]
+    assert summary.last_detected_mjd == 58002.0
+    assert summary.last_detected_mjd == expected.last_detected_mjd
+    assert summary.last_detected_mag == expected.last_detected_mag
+    assert summary.peak_detected_mjd == expected.peak_detected_mjd
+    assert summary.peak_detected_mag == expected.peak_detected_mag
+
+
 def test_sources_include_detection_stats(
     upload_data_token,
     super_admin_token,
@@ -1489,6 +1792,61 @@ def test_sources_filter_by_redshift(upload_data_token, view_only_token, public_g
     assert data["data"]["sources"][0]["id"] == obj_id2
 
 
+def test_sources_filter_by_galactic_latitude(
+    upload_data_token, view_only_token, public_group
+):
+    # Near the Galactic center and the north Galactic pole
+    in_plane_id = str(uuid.uuid4())
+    high_lat_id = str(uuid.uuid4())
+    for obj_id, ra, dec in [
+        (in_plane_id, 266.40, -28.94),
+        (high_lat_id, 192.86, 27.13),
+    ]:
+        status, data = api(
+            "POST",
+            "sources",
+            data={"id": obj_id, "ra": ra, "dec": dec, "group_ids": [public_group.id]},
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    status, data = api("GET", f"sources/{in_plane_id}", token=view_only_token)
+    assert status == 200
+    assert abs(data["data"]["gal_lat"]) < 0.1
+    assert abs(data["data"]["gal_lon"] - 359.94) < 0.1
+
+    status, data = api(
+        "GET",
+        "sources",
+        params={"minGalLat": 85, "group_ids": f"{public_group.id}"},
+        token=view_only_token,
+    )
+    assert status == 200
+    obj_ids = {source["id"] for source in data["data"]["sources"]}
+    assert high_lat_id in obj_ids
+    assert in_plane_id not in obj_ids
+
+    status, data = api(
+        "GET",
+        "sources",
+        params={"maxGalLat": 0.5, "group_ids": f"{public_group.id}"},
+        token=view_only_token,
+    )
+    assert status == 200
+    obj_ids = {source["id"] for source in data["data"]["sources"]}
+    assert in_plane_id in obj_ids
+    assert high_lat_id not in obj_ids
+
+    status, data = api(
+        "GET",
+        "sources",
+        params={"minGalLat": "north", "group_ids": f"{public_group.id}"},
+        token=view_only_token,
+    )
+    assert status == 400
+    assert "minGalLat" in data["message"]
+
+
 def test_sources_filter_by_peak_mag(
     upload_data_token, view_only_token, public_group, ztf_camera
 ):
@@ -2027,3 +2385,85 @@ def test_token_user_retrieving_source_with_period_exists(
     assert status == 200
     assert data["status"] == "success"
     assert data["data"]['period_exists']
+
+
+def test_source_list_cursor_pagination(
+    upload_data_token, view_only_token, public_group
+):
+    prefix = uuid.uuid4().hex[:10]
+    obj_ids = [f"{prefix}_{i}" for i in range(5)]
+    for i, obj_id in enumerate(obj_ids):
+        status, data = api(
+            "POST",
+            "sources",
+            data={
+                "id": obj_id,
+                "ra": 234.22 + i,
+                "dec": -22.33,
+                "redshift": 0.1 if i % 2 else None,
+                "group_ids": [public_group.id],
+            },
+            token=upload_data_token,
+        )
+        assert status == 200
+
+    for sort_by, sort_order, expected in [
+        ("id", "asc", obj_ids),
+        ("ra", "desc", obj_ids[::-1]),
+        # ties are broken by ID, and nulls come last
+        ("redshift", "asc", obj_ids[1::2] + obj_ids[0::2]),
+    ]:
+        params = {
+            "sourceID": prefix,
+            "sortBy": sort_by,
+            "sortOrder": sort_order,
+            "numPerPage": 2,
+            "useCursor": True,
+        }
+        ids = []
+        for _ in range(3):
+            status, data = api("GET", "sources", params=params, token=view_only_token)
+            assert status == 200
+            ids.extend(s["id"] for s in data["data"]["sources"])
+            params["cursor"] = data["data"]["nextCursor"]
+            if params["cursor"] is None:
+                break
+        assert ids == expected
+        assert params["cursor"] is None
+
+    status, data = api(
+        "GET",
+        "sources",
+        params={"sourceID": prefix, "useCursor": True, "includeTotalMatches": True},
+        token=view_only_token,
+    )
+    assert status == 200
+    assert data["data"]["totalMatches"] == 5
+
+    # A cursor cannot be reused with a different sort
+    status, data = api(
+        "GET",
+        "sources",
+        params={"sourceID": prefix, "numPerPage": 2, "useCursor": True},
+        token=view_only_token,
+    )
+    status, data = api(
+        "GET",
+        "sources",
+        params={
+            "sourceID": prefix,
+            "sortBy": "ra",
+            "cursor": data["data"]["nextCursor"],
+        },
+        token=view_only_token,
+    )
+    assert status == 400
+    assert "does not match" in data["message"]
+
+    status, data = api(
+        "GET",
+        "sources",
+        params={"sourceID": prefix, "sortBy": "classification", "useCursor": True},
+        token=view_only_token,
+    )
+    assert status == 400
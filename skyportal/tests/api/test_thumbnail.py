@@ -1,8 +1,14 @@
 import os
 import uuid
 import base64
+from baselayer.app.env import load_env
 from skyportal.tests import api
 from skyportal.models import DBSession, Obj, Thumbnail
+from skyportal.models.thumbnail import (
+    classify_thumbnails_grayscale,
+    classify_unclassified_thumbnails,
+)
+from skyportal.utils.thumbnail import image_is_grayscale
 
 
 def test_token_user_post_get_thumbnail(upload_data_token, public_group, ztf_camera):
@@ -57,6 +63,78 @@ def test_token_user_post_get_thumbnail(upload_data_token, public_group, ztf_came
     )
 
 
+def test_thumbnail_classified_grayscale_after_insert(upload_data_token, public_source):
+    data = base64.b64encode(
+        open(os.path.abspath('skyportal/tests/data/14gqr_new.png'), 'rb').read()
+    )
+    status, data = api(
+        'POST',
+        'thumbnail',
+        data={'obj_id': public_source.id, 'data': data, 'ttype': 'new'},
+        token=upload_data_token,
+    )
+    assert status == 200
+    thumbnail_id = data['data']['id']
+
+    # Classification is normally done in the background after the insert
+    classify_thumbnails_grayscale([thumbnail_id])
+
+    thumbnail = DBSession().get(Thumbnail, thumbnail_id)
+    DBSession().refresh(thumbnail)
+    assert thumbnail.is_grayscale == image_is_grayscale(thumbnail.file_uri)
+
+
+def test_sweep_classifies_unclassified_thumbnails(upload_data_token, public_source):
+    data = base64.b64encode(
+        open(os.path.abspath('skyportal/tests/data/14gqr_new.png'), 'rb').read()
+    )
+    status, data = api(
+        'POST',
+        'thumbnail',
+        data={'obj_id': public_source.id, 'data': data, 'ttype': 'new'},
+        token=upload_data_token,
+    )
+    assert status == 200
+    thumbnail_id = data['data']['id']
+
+    # As if the server had stopped before the background classification
+    thumbnail = DBSession().get(Thumbnail, thumbnail_id)
+    thumbnail.is_grayscale = None
+    DBSession().commit()
+
+    assert classify_unclassified_thumbnails() >= 1
+
+    # The session of the calling thread is left untouched
+    assert thumbnail in DBSession()
+    DBSession().refresh(thumbnail)
+    assert thumbnail.is_grayscale == image_is_grayscale(thumbnail.file_uri)
+
+
+def test_missing_thumbnails_classified_not_grayscale(public_source):
+    _, cfg = load_env()
+    thumbnails = [
+        Thumbnail(
+            obj_id=public_source.id,
+            type='new',
+            file_uri=f'/tmp/{uuid.uuid4()}.png',
+        ),
+        Thumbnail(
+            obj_id=public_source.id,
+            type='ref',
+            public_url=f'http://localhost:{cfg["ports.app"]}/static/{uuid.uuid4()}.png',
+        ),
+    ]
+    DBSession().add_all(thumbnails)
+    DBSession().commit()
+    thumbnail_ids = [thumbnail.id for thumbnail in thumbnails]
+
+    # Missing images are not grayscale, rather than retried by every sweep
+    classify_thumbnails_grayscale(thumbnail_ids)
+    for thumbnail in thumbnails:
+        DBSession().refresh(thumbnail)
+        assert thumbnail.is_grayscale is False
+
+
 def test_token_user_delete_thumbnail_cascade_source(
     upload_data_token, super_admin_token, public_group, ztf_camera
 ):
@@ -1,7 +1,9 @@
+import multiprocessing
 import shutil
 import os
 import time
 from os.path import join as pjoin
+from pathlib import Path
 
 import pytest
 
@@ -93,3 +95,56 @@ def test_cache_no_max_limit(cache_parent_dir):
         cache[str(i)] = b'x'
 
     assert len(cache) == 100
+
+
+def test_cache_max_bytes(cache_parent_dir):
+    cache = Cache(pjoin(cache_parent_dir, 'cache_max_bytes'), max_bytes=10)
+    for i in range(5):
+        cache[str(i)] = b'abcd'
+    assert len(cache) == 2
+    assert cache['3'] is not None
+    assert cache['4'] is not None
+
+    # Items larger than the budget are not cached
+    cache['too_large'] = b'x' * 11
+    assert cache['too_large'] is None
+    assert len(cache) == 2
+
+
+def test_cache_sharded_layout(cache):
+    cache['some_key'] = b'abc'
+    fn = cache['some_key']
+    assert fn.parent.parent == cache._cache_dir
+    assert fn.parent.name == fn.name[:2]
+    assert fn.read_bytes() == b'abc'
+
+
+def test_cache_shared_index(cache_parent_dir):
+    cache_path = pjoin(cache_parent_dir, 'cache_shared')
+    cache = Cache(cache_path, max_items=3)
+    other = Cache(cache_path, max_items=3)
+    for i in range(3):
+        cache[str(i)] = b'x'
+    other['3'] = b'x'
+
+    assert len(cache) == 3
+    assert cache['0'] is None
+    assert other['1'] is not None
+
+
+def _fill_cache(args):
+    cache_path, prefix = args
+    cache = Cache(cache_path, max_items=50)
+    for i in range(100):
+        cache[f'{prefix}-{i}'] = b'x'
+
+
+def test_cache_concurrent_processes(cache_parent_dir):
+    cache_path = pjoin(cache_parent_dir, 'cache_concurrent')
+    with multiprocessing.Pool(4) as pool:
+        pool.map(_fill_cache, [(cache_path, prefix) for prefix in range(4)])
+
+    cache = Cache(cache_path, max_items=50)
+    assert len(cache) == 50
+    files = [f for f in Path(cache_path).glob('*/*') if f.is_file()]
+    assert len(files) == 50
@@ -1,7 +1,10 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
 from astropy import cosmology
 from astropy import units as u
 
-from skyportal.utils.cosmology import establish_cosmology
+from skyportal.utils.cosmology import establish_cosmology, DistanceGrid
 
 fallback_cosmology = cosmology.Planck18_arXiv_v2
 
@@ -34,3 +37,40 @@ def test_bad_cosmology():
 
     cosmo = establish_cosmology(cfg=cfg, fallback_cosmology=fallback_cosmology)
     assert cosmo.name == fallback_cosmology.name
+
+
+@pytest.mark.parametrize(
+    'cosmo',
+    [
+        fallback_cosmology,
+        cosmology.WMAP9,
+        cosmology.LambdaCDM(H0=65.0, Om0=0.3, Ode0=0.6),
+    ],
+)
+def test_distance_grid_agrees_with_astropy(cosmo):
+    grid = DistanceGrid(cosmo)
+    # Off the grid points, and beyond the grid on both ends
+    z = np.concatenate([np.geomspace(1.1e-4, 19.9, 997), [5e-5, 25.0]])
+
+    npt.assert_allclose(
+        grid.luminosity_distance(z),
+        cosmo.luminosity_distance(z).to_value(u.Mpc),
+        rtol=DistanceGrid.TOLERANCE,
+    )
+    npt.assert_allclose(
+        grid.angular_diameter_distance(z),
+        cosmo.angular_diameter_distance(z).to_value(u.Mpc),
+        rtol=DistanceGrid.TOLERANCE,
+    )
+    npt.assert_allclose(
+        grid.distance_modulus(z), cosmo.distmod(z).value, atol=1e-7, rtol=0
+    )
+
+
+def test_distance_grid_scalar():
+    grid = DistanceGrid(fallback_cosmology)
+    npt.assert_allclose(
+        grid.luminosity_distance(0.1),
+        fallback_cosmology.luminosity_distance(0.1).to_value(u.Mpc),
+        rtol=DistanceGrid.TOLERANCE,
+    )
@@ -0,0 +1,48 @@
+import numpy as np
+
+from skyportal.utils.periodogram import (
+    frequency_grid,
+    multiband_periodogram,
+    phase_fold,
+)
+
+
+def make_light_curve(period, n_points=200, seed=0):
+    rng = np.random.default_rng(seed)
+    mjd = np.sort(rng.uniform(59000, 59060, n_points))
+    filters = np.where(np.arange(n_points) % 2, 'ztfg', 'ztfr')
+    flux = 100 + 20 * np.sin(2 * np.pi * mjd / period) + rng.normal(0, 1, n_points)
+    return mjd, flux, np.ones(n_points), filters
+
+
+def test_frequency_grid():
+    frequency = frequency_grid(60.0, min_period=0.1, max_period=10.0)
+    assert np.isclose(frequency[0], 0.1)
+    assert np.isclose(frequency[-1], 10.0)
+    assert len(frequency_grid(60.0, max_frequencies=100)) == 100
+
+
+def test_multiband_periodogram_recovers_period():
+    period = 0.731
+    result = multiband_periodogram(*make_light_curve(period), min_period=0.1)
+    assert np.isclose(result['period'], period, rtol=1e-3)
+    assert set(result['periods']) == {'ztfg', 'ztfr'}
+    for band_period in result['periods'].values():
+        assert np.isclose(band_period, period, rtol=1e-3)
+
+
+def test_multiband_periodogram_ignores_sparse_filters():
+    mjd, flux, fluxerr, filters = make_light_curve(0.731)
+    filters[:5] = 'sdssu'
+    fluxerr[-3:] = np.nan
+    result = multiband_periodogram(mjd, flux, fluxerr, filters, min_period=0.1)
+    assert 'sdssu' not in result['periods']
+
+    assert (
+        multiband_periodogram(mjd[:15], flux[:15], fluxerr[:15], filters[:15]) is None
+    )
+
+
+def test_phase_fold():
+    phase = phase_fold([59000.0, 59000.5, 59001.25], 1.0, t0=59000.0)
+    np.testing.assert_allclose(phase, [0.0, 0.5, 0.25])
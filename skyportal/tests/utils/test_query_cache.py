@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pytest
+
+from skyportal.utils.query_cache import make_query_cache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    def make_cache(**kwargs):
+        return make_query_cache(
+            backend=request.param, path=tmp_path / 'query_cache.sqlite', **kwargs
+        )
+
+    return make_cache
+
+
+def test_query_cache_roundtrip(make_cache):
+    cache = make_cache()
+    ids = np.array(['a', 'bb', 'ccc'])
+    cache.set('query', ids)
+    np.testing.assert_array_equal(cache.get('query'), ids)
+    assert cache.get('another_query') is None
+
+    cache.set('query', ids[:1])
+    np.testing.assert_array_equal(cache.get('query'), ids[:1])
+
+
+def test_query_cache_invalidation(make_cache):
+    cache = make_cache()
+    cache.set('q1', np.array(['a']), tags=['filter:1'])
+    cache.set('q2', np.array(['b']), tags=['filter:1', 'filter:2'])
+    cache.set('q3', np.array(['c']), tags=['filter:3'])
+
+    cache.invalidate(['filter:2'])
+    assert cache.get('q1') is not None
+    assert cache.get('q2') is None
+
+    cache.invalidate(['filter:1', 'filter:4'])
+    assert cache.get('q1') is None
+    assert cache.get('q3') is not None
+    assert len(cache) == 1
+
+    cache.clear()
+    assert cache.get('q3') is None
+
+
+def test_query_cache_max_age(make_cache):
+    cache = make_cache(max_age=1)
+    cache.set('query', np.array(['a']))
+    assert cache.get('query') is not None
+    time.sleep(1.5)
+    assert cache.get('query') is None
+
+
+def test_query_cache_lru_eviction(make_cache):
+    # Room for 3 entries of 4,000 IDs
+    cache = make_cache(max_megabytes=0.5)
+    ids = np.array([f'{i:010d}' for i in range(4000)])
+    for key in ['q1', 'q2', 'q3']:
+        cache.set(key, ids)
+    # Refresh q1, so that q2 is the least recently used entry
+    time.sleep(0.01)
+    assert cache.get('q1') is not None
+    time.sleep(0.01)
+    cache.set('q4', ids)
+
+    assert cache.get('q2') is None
+    for key in ['q1', 'q3', 'q4']:
+        assert cache.get(key) is not None
+
+    # Results larger than the cache are not cached
+    cache.set('huge', np.repeat(ids, 10))
+    assert cache.get('huge') is None
+    assert cache.get('q4') is not None
+
+
+def test_query_cache_shared_between_instances(tmp_path):
+    path = tmp_path / 'shared.sqlite'
+    writer = make_query_cache(backend='sqlite', path=path)
+    reader = make_query_cache(backend='sqlite', path=path)
+    writer.set('query', np.array(['a', 'b']), tags=['filter:1'])
+    np.testing.assert_array_equal(reader.get('query'), ['a', 'b'])
+    reader.invalidate(['filter:1'])
+    assert writer.get('query') is None
+
+
+def test_query_cache_unknown_backend():
+    with pytest.raises(ValueError):
+        make_query_cache(backend='redis')
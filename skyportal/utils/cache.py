@@ -1,6 +1,10 @@
 from pathlib import Path
+import contextlib
 import hashlib
 import os
+import sqlite3
+import tempfile
+import threading
 import time
 import io
 import numpy as np
@@ -9,6 +13,9 @@ from baselayer.log import make_log
 
 log = make_log('cache')
 
+# Name of the SQLite index in the cache directory
+INDEX_FILENAME = 'index.sqlite'
+
 
 def array_to_bytes(array):
     """Convert np.array-like object to bytes (for use w/ caching infrastructure).
@@ -24,8 +31,14 @@ def array_to_bytes(array):
 
 
 class Cache:
-    def __init__(self, cache_dir, max_items=None, max_age=None):
+    def __init__(self, cache_dir, max_items=None, max_age=None, max_bytes=None):
         """
+        File cache with an SQLite index of the size and last access time of
+        each entry, so that lookups and evictions do not need to scan the
+        cache directory. Files are sharded into subdirectories named after
+        the first two hex digits of the hashed entry name. The index and
+        files can be shared by several processes.
+
         Parameters
         ----------
         cache_dir : Path or str
@@ -33,11 +46,14 @@ class Cache:
         max_items : int, optional
             Maximum number of items ever held in the cache.  If
             unspecified, then the cache size is only controlled by
-            `max_age`. If zero, caching will be disabled.
+            `max_age` and `max_bytes`. If zero, caching will be disabled.
         max_age : int, optional
-            Maximum age (in seconds) of an item in the cache before it
-            gets removed.  If unspecified, the cache size is only
-            controlled by `max_items`.
+            Maximum age (in seconds) of an item in the cache since it was
+            last accessed before it gets removed.  If unspecified, the cache
+            size is only controlled by `max_items` and `max_bytes`.
+        max_bytes : int, optional
+            Maximum total size of the cached files. Items larger than this
+            are not cached.
         """
         cache_dir = Path(cache_dir)
         if not cache_dir.is_dir():
@@ -46,11 +62,79 @@ class Cache:
         self._cache_dir = Path(cache_dir)
         self._max_items = max_items
         self._max_age = max_age
+        self._max_bytes = max_bytes
+        self._local = threading.local()
+
+        self._connection().executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS totals (
+                n_items INTEGER NOT NULL,
+                n_bytes INTEGER NOT NULL
+            );
+            INSERT INTO totals SELECT 0, 0 WHERE NOT EXISTS (SELECT * FROM totals);
+            CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+            BEGIN
+                UPDATE totals SET
+                    n_items = n_items + 1, n_bytes = n_bytes + NEW.size;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+            BEGIN
+                UPDATE totals SET
+                    n_items = n_items - 1, n_bytes = n_bytes - OLD.size;
+            END;
+            COMMIT;
+            """
+        )
+        with self._transaction() as connection:
+            indexed = connection.execute('PRAGMA user_version').fetchone()[0] > 0
+            connection.execute('PRAGMA user_version = 1')
+        if not indexed:
+            # Files of the unindexed, flat cache layout would never be evicted
+            self._remove(
+                [
+                    f
+                    for f in self._cache_dir.iterdir()
+                    if f.is_file() and not f.name.startswith(INDEX_FILENAME)
+                ]
+            )
+
+    def _connection(self):
+        # sqlite3 connections may be shared neither between threads nor
+        # with forked processes
+        pid, connection = getattr(self._local, 'connection', (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(
+                self._cache_dir / INDEX_FILENAME, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # Take the write lock upfront, so that concurrent read-modify-write
+        # transactions are serialized rather than failing to upgrade
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
 
     def _hash_filename(self, filename):
         m = hashlib.md5()
         m.update(filename.encode('utf-8'))
-        return self._cache_dir / f'{m.hexdigest()}'
+        digest = m.hexdigest()
+        return digest, self._cache_dir / digest[:2] / digest
 
     def __getitem__(self, name):
         """Return item from the cache.
@@ -59,7 +143,6 @@ class Cache:
         ----------
         name : str
         """
-        self.clean_cache()
         if name is None:
             return None
 
@@ -67,13 +150,30 @@ class Cache:
         if self._max_items == 0:
             return None
 
-        cache_file = self._hash_filename(name)
+        key, cache_file = self._hash_filename(name)
+        now = time.time()
+        expired = False
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT accessed FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._max_age is not None and now - row[0] > self._max_age:
+                connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+                expired = True
+            else:
+                # Make newest in cache
+                connection.execute(
+                    'UPDATE entries SET accessed = ? WHERE key = ?', (now, key)
+                )
+        if expired:
+            self._remove([cache_file])
+            return None
         if not cache_file.exists():
             return None
 
         log(f"hit [{name}]")
-        cache_file.touch()  # Make newest in cache
-
         return cache_file
 
     def __setitem__(self, name, data):
@@ -89,14 +189,67 @@ class Cache:
         # Cache is disabled, do not add entry
         if self._max_items == 0:
             return
+        if self._max_bytes is not None and len(data) > self._max_bytes:
+            log(f"not caching [{name}]: {len(data)} bytes")
+            return
 
-        fn = self._hash_filename(name)
-        with open(fn, 'wb') as f:
+        key, fn = self._hash_filename(name)
+        fn.parent.mkdir(exist_ok=True)
+        # Write to a temporary file first, so that concurrent readers never
+        # see a partially written entry
+        with tempfile.NamedTemporaryFile(dir=fn.parent, delete=False) as f:
             f.write(data)
+        os.replace(f.name, fn)
+
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            connection.execute(
+                'INSERT INTO entries VALUES (?, ?, ?)', (key, len(data), time.time())
+            )
+            evicted = self._evict(connection)
 
         log(f"save [{name}] to [{os.path.basename(fn)}]")
 
-        self.clean_cache()
+        self._remove(evicted)
+
+    def _evict(self, connection):
+        """Remove the expired and least recently used entries beyond the
+        size limits from the index, and return their files."""
+        evicted = []
+        if self._max_age is not None:
+            expired = [
+                key
+                for key, in connection.execute(
+                    'SELECT key FROM entries WHERE accessed < ?',
+                    (time.time() - self._max_age,),
+                )
+            ]
+            connection.executemany(
+                'DELETE FROM entries WHERE key = ?', [(key,) for key in expired]
+            )
+            evicted += expired
+
+        n_items, n_bytes = connection.execute('SELECT * FROM totals').fetchone()
+        excess_items = n_items - self._max_items if self._max_items is not None else 0
+        excess_bytes = n_bytes - self._max_bytes if self._max_bytes is not None else 0
+        if excess_items > 0 or excess_bytes > 0:
+            oldest = []
+            cursor = connection.execute(
+                'SELECT key, size FROM entries ORDER BY accessed, rowid'
+            )
+            for key, size in cursor:
+                if excess_items <= 0 and excess_bytes <= 0:
+                    break
+                oldest.append(key)
+                excess_items -= 1
+                excess_bytes -= size
+            cursor.close()
+            connection.executemany(
+                'DELETE FROM entries WHERE key = ?', [(key,) for key in oldest]
+            )
+            evicted += oldest
+
+        return [self._cache_dir / key[:2] / key for key in evicted]
 
     def _remove(self, filenames):
         """Remove given items from the cache.
@@ -117,24 +270,9 @@ class Cache:
 
     def clean_cache(self):
         # Remove stale cache files
-        cached_files = [
-            (f.stat().st_mtime, f.absolute()) for f in self._cache_dir.glob('*')
-        ]
-        cached_files = sorted(cached_files, key=lambda x: x[0], reverse=True)
-
-        now = time.time()
-
-        if self._max_age is not None:
-            removed_by_time = [
-                filename
-                for (mtime, filename) in cached_files
-                if (now - mtime) > self._max_age
-            ]
-            self._remove(removed_by_time)
-
-        if self._max_items is not None:
-            oldest = cached_files[self._max_items :]
-            self._remove([filename for (mtime, filename) in oldest])
+        with self._transaction() as connection:
+            evicted = self._evict(connection)
+        self._remove(evicted)
 
     def __len__(self):
-        return len(list(self._cache_dir.glob('*')))
+        return self._connection().execute('SELECT n_items FROM totals').fetchone()[0]
@@ -0,0 +1,53 @@
+"""Ranges of HEALPix indices covering cones, for positional queries against
+columns of (maximum level, nested) HEALPix indices such as `Obj.healpix`."""
+import functools
+
+import numpy as np
+from astropy import units as u
+from astropy_healpix import HEALPix, level_to_nside
+from healpix_alchemy.constants import LEVEL
+
+__all__ = ['cone_ranges']
+
+# Angular size of the pixels of level 0 [deg]
+LEVEL_0_PIXEL_SIZE = np.degrees(np.sqrt(4 * np.pi / 12))
+
+
+@functools.lru_cache(maxsize=None)
+def _healpix(level):
+    return HEALPix(nside=level_to_nside(level), order='nested')
+
+
+def cone_ranges(ra, dec, radius):
+    """Ranges of HEALPix indices of the pixels overlapping a cone.
+
+    The cone is covered with pixels about half as large as the radius, so
+    that it overlaps a few tens of them, and contiguous pixels are merged.
+    (The cone search of astropy_healpix may miss pixels that are larger
+    than the cone.)
+
+    Parameters
+    ----------
+    ra, dec : float
+        Center of the cone [deg].
+    radius : float
+        Radius of the cone [deg].
+
+    Returns
+    -------
+    ranges : list of (int, int)
+        Half-open ranges [lower, upper) of maximum level HEALPix indices.
+    """
+    level = int(np.clip(np.floor(np.log2(2 * LEVEL_0_PIXEL_SIZE / radius)), 0, LEVEL))
+    pixels = np.sort(
+        _healpix(level).cone_search_lonlat(ra * u.deg, dec * u.deg, radius * u.deg)
+    )
+    shift = 2 * (LEVEL - level)
+
+    ranges = []
+    for pixel in pixels.tolist():
+        if len(ranges) > 0 and ranges[-1][1] == pixel << shift:
+            ranges[-1][1] = (pixel + 1) << shift
+        else:
+            ranges.append([pixel << shift, (pixel + 1) << shift])
+    return [tuple(r) for r in ranges]
@@ -0,0 +1,126 @@
+"""Lomb-Scargle periodograms and phase folding of multi-band photometry."""
+import numpy as np
+from astropy.timeseries import LombScargle
+
+__all__ = ['frequency_grid', 'multiband_periodogram', 'phase_fold']
+
+# Filters with fewer valid points than this are left out of the periodogram
+MIN_POINTS_PER_FILTER = 10
+
+
+def frequency_grid(
+    baseline, min_period=0.01, max_period=None, oversample=5, max_frequencies=500_000
+):
+    """Regularly spaced trial frequencies for a periodogram.
+
+    Parameters
+    ----------
+    baseline : float
+        Time span of the observations, in days.
+    min_period : float, optional
+        Shortest trial period, in days.
+    max_period : float, optional
+        Longest trial period, in days. Defaults to the baseline.
+    oversample : int, optional
+        Number of trial frequencies per expected peak width (1 / baseline).
+    max_frequencies : int, optional
+        Maximum size of the grid.
+
+    Returns
+    -------
+    frequency : numpy.ndarray
+        Trial frequencies, in 1/day.
+    """
+    if max_period is None:
+        max_period = baseline
+    f_min, f_max = 1.0 / max_period, 1.0 / min_period
+    n_frequencies = int(np.ceil(oversample * baseline * (f_max - f_min)))
+    n_frequencies = min(max(n_frequencies, 2), max_frequencies)
+    return np.linspace(f_min, f_max, n_frequencies)
+
+
+def multiband_periodogram(mjd, flux, fluxerr, filters, **grid_kwargs):
+    """Compute a Lomb-Scargle periodogram of multi-band photometry.
+
+    Each filter is fit independently on a common frequency grid, and the
+    per-filter powers are combined into a mean weighted by the number of
+    points in each filter.
+
+    Parameters
+    ----------
+    mjd, flux, fluxerr : array_like
+        Times (MJD), fluxes and flux errors of the photometry. Points with
+        non-finite or non-positive errors are ignored.
+    filters : array_like of str
+        Filter of each point.
+    **grid_kwargs
+        Passed to `frequency_grid`.
+
+    Returns
+    -------
+    result : dict or None
+        `period` and `power` of the highest peak of the combined
+        periodogram, along with the period at the highest peak of each
+        filter (`periods`), or None if no filter has enough points.
+    """
+    mjd, flux, fluxerr, filters = (
+        np.asarray(mjd, dtype=float),
+        np.asarray(flux, dtype=float),
+        np.asarray(fluxerr, dtype=float),
+        np.asarray(filters),
+    )
+    valid = np.isfinite(mjd) & np.isfinite(flux) & np.isfinite(fluxerr)
+    valid &= fluxerr > 0
+    mjd, flux, fluxerr, filters = (
+        mjd[valid],
+        flux[valid],
+        fluxerr[valid],
+        filters[valid],
+    )
+
+    bands, counts = np.unique(filters, return_counts=True)
+    bands = bands[counts >= MIN_POINTS_PER_FILTER]
+    if len(bands) == 0:
+        return None
+    baseline = mjd.max() - mjd.min()
+    if baseline <= 0:
+        return None
+
+    frequency = frequency_grid(baseline, **grid_kwargs)
+    combined = np.zeros_like(frequency)
+    periods, n_points = {}, 0
+    for band in bands:
+        in_band = filters == band
+        power = LombScargle(mjd[in_band], flux[in_band], fluxerr[in_band]).power(
+            frequency, method='fast', assume_regular_frequency=True
+        )
+        periods[str(band)] = float(1.0 / frequency[np.argmax(power)])
+        combined += in_band.sum() * power
+        n_points += in_band.sum()
+    combined /= n_points
+
+    peak = np.argmax(combined)
+    return {
+        'period': float(1.0 / frequency[peak]),
+        'power': float(combined[peak]),
+        'periods': periods,
+    }
+
+
+def phase_fold(mjd, period, t0=0.0):
+    """Phases, in [0, 1), of observations folded at a given period.
+
+    Parameters
+    ----------
+    mjd : array_like
+        Times (MJD) of the observations.
+    period : float
+        Folding period, in days.
+    t0 : float, optional
+        Reference time of phase 0.
+
+    Returns
+    -------
+    phase : numpy.ndarray
+    """
+    return np.mod(np.asarray(mjd, dtype=float) - t0, period) / period
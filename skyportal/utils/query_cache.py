@@ -0,0 +1,301 @@
+"""Caches for the ordered results of (candidate) queries.
+
+Paging through the results of a query reuses the full list of matching IDs
+computed for its first page, stored under a query ID. Two interchangeable
+backends are provided:
+
+- `MemoryQueryCache`, a least-recently-used cache held in the memory of the
+  app server process, and
+- `SQLiteQueryCache`, a cache in an SQLite database on local disk, shared by
+  all the app server processes of a host.
+
+Entries can be tagged (e.g. with the IDs of the filters a candidate query
+selects), so that all the entries that new data makes stale can be
+invalidated at once.
+"""
+import collections
+import io
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from baselayer.log import make_log
+
+log = make_log('query_cache')
+
+
+def _array_to_bytes(array):
+    b = io.BytesIO()
+    np.save(b, array, allow_pickle=False)
+    return b.getvalue()
+
+
+def _bytes_to_array(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+class QueryCache:
+    """Interface of the query result caches."""
+
+    def get(self, key):
+        """Return the cached results of a query, or None.
+
+        Parameters
+        ----------
+        key : str
+            Query ID.
+
+        Returns
+        -------
+        results : numpy.ndarray or None
+        """
+        raise NotImplementedError
+
+    def set(self, key, results, tags=()):
+        """Cache the results of a query.
+
+        Parameters
+        ----------
+        key : str
+            Query ID.
+        results : numpy.ndarray
+            Results to cache.
+        tags : iterable of str, optional
+            Tags to invalidate the entry by.
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tags):
+        """Remove all the entries with any of the given tags.
+
+        Parameters
+        ----------
+        tags : iterable of str
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all entries."""
+        raise NotImplementedError
+
+
+class MemoryQueryCache(QueryCache):
+    def __init__(self, max_bytes, max_age=None):
+        """
+        In-process least-recently-used cache.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Maximum total size of the cached arrays. The least recently used
+            entries are evicted beyond that. Results larger than this are
+            not cached.
+        max_age : float, optional
+            Maximum age (in seconds) of an entry.
+        """
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._entries = collections.OrderedDict()  # key -> (created, tags, array)
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        _, _, array = self._entries.pop(key)
+        self._n_bytes -= array.nbytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, _, array = entry
+            if self._max_age is not None and time.time() - created > self._max_age:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return array
+
+    def set(self, key, results, tags=()):
+        results = np.asarray(results)
+        if results.nbytes > self._max_bytes:
+            log(f"not caching [{key}]: {results.nbytes} bytes")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.time(), frozenset(tags), results)
+            self._n_bytes += results.nbytes
+            while self._n_bytes > self._max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        tags = set(tags)
+        with self._lock:
+            stale = [
+                key
+                for key, (_, entry_tags, _) in self._entries.items()
+                if not entry_tags.isdisjoint(tags)
+            ]
+            for key in stale:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteQueryCache(QueryCache):
+    def __init__(self, path, max_bytes, max_age=None):
+        """
+        Least-recently-used cache in an SQLite database, which can be
+        shared by several processes.
+
+        Parameters
+        ----------
+        path : Path or str
+            Path to the database file. Its directory is created if
+            necessary.
+        max_bytes : int
+            Maximum total size of the cached results, beyond which the least
+            recently used entries are evicted.
+        max_age : float, optional
+            Maximum age (in seconds) of an entry.
+        """
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+                CREATE TABLE IF NOT EXISTS tags (
+                    key TEXT NOT NULL REFERENCES entries (key) ON DELETE CASCADE,
+                    tag TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+                CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+                """
+            )
+
+    def _connection(self):
+        # sqlite3 connections may not be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA foreign_keys=ON')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT data, created FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            data, created = row
+            if self._max_age is not None and now - created > self._max_age:
+                connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+                return None
+            connection.execute(
+                'UPDATE entries SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return _bytes_to_array(data)
+
+    def set(self, key, results, tags=()):
+        data = _array_to_bytes(np.asarray(results))
+        if len(data) > self._max_bytes:
+            log(f"not caching [{key}]: {len(data)} bytes")
+            return
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            connection.execute(
+                'INSERT INTO entries VALUES (?, ?, ?, ?, ?)',
+                (key, data, len(data), now, now),
+            )
+            connection.executemany(
+                'INSERT INTO tags VALUES (?, ?)', [(key, tag) for tag in set(tags)]
+            )
+            if self._max_age is not None:
+                connection.execute(
+                    'DELETE FROM entries WHERE created < ?', (now - self._max_age,)
+                )
+            # Evict the least recently used entries beyond the size limit
+            connection.execute(
+                """
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS total
+                        FROM entries
+                    ) WHERE total > ?
+                )
+                """,
+                (self._max_bytes,),
+            )
+
+    def invalidate(self, tags):
+        tags = list(set(tags))
+        if len(tags) == 0:
+            return
+        with self._connection() as connection:
+            connection.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM tags WHERE tag IN '
+                f"({', '.join('?' * len(tags))}))",
+                tags,
+            )
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM entries')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+def make_query_cache(backend='sqlite', max_megabytes=256, max_age=None, path=None):
+    """Instantiate a query result cache.
+
+    Parameters
+    ----------
+    backend : {'sqlite', 'memory'}
+        `SQLiteQueryCache` (shared by the processes of a host) or
+        `MemoryQueryCache` (per process).
+    max_megabytes : float, optional
+        Maximum size of the cache.
+    max_age : float, optional
+        Maximum age (in seconds) of an entry.
+    path : Path or str, optional
+        Database file of the `sqlite` backend.
+
+    Returns
+    -------
+    cache : QueryCache
+    """
+    max_bytes = int(max_megabytes * 2**20)
+    if backend == 'memory':
+        return MemoryQueryCache(max_bytes, max_age=max_age)
+    if backend == 'sqlite':
+        if path is None:
+            raise ValueError('The sqlite query cache backend requires a path')
+        return SQLiteQueryCache(path, max_bytes, max_age=max_age)
+    raise ValueError(f'Unknown query cache backend: {backend}')
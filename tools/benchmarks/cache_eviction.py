@@ -0,0 +1,59 @@
+"""Benchmark lookups and insertions of `skyportal.utils.cache.Cache` in a full
+cache.
+
+Compares the indexed cache with scanning the cache directory (glob, stat
+and sort every file) on each access, as the unindexed cache did.
+
+Example
+-------
+    PYTHONPATH=. python tools/benchmarks/cache_eviction.py --sizes 1000 10000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from skyportal.utils.cache import Cache
+
+
+def scan_directory(cache_dir):
+    files = [(f.stat().st_mtime, f) for f in Path(cache_dir).glob('*/*')]
+    return sorted(files, key=lambda x: x[0], reverse=True)
+
+
+def timeit(func, n_repeats):
+    start = time.perf_counter()
+    for i in range(n_repeats):
+        func(i)
+    return (time.perf_counter() - start) / n_repeats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeats', type=int, default=200)
+    args, _ = parser.parse_known_args(sys.argv[1:])
+
+    print(
+        f"{'items':>8} {'fill [s]':>9} {'get [ms]':>9} {'set [ms]':>9} "
+        f"{'scan [ms]':>10}"
+    )
+    for n_items in args.sizes:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = Cache(cache_dir, max_items=n_items)
+            start = time.perf_counter()
+            for i in range(n_items):
+                cache[str(i)] = b'x' * 1024
+            fill = time.perf_counter() - start
+
+            get = timeit(lambda i: cache[str(i * 7 % n_items)], args.repeats)
+            # Each insertion evicts the least recently used item
+            set_ = timeit(
+                lambda i: cache.__setitem__(f'new-{i}', b'x' * 1024), args.repeats
+            )
+            scan = timeit(lambda i: scan_directory(cache_dir), 5)
+            print(
+                f"{n_items:>8} {fill:>9.2f} {get * 1e3:>9.3f} {set_ * 1e3:>9.3f} "
+                f"{scan * 1e3:>10.1f}"
+            )
@@ -0,0 +1,86 @@
+"""Benchmark the latency of candidate scanning pages of increasing size
+against a running SkyPortal.
+
+The nested records of a page (saved groups, classifications, passing
+filters, photometry, spectra, comments, annotations) are each loaded with
+one query for the whole page, so the number of queries does not depend on
+`numPerPage`, and the page latency should stay roughly flat up to its cap
+of 500. The benchmark reports the median latency of each page size
+relative to the smallest one, and exits with an error if the largest ratio
+exceeds `--tolerance`.
+
+Example
+-------
+    PYTHONPATH=. python tools/benchmarks/candidate_page.py \\
+        --token <token> --group-ids 1 --sizes 25 100 250 500
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import requests
+
+
+def get_page(session, url, token, params):
+    start = time.perf_counter()
+    response = session.get(
+        url, params=params, headers={'Authorization': f'token {token}'}
+    )
+    response.raise_for_status()
+    return len(response.json()['data']['candidates']), time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='http://localhost:5000')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--group-ids', default=None)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[25, 100, 250, 500])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=2.0)
+    parser.add_argument('--include-photometry', action='store_true')
+    parser.add_argument('--include-spectra', action='store_true')
+    parser.add_argument('--include-comments', action='store_true')
+    args = parser.parse_args()
+
+    url = f'{args.host}/api/candidates'
+    session = requests.Session()
+    session.trust_env = False
+
+    print(
+        f"{'numPerPage':>10} {'returned':>9} {'median [s]':>11} "
+        f"{'ms/candidate':>13} {'ratio':>6}"
+    )
+    medians = []
+    for n_per_page in args.sizes:
+        params = {'numPerPage': n_per_page}
+        # Any value of the include* arguments is truthy
+        for name, include in [
+            ('includePhotometry', args.include_photometry),
+            ('includeSpectra', args.include_spectra),
+            ('includeComments', args.include_comments),
+        ]:
+            if include:
+                params[name] = 'true'
+        if args.group_ids is not None:
+            params['groupIDs'] = args.group_ids
+        timings = [
+            get_page(session, url, args.token, params) for _ in range(args.repeats)
+        ]
+        n_returned = timings[0][0]
+        median = statistics.median(elapsed for _, elapsed in timings)
+        medians.append(median)
+        print(
+            f"{n_per_page:>10} {n_returned:>9} {median:>11.3f} "
+            f"{median * 1e3 / max(n_returned, 1):>13.1f} "
+            f"{median / medians[0]:>6.2f}"
+        )
+
+    ratio = max(medians) / medians[0]
+    if ratio > args.tolerance:
+        sys.exit(
+            f"Page latency is not flat: {ratio:.2f} times that of "
+            f"numPerPage={args.sizes[0]} (tolerance {args.tolerance})"
+        )
+    print(f"Page latency is flat within a factor {ratio:.2f}")
@@ -0,0 +1,82 @@
+"""Benchmark concurrent photometry uploads against a running SkyPortal.
+
+Each uploader POSTs its own batch of (non-overlapping) photometry to
+`/api/photometry`. If writers serialize on the photometry table, the wall
+time grows linearly with the number of uploaders; if they run concurrently,
+throughput (points/s) grows with the number of uploaders instead.
+
+Example
+-------
+    PYTHONPATH=. python tools/benchmarks/photometry_concurrency.py \\
+        --token <upload token> --obj-id ZTF21abcdefg --instrument-id 1 \\
+        --points 5000 --uploaders 1 2 4 8
+"""
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+
+def make_batch(obj_id, instrument_id, filter, n_points, rng):
+    # A random MJD offset keeps batches from different uploaders (and
+    # different runs) from colliding on the deduplication index.
+    mjd = 50000 + rng.uniform(0, 10000) + np.arange(n_points) * 1e-3
+    return {
+        'obj_id': obj_id,
+        'instrument_id': instrument_id,
+        'mjd': mjd.tolist(),
+        'flux': rng.uniform(10, 100, n_points).tolist(),
+        'fluxerr': rng.uniform(0.1, 1, n_points).tolist(),
+        'zp': [25.0] * n_points,
+        'magsys': ['ab'] * n_points,
+        'filter': [filter] * n_points,
+        'origin': [f'benchmark-{uuid.uuid4().hex[:8]}'] * n_points,
+        'group_ids': 'all',
+    }
+
+
+def upload(url, token, batch):
+    session = requests.Session()
+    session.trust_env = False
+    response = session.post(
+        url, json=batch, headers={'Authorization': f'token {token}'}
+    )
+    response.raise_for_status()
+    return len(response.json()['data']['ids'])
+
+
+def run(url, token, batches):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        n_inserted = sum(executor.map(lambda batch: upload(url, token, batch), batches))
+    return n_inserted, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='http://localhost:5000')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--obj-id', required=True)
+    parser.add_argument('--instrument-id', type=int, required=True)
+    parser.add_argument('--filter', default='ztfg')
+    parser.add_argument('--points', type=int, default=5000, help='Points per uploader')
+    parser.add_argument('--uploaders', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    url = f'{args.host}/api/photometry'
+    rng = np.random.default_rng()
+
+    print(f"{'uploaders':>10} {'points':>10} {'wall [s]':>10} {'points/s':>12}")
+    for n_uploaders in args.uploaders:
+        batches = [
+            make_batch(args.obj_id, args.instrument_id, args.filter, args.points, rng)
+            for _ in range(n_uploaders)
+        ]
+        n_inserted, elapsed = run(url, args.token, batches)
+        print(
+            f"{n_uploaders:>10} {n_inserted:>10} {elapsed:>10.2f} "
+            f"{n_inserted / elapsed:>12.0f}"
+        )
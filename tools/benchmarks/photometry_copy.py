@@ -0,0 +1,169 @@
+"""Benchmark encoding photometry rows for a bulk COPY.
+
+Compares the binary COPY writer in `skyportal.utils.binary_copy` with the
+previous approach of building a pandas DataFrame from the rows and writing it
+out as tab-separated text. Reports wall time and peak (Python-allocated)
+memory for producing the full COPY stream. Pass `--dsn` to also time the
+COPY itself into a temporary table.
+
+Example
+-------
+    PYTHONPATH=. python tools/benchmarks/photometry_copy.py \\
+        --sizes 1000 100000 1000000 --dsn postgresql://skyportal@localhost/skyportal
+"""
+import argparse
+import datetime
+import json
+import time
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+from skyportal.utils.binary_copy import binary_copy_chunks, copy_rows
+
+COLUMNS = (
+    'id',
+    'original_user_data',
+    'flux',
+    'fluxerr',
+    'obj_id',
+    'altdata',
+    'instrument_id',
+    'mjd',
+    'filter',
+    'ra',
+    'origin',
+    'created_at',
+)
+COLUMN_TYPES = (
+    sa.Integer(),
+    JSONB(),
+    sa.Float(),
+    sa.Float(),
+    sa.String(),
+    JSONB(),
+    sa.Integer(),
+    sa.Float(),
+    sa.String(),
+    sa.Float(),
+    sa.String(),
+    sa.DateTime(),
+)
+CREATE_TABLE = """
+    CREATE TEMPORARY TABLE copy_benchmark (
+        id integer, original_user_data jsonb, flux float, fluxerr float,
+        obj_id text, altdata jsonb, instrument_id integer, mjd float,
+        filter text, ra float, origin text, created_at timestamp
+    )
+"""
+
+
+def make_rows(n_rows, rng):
+    flux = rng.uniform(-5, 100, n_rows)
+    flux[::10] = np.nan
+    utcnow = datetime.datetime.utcnow()
+    return [
+        dict(
+            id=i,
+            original_user_data=json.dumps({'magsys': 'ab'} if i % 2 else None),
+            flux=flux[i],
+            fluxerr=0.5,
+            obj_id='benchmark',
+            altdata=json.dumps(None),
+            instrument_id=1,
+            mjd=58000.0 + i * 1e-3,
+            filter='ztfg',
+            ra=None,
+            origin='benchmark',
+            created_at=utcnow,
+        )
+        for i in range(n_rows)
+    ]
+
+
+def encode_csv(rows):
+    output = StringIO()
+    df = pd.DataFrame.from_records(rows)
+    df.replace("NaN", "null", inplace=True)
+    df.replace(np.nan, "NaN", inplace=True)
+    df.to_csv(
+        output, index=False, sep='\t', header=False, encoding='utf8', quotechar="'"
+    )
+    output.seek(0)
+    return output
+
+
+def encode_binary(rows):
+    for _ in binary_copy_chunks(rows, COLUMNS, COLUMN_TYPES):
+        pass
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def copy_csv(connection, rows):
+    with connection.cursor() as cursor:
+        cursor.copy_from(
+            encode_csv(rows), 'copy_benchmark', sep='\t', null='', columns=COLUMNS
+        )
+
+
+def copy_binary(connection, rows):
+    copy_rows(connection, rows, 'copy_benchmark', COLUMNS, COLUMN_TYPES)
+
+
+def time_copy(dsn, func, rows):
+    import psycopg2
+
+    with psycopg2.connect(dsn) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_TABLE)
+        start = time.perf_counter()
+        func(connection, rows)
+        elapsed = time.perf_counter() - start
+        connection.rollback()
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[10**3, 10**5, 10**6]
+    )
+    parser.add_argument('--dsn', help='Postgres DSN; if given, also time the COPY')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    header = (
+        f"{'rows':>8} {'csv [s]':>9} {'csv [MiB]':>10} "
+        f"{'binary [s]':>11} {'binary [MiB]':>13}"
+    )
+    if args.dsn:
+        header += f" {'COPY csv [s]':>13} {'COPY binary [s]':>16}"
+    print(header)
+
+    for n_rows in args.sizes:
+        rows = make_rows(n_rows, rng)
+        csv_time, csv_memory = measure(encode_csv, rows)
+        binary_time, binary_memory = measure(encode_binary, rows)
+        line = (
+            f"{n_rows:>8} {csv_time:>9.2f} {csv_memory:>10.1f} "
+            f"{binary_time:>11.2f} {binary_memory:>13.1f}"
+        )
+        if args.dsn:
+            line += (
+                f" {time_copy(args.dsn, copy_csv, rows):>13.2f}"
+                f" {time_copy(args.dsn, copy_binary, rows):>16.2f}"
+            )
+        print(line)
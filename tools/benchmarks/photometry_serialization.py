@@ -0,0 +1,75 @@
+"""Benchmark serialization of the light curves of objects in the database.
+
+Compares loading Photometry instances (with their instrument and groups)
+and serializing them one at a time, with reading the serialized columns
+from `photometry_serialization_query` and serializing them with
+`serialize_photometry`. The times include the queries.
+
+Example
+-------
+    PYTHONPATH=. python tools/benchmarks/photometry_serialization.py \\
+        --config=config.yaml --obj-ids ZTF21aaaaaaa ZTF21aaaaaab
+"""
+import argparse
+import time
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from baselayer.app.env import load_env
+from skyportal.handlers.api.photometry import (
+    photometry_serialization_query,
+    serialize,
+    serialize_photometry,
+)
+from skyportal.models import init_db, DBSession, Photometry
+
+
+def serialize_instances(obj_id, magsys, format):
+    photometry = (
+        DBSession()
+        .query(Photometry)
+        .options(joinedload(Photometry.instrument), selectinload(Photometry.groups))
+        .filter(Photometry.obj_id == obj_id)
+        .all()
+    )
+    return [serialize(phot, magsys, format) for phot in photometry]
+
+
+def serialize_rows(obj_id, magsys, format):
+    rows = photometry_serialization_query(
+        DBSession().query(Photometry).filter(Photometry.obj_id == obj_id)
+    ).all()
+    return serialize_photometry(rows, magsys, format)
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    # Do not let the identity map carry over between runs
+    DBSession().rollback()
+    DBSession().expunge_all()
+    return result, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--obj-ids', nargs='+', required=True)
+    parser.add_argument('--magsys', default='vega')
+    args, _ = parser.parse_known_args()
+
+    env, cfg = load_env()
+    init_db(**cfg['database'])
+
+    print(
+        f"{'obj_id':>16} {'points':>8} {'format':>6} {'instances [ms]':>15} "
+        f"{'rows [ms]':>10}"
+    )
+    for obj_id in args.obj_ids:
+        for format in ['mag', 'flux']:
+            points, instances = timeit(serialize_instances, obj_id, args.magsys, format)
+            _, rows = timeit(serialize_rows, obj_id, args.magsys, format)
+            print(
+                f"{obj_id:>16} {len(points):>8} {format:>6} "
+                f"{instances * 1e3:>15.1f} {rows * 1e3:>10.1f}"
+            )